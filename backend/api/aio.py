@@ -0,0 +1,50 @@
+"""
+Async MongoDB access for the ASGI views in ``api/async_views.py``.
+
+mongoengine only speaks synchronous pymongo, so the async views talk to the
+same database through pymongo's ``AsyncMongoClient``, built from
+``MONGO_SETTINGS`` and ``MONGO_CLIENT_OPTIONS``. A client is bound to the
+event loop it is first used on, so one client is kept per running loop
+(normally one per ASGI worker).
+Documents are still shaped and serialized by the mongoengine models.
+"""
+import asyncio
+import weakref
+
+from django.conf import settings
+from pymongo import AsyncMongoClient
+
+from .metrics import command_timer
+from .mongo import pool_monitor
+from .slow_queries import slow_command_log
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def client_options(mongo_settings):
+    """``AsyncMongoClient`` keyword arguments for a ``MONGO_SETTINGS`` dict."""
+    options = {'host': mongo_settings.get('host'), 'port': mongo_settings.get('port')}
+    if mongo_settings.get('username'):
+        options['username'] = mongo_settings['username']
+    if mongo_settings.get('password'):
+        options['password'] = mongo_settings['password']
+    if mongo_settings.get('authentication_source'):
+        options['authSource'] = mongo_settings['authentication_source']
+    return options
+
+
+def client():
+    loop = asyncio.get_running_loop()
+    mongo_client = _clients.get(loop)
+    if mongo_client is None:
+        mongo_client = _clients[loop] = AsyncMongoClient(
+            **client_options(settings.MONGO_SETTINGS),
+            **getattr(settings, 'MONGO_CLIENT_OPTIONS', {}),
+            event_listeners=[pool_monitor('async'), command_timer, slow_command_log],
+        )
+    return mongo_client
+
+
+def collection(model):
+    """The async collection backing a mongoengine ``model``."""
+    return client()[settings.MONGO_SETTINGS['db']][model._get_collection_name()]
@@ -0,0 +1,245 @@
+"""
+Async versions of the attendance hot-path views, for ASGI deployments.
+
+DRF's ``@api_view`` is synchronous, so under ASGI every punch would hold a
+thread while pymongo blocks. These views are plain Django coroutines that
+keep the request/response contract of their sync counterparts in
+``api/views.py``: the same JWT authentication
+(``StatelessJWTAuthentication`` from ``REST_FRAMEWORK``), the same payloads
+and the same error bodies, with Mongo I/O going through ``api/aio.py``.
+
+With ``ATTENDANCE_WRITE_BEHIND`` on, check-in and check-out append to the
+punch buffer (``api/punch_log.py``) like the sync views; the append, which
+waits for an fsync, runs in a worker thread.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from dateutil import parser
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import aio
+from .attendance import apply_punch_async, day_key
+from .authentication import StatelessJWTAuthentication, has_user_claims
+from .models import EmployeeAttendanceDaily
+from .punch_log import PunchLogUnavailable, punch_buffer, write_behind_enabled
+from .renderers import dumps
+
+
+def _response(data, status=status.HTTP_200_OK, headers=None):
+    # Encoded like the sync views' renderer, so bodies are byte-for-byte the same.
+    return HttpResponse(dumps(data), status=status, content_type='application/json', headers=headers)
+
+
+async def _authenticate(request):
+    """Return the authenticated user, or None when no JWT was sent."""
+    authenticator = StatelessJWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+    # Validation may refresh the revocation list from Mongo; keep that off the event loop.
+    token = await sync_to_async(authenticator.get_validated_token, thread_sensitive=False)(raw_token)
+    if has_user_claims(token):
+        # Built from the token alone, no need for a thread.
+        return authenticator.get_user(token)
+    return await sync_to_async(authenticator.get_user)(token)
+
+
+def async_api_view(methods):
+    """
+    The async counterpart of ``@api_view(methods)`` +
+    ``@permission_classes([IsAuthenticated])``: method check, JWT
+    authentication and a parsed JSON body on ``request.data``.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _response(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                )
+            challenge = {'WWW-Authenticate': StatelessJWTAuthentication().authenticate_header(request)}
+            try:
+                user = await _authenticate(request)
+            except APIException as e:
+                detail = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+                return _response(detail, status=e.status_code, headers=challenge)
+            if user is None or not user.is_authenticated:
+                return _response(
+                    {'detail': 'Authentication credentials were not provided.'},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                    headers=challenge,
+                )
+            request.user = user
+
+            request.data = {}
+            if request.body:
+                try:
+                    request.data = json.loads(request.body)
+                except ValueError as e:
+                    return _response({'detail': f'JSON parse error - {e}'}, status=status.HTTP_400_BAD_REQUEST)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _not_an_object():
+    return _response({'error': 'Expected a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _append_punch(emp_id, day, check_in=None, check_out=None):
+    punch_buffer().append(emp_id, day, check_in=check_in, check_out=check_out)
+
+
+async def _queued_punch(emp_id, day, check_in=None, check_out=None):
+    """``api.views.queued_punch``: 202 once the punch is on disk, 503 if it could not be."""
+    try:
+        await sync_to_async(_append_punch, thread_sensitive=False)(emp_id, day, check_in=check_in, check_out=check_out)
+    except PunchLogUnavailable as e:
+        return _response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return _response(
+        {
+            'emp_id': emp_id,
+            'date': day.date(),
+            'records': {'check_in': check_in, 'check_out': check_out},
+            'queued': True,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+#--------------------Employee Attendance Function START-----------------------#
+
+@async_api_view(['GET', 'POST'])
+async def get_employee_attendance(request):
+    if request.method == 'GET':
+        emp_id = request.GET.get('emp_id')
+        date_str = request.GET.get('date')
+    elif not isinstance(request.data, dict):
+        return _not_an_object()
+    else:
+        emp_id = request.data.get('emp_id')
+        date_str = request.data.get('date')
+
+    if not emp_id or not date_str:
+        return _response(
+            {'error': 'emp_id and date are required parameters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        target_date = parser.parse(date_str).date()
+    except (ValueError, TypeError, OverflowError):
+        return _response(
+            {'error': 'Invalid date format. Please use YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        cursor = aio.collection(EmployeeAttendanceDaily).find({'emp_id': emp_id, 'date': day_key(target_date)})
+        rows = await cursor.to_list()
+    except Exception as e:
+        return _response(
+            {'error': f'Error querying attendance records: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    if not rows:
+        return _response(
+            {'message': f'No attendance records found for employee {emp_id} on {target_date}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return _response([EmployeeAttendanceDaily._from_son(row).to_dict() for row in rows])
+
+
+@async_api_view(['POST'])
+async def check_in_attendance(request):
+    data = request.data
+    if not isinstance(data, dict):
+        return _not_an_object()
+    emp_id = data.get('employee_id')
+    date_str = data.get('date')
+    check_in = data.get('check_in')
+
+    if not all([emp_id, date_str, check_in]):
+        return _response(
+            {'error': 'Employee ID, date, and check_in are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        day = day_key(date_str)
+    except (ValueError, OverflowError):
+        return _response(
+            {'error': 'Invalid date format. Please use YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        if write_behind_enabled():
+            return await _queued_punch(emp_id, day, check_in=check_in, check_out=data.get('check_out') or None)
+        attendance = await apply_punch_async(emp_id, day, check_in=check_in, check_out=data.get('check_out') or None)
+    except Exception as e:
+        return _response(
+            {'detail': f'Error creating employee attendance: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return _response(attendance.to_dict(), status=status.HTTP_201_CREATED)
+
+
+@async_api_view(['POST'])
+async def check_out_attendance(request):
+    data = request.data
+    if not isinstance(data, dict):
+        return _not_an_object()
+    check_out = data.get('check_out')
+
+    if not check_out:
+        return _response(
+            {'error': 'check_out time is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        if data.get('attendance_id'):
+            existing = await aio.collection(EmployeeAttendanceDaily).find_one(
+                {'_id': EmployeeAttendanceDaily.id.to_mongo(data.get('attendance_id'))}, {'emp_id': 1, 'date': 1}
+            )
+            if existing is None:
+                return _response({'error': 'Attendance record not found'}, status=status.HTTP_404_NOT_FOUND)
+            emp_id, day = existing['emp_id'], existing['date']
+        else:
+            emp_id, date_str = data.get('employee_id'), data.get('date')
+            if not emp_id or not date_str:
+                return _response(
+                    {'error': 'attendance_id or employee_id and date are required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            day = date_str
+
+        if write_behind_enabled():
+            return await _queued_punch(emp_id, day_key(day), check_out=check_out)
+        attendance = await apply_punch_async(emp_id, day, check_out=check_out)
+        return _response(attendance.to_dict())
+
+    except (ValueError, OverflowError):
+        return _response(
+            {'error': 'Invalid date format. Please use YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return _response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+#--------------------Employee Attendance Function END-----------------------#
@@ -0,0 +1,258 @@
+"""
+Applying attendance punches to ``EmployeeAttendanceDaily``.
+
+A day's document holds the earliest check-in and the latest check-out seen
+for that employee. Punches are applied as upserts with ``$min`` / ``$max`` on
+those two fields, so applying the same punches again, one at a time or in a
+batch and in any order, always converges on the same daily document and
+never creates a duplicate. Databases written by the old check-in view may
+still hold several documents for one day; ``merge_duplicate_days`` collapses
+them before ``manage.py ensure_indexes`` builds the unique index.
+
+With ``ATTENDANCE_DUAL_WRITE`` on, every punch is also applied to the
+employee's month bucket, and ``ATTENDANCE_MONTH_READS=buckets`` serves range
+reads from the buckets; see ``api/buckets.py``.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+from dateutil import parser
+from django.conf import settings
+from pymongo import ReturnDocument, UpdateOne
+
+from . import aio, buckets
+from .counters import ATTENDANCE_STATUSES, attendance_key, increment, increment_async
+from .models import EmployeeAttendanceDaily
+from .mongo import read_collection
+
+CHECK_IN = 'in'
+CHECK_OUT = 'out'
+DIRECTIONS = {
+    'in': CHECK_IN,
+    'check_in': CHECK_IN,
+    'out': CHECK_OUT,
+    'check_out': CHECK_OUT,
+}
+TIME_FORMAT = '%H:%M:%S'
+MAX_RANGE_DAYS = 366
+
+
+def dual_write_enabled():
+    return getattr(settings, 'ATTENDANCE_DUAL_WRITE', False)
+
+
+def bucket_reads_enabled():
+    return getattr(settings, 'ATTENDANCE_MONTH_READS', buckets.DAILY_READS) == buckets.BUCKET_READS
+
+
+def day_key(value):
+    """DateField values are stored as midnight datetimes."""
+    if isinstance(value, str):
+        value = parser.parse(value).date()
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        raise ValueError('Invalid date.')
+    return datetime(value.year, value.month, value.day)
+
+
+def punch_update(check_in=None, check_out=None, new_id=None):
+    update = {'$setOnInsert': {'status': 'Present'}}
+    if new_id is not None:
+        update['$setOnInsert']['_id'] = new_id
+    if check_in:
+        update['$min'] = {'records.check_in': check_in}
+    if check_out:
+        update['$max'] = {'records.check_out': check_out}
+    else:
+        # Same shape check_in_attendance always produced: an empty check_out.
+        update['$setOnInsert']['records.check_out'] = ''
+    return update
+
+
+def apply_punch(emp_id, day, check_in=None, check_out=None):
+    """Apply one check-in and/or check-out and return the updated document."""
+    # Choosing the _id of a would-be insert tells us whether the upsert
+    # created the day, without a second round trip.
+    new_id = ObjectId()
+    raw = EmployeeAttendanceDaily._get_collection().find_one_and_update(
+        {'emp_id': emp_id, 'date': day_key(day)},
+        punch_update(check_in, check_out, new_id),
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if raw['_id'] == new_id:
+        increment({attendance_key(raw['date'], raw['status']): 1})
+    if dual_write_enabled():
+        buckets.apply_bucket_punch(emp_id, raw['date'], check_in, check_out, daily_id=raw['_id'])
+    return EmployeeAttendanceDaily._from_son(raw)
+
+
+async def apply_punch_async(emp_id, day, check_in=None, check_out=None):
+    """``apply_punch`` over the async driver, for the ASGI views."""
+    new_id = ObjectId()
+    raw = await aio.collection(EmployeeAttendanceDaily).find_one_and_update(
+        {'emp_id': emp_id, 'date': day_key(day)},
+        punch_update(check_in, check_out, new_id),
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if raw['_id'] == new_id:
+        await increment_async({attendance_key(raw['date'], raw['status']): 1})
+    if dual_write_enabled():
+        await buckets.apply_bucket_punch_async(emp_id, raw['date'], check_in, check_out, daily_id=raw['_id'])
+    return EmployeeAttendanceDaily._from_son(raw)
+
+
+def merge_duplicate_days():
+    """
+    Collapse the daily documents sharing an (emp_id, date) into the oldest
+    one, keeping the earliest check-in and the latest check-out, and delete
+    the rest. Their attendance counters are decremented. Returns the number
+    of documents deleted.
+    """
+    collection = EmployeeAttendanceDaily._get_collection()
+    groups = collection.aggregate([
+        {'$group': {'_id': {'emp_id': '$emp_id', 'date': '$date'}, 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ], allowDiskUse=True)
+    deleted = 0
+    deltas = defaultdict(int)
+    for group in groups:
+        docs = sorted(collection.find({'_id': {'$in': group['ids']}}), key=lambda doc: doc['_id'])
+        records = {}
+        for doc in reversed(docs):
+            records.update(doc.get('records') or {})
+        check_ins = [doc['records']['check_in'] for doc in docs if (doc.get('records') or {}).get('check_in')]
+        check_outs = [doc['records']['check_out'] for doc in docs if (doc.get('records') or {}).get('check_out')]
+        if check_ins:
+            records['check_in'] = min(check_ins)
+        if check_outs:
+            records['check_out'] = max(check_outs)
+        collection.update_one({'_id': docs[0]['_id']}, {'$set': {'records': records}})
+        collection.delete_many({'_id': {'$in': [doc['_id'] for doc in docs[1:]]}})
+        deleted += len(docs) - 1
+        for doc in docs[1:]:
+            if doc.get('status') in ATTENDANCE_STATUSES:
+                deltas[attendance_key(doc['date'], doc['status'])] -= 1
+    increment(deltas)
+    return deleted
+
+
+def parse_punch(punch):
+    """Return ``(emp_id, day, direction, time)`` for one device punch."""
+    if not isinstance(punch, dict):
+        raise ValueError('Punch must be an object.')
+    emp_id = punch.get('employee_id') or punch.get('emp_id')
+    if not emp_id or not isinstance(emp_id, str):
+        raise ValueError('employee_id is required.')
+    direction = DIRECTIONS.get(str(punch.get('direction', '')).lower())
+    if direction is None:
+        raise ValueError('direction must be "in" or "out".')
+    try:
+        timestamp = parser.isoparse(punch.get('timestamp'))
+    except (TypeError, ValueError):
+        raise ValueError('timestamp must be an ISO 8601 date-time.')
+    return emp_id, day_key(timestamp), direction, timestamp.strftime(TIME_FORMAT)
+
+
+def apply_punches(punches):
+    """
+    Apply a batch of device punches with one ``bulk_write``.
+
+    Punches are grouped by (emp_id, date) so each day costs one upsert.
+    Returns ``(accepted, errors, result)`` where ``errors`` lists the index
+    and reason of every rejected punch.
+    """
+    days = {}
+    errors = []
+    accepted = 0
+    for index, punch in enumerate(punches):
+        try:
+            emp_id, day, direction, time = parse_punch(punch)
+        except ValueError as e:
+            errors.append({'index': index, 'detail': str(e)})
+            continue
+        accepted += 1
+        if direction == CHECK_IN:
+            merge_punch(days, emp_id, day, check_in=time)
+        else:
+            merge_punch(days, emp_id, day, check_out=time)
+
+    return accepted, errors, write_days(days)
+
+
+def write_days(days):
+    """
+    Upsert ``{(emp_id, day): [check_in, check_out]}`` with one unordered
+    ``bulk_write`` and count the days it created. Returns the bulk result,
+    or None when there is nothing to write.
+    """
+    if not days:
+        return None
+    keys = list(days)
+    result = EmployeeAttendanceDaily._get_collection().bulk_write(
+        [
+            UpdateOne({'emp_id': emp_id, 'date': day}, punch_update(*days[(emp_id, day)]), upsert=True)
+            for emp_id, day in keys
+        ],
+        ordered=False,
+    )
+    created = defaultdict(int)
+    for index in result.upserted_ids:
+        created[attendance_key(keys[index][1], 'Present')] += 1
+    increment(created)
+    if dual_write_enabled():
+        # Days this write created carry their new daily _id into the bucket.
+        new_ids = {keys[index]: _id for index, _id in result.upserted_ids.items()}
+        buckets.write_bucket_days({key: (*days[key], new_ids.get(key)) for key in keys})
+    return result
+
+
+def merge_punch(days, emp_id, day, check_in=None, check_out=None):
+    """Fold one punch into a ``write_days`` batch (earliest in, latest out)."""
+    times = days.setdefault((emp_id, day), [None, None])
+    if check_in:
+        times[0] = check_in if times[0] is None else min(times[0], check_in)
+    if check_out:
+        times[1] = check_out if times[1] is None else max(times[1], check_out)
+
+
+def month_range(year, month):
+    """First and last day of a calendar month."""
+    last = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last)
+
+
+def attendance_by_day(emp_ids, start, end):
+    """
+    Attendance of ``emp_ids`` between ``start`` and ``end`` (inclusive).
+
+    One range query on the (emp_id, date) index, read through the report
+    alias and returned as
+    ``{emp_id: {'YYYY-MM-DD': {id, status, check_in, check_out}}}``.
+    """
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'Date range is limited to {MAX_RANGE_DAYS} days.')
+    if bucket_reads_enabled():
+        return buckets.attendance_by_day(emp_ids, start, end)
+    emp_ids = list(emp_ids)
+    result = {emp_id: {} for emp_id in emp_ids}
+    if not emp_ids:
+        return result
+    query = {
+        'emp_id': emp_ids[0] if len(emp_ids) == 1 else {'$in': emp_ids},
+        'date': {'$gte': day_key(start), '$lt': day_key(end) + timedelta(days=1)},
+    }
+    projection = {'emp_id': 1, 'date': 1, 'status': 1, 'records': 1}
+    for row in read_collection(EmployeeAttendanceDaily).find(query, projection):
+        records = row.get('records') or {}
+        result[row['emp_id']][row['date'].strftime('%Y-%m-%d')] = {
+            'id': str(row['_id']),
+            'status': row.get('status'),
+            'check_in': records.get('check_in'),
+            'check_out': records.get('check_out'),
+        }
+    return result
@@ -3,8 +3,11 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .authentication import UserRefreshToken, revoke
+
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
@@ -26,7 +29,7 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
         return Response(
             {
                 'access': str(refresh.access_token),
@@ -44,11 +47,20 @@ class LoginView(APIView):
 
 class LogoutView(APIView):
     """
-    Stateless JWT logout – frontend should just drop tokens.
-    Optionally accepts refresh token to blacklist in future.
+    Revoke the access token the request was made with and, when sent as
+    ``refresh``, the refresh token, so neither can be used again.
     """
 
     def post(self, request):
+        if request.auth is not None:
+            revoke(request.auth)
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                revoke(RefreshToken(refresh))
+            except TokenError:
+                # Already expired or not a refresh token: nothing to revoke.
+                pass
         return Response({'detail': 'Logged out.'})
 
 
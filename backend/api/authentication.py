@@ -0,0 +1,211 @@
+"""
+Stateless JWT authentication.
+
+simplejwt's ``JWTAuthentication`` loads the ``User`` row from SQLite on every
+request, which serialises all workers on one file. Tokens issued by
+``LoginView`` (``UserRefreshToken``) carry the user's username, names and
+staff/superuser flags as claims, and ``StatelessJWTAuthentication`` builds a
+``ClaimsUser`` from those signed claims without touching the database.
+
+The DB user is still needed in two cases: tokens issued before the claims
+were added, and code that reads ``request.user.db_user``. Both go through a
+small per-worker TTL cache (``AUTH_USER_CACHE_TTL`` seconds) that is dropped
+whenever a ``User`` is saved or deleted. Deactivating a user takes effect
+when their access token next needs refreshing, since ``TokenRefreshView``
+checks the DB user.
+
+Tokens revoked by ``LogoutView`` are rejected here and by the refresh view;
+see ``api/revocation.py``.
+
+``MetricsTokenAuthentication`` lets a Prometheus scraper read ``/api/metrics``
+with the static ``METRICS_TOKEN`` instead of a user's JWT.
+"""
+import hmac
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import revocation_list
+
+DEFAULT_TTL = 60
+MAX_ENTRIES = 10000
+USER_CLAIMS = ('username', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+
+
+class UserRefreshToken(RefreshToken):
+    """A refresh token (and its access tokens) carrying ``USER_CLAIMS``."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class UserCache:
+    """``user id -> User`` rows, each kept for ``AUTH_USER_CACHE_TTL`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TTL', DEFAULT_TTL)
+
+    def get(self, user_id):
+        """The user with this id, or None if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is not None and now - cached[1] < self.ttl:
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+        user_model = get_user_model()
+        user = user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        with self._lock:
+            if len(self._users) >= MAX_ENTRIES:
+                self._users.clear()
+            self._users[user_id] = (user, now)
+        return user
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                # Token claims hold the id as issued: an int, or a string.
+                self._users.pop(user_id, None)
+                self._users.pop(str(user_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._users), 'hits': self.hits, 'misses': self.misses}
+
+
+_user_cache = UserCache()
+
+
+def user_cache():
+    return _user_cache
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _drop_cached_user(sender, instance, **kwargs):
+    _user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+class ClaimsUser(TokenUser):
+    """The user named by a token's claims; ``db_user`` loads the real row."""
+
+    @property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @property
+    def db_user(self):
+        return _user_cache.get(self.id)
+
+
+def has_user_claims(validated_token):
+    return 'username' in validated_token
+
+
+def is_revoked(token):
+    return revocation_list().is_revoked(token.get(api_settings.JTI_CLAIM, ''))
+
+
+def revoke(token):
+    """Revoke a validated token until it expires."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti:
+        revocation_list().revoke(jti, token['exp'])
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """``TokenRefreshSerializer`` that refuses refresh tokens revoked by ``LogoutView``."""
+
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs['refresh'])):
+            raise TokenError(_('Token is revoked'))
+        return super().validate(attrs)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that trusts the signed claims of tokens issued by
+    ``LoginView`` and falls back to the cached DB user for older tokens.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken(_('Token is revoked'))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if has_user_claims(validated_token):
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+
+        user = _user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class MetricsScraper:
+    """The caller of ``/api/metrics`` authenticated by ``METRICS_TOKEN``."""
+
+    is_authenticated = True
+    is_active = True
+    is_staff = False
+    is_superuser = False
+    username = 'metrics'
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Bearer <METRICS_TOKEN>``. Any other header is left to
+    the next authentication class, so users' JWTs still work.
+    """
+
+    def authenticate(self, request):
+        expected = getattr(settings, 'METRICS_TOKEN', '')
+        if not expected:
+            return None
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {expected}'.encode()):
+            return (MetricsScraper(), None)
+        return None
+
+    def authenticate_header(self, request):
+        # Makes DRF answer 401 rather than 403 when neither class authenticates.
+        return 'Bearer realm="api"'
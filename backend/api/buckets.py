@@ -0,0 +1,207 @@
+"""
+Per-employee-month attendance buckets (``EmployeeAttendanceMonth``).
+
+``EmployeeAttendanceDaily`` keeps one document, and one index entry, per
+employee per day, so a month view reads ~30 documents per person. A bucket
+holds an employee's whole month as a positional array: ``days[n]`` is day
+``n + 1`` and is ``{}`` until that day has attendance, then
+``{'a': <daily _id>, 'i': check_in, 'o': check_out}`` plus ``'s'`` for a
+status other than Present. Punches update a day in place with the same
+``$min`` / ``$max`` semantics as the daily documents.
+
+Cutover:
+
+1. ``ATTENDANCE_DUAL_WRITE=True``: every punch path (single, async, bulk and
+   write-behind) also writes the bucket; daily stays the system of record
+   for the per-day endpoints and the dashboard counters.
+2. ``manage.py migrate_attendance_buckets`` backfills buckets from the daily
+   documents in ``_id`` batches. It merges with ``$min`` / ``$max``, so it is
+   safe to run while dual-writing, and can be resumed with ``--after``.
+3. ``ATTENDANCE_MONTH_READS=buckets``: the attendance range view and payroll
+   read buckets, one document per employee per month.
+
+A new bucket is created with every day slot pre-allocated, which needs its
+own upsert (it would conflict with the day update), so a punch for a month
+that has no bucket yet costs one extra write.
+"""
+import calendar
+from datetime import date, datetime
+
+from pymongo import UpdateOne
+
+from . import aio
+from .models import EmployeeAttendanceMonth
+from .mongo import read_collection
+
+BUCKET_READS = 'buckets'
+DAILY_READS = 'daily'
+
+
+def month_key(day):
+    """The bucket key of a day: midnight on the first of its month."""
+    return datetime(day.year, day.month, 1)
+
+
+def empty_days(month):
+    return [{} for _ in range(calendar.monthrange(month.year, month.month)[1])]
+
+
+def bucket_filter(emp_id, day):
+    return {'emp_id': emp_id, 'month': month_key(day)}
+
+
+def create_bucket(emp_id, day):
+    """Upsert that creates the bucket for ``day``'s month if there is none."""
+    month = month_key(day)
+    return UpdateOne(
+        {'emp_id': emp_id, 'month': month},
+        {'$setOnInsert': {'days': empty_days(month)}},
+        upsert=True,
+    )
+
+
+def day_update(day, check_in=None, check_out=None, daily_id=None, status=None):
+    slot = f'days.{day.day - 1}'
+    update = {}
+    if check_in:
+        update['$min'] = {f'{slot}.i': check_in}
+    if check_out:
+        update['$max'] = {f'{slot}.o': check_out}
+    assigned = {}
+    if daily_id is not None:
+        assigned[f'{slot}.a'] = daily_id
+    if status and status != 'Present':
+        assigned[f'{slot}.s'] = status
+    if assigned:
+        update['$set'] = assigned
+    return update
+
+
+def day_record(entry):
+    """A bucket day as ``attendance_by_day`` returns it, or None for an empty slot."""
+    if not entry:
+        return None
+    return {
+        'id': str(entry['a']) if entry.get('a') else None,
+        'status': entry.get('s', 'Present'),
+        'check_in': entry.get('i'),
+        'check_out': entry.get('o', ''),
+    }
+
+
+# -- writes -------------------------------------------------------------------
+
+
+def apply_bucket_punch(emp_id, day, check_in=None, check_out=None, daily_id=None):
+    """Apply one punch to its bucket, creating the bucket when needed."""
+    update = day_update(day, check_in, check_out, daily_id)
+    if not update:
+        return
+    collection = EmployeeAttendanceMonth._get_collection()
+    if collection.update_one(bucket_filter(emp_id, day), update).matched_count:
+        return
+    collection.bulk_write([create_bucket(emp_id, day), UpdateOne(bucket_filter(emp_id, day), update)])
+
+
+async def apply_bucket_punch_async(emp_id, day, check_in=None, check_out=None, daily_id=None):
+    update = day_update(day, check_in, check_out, daily_id)
+    if not update:
+        return
+    collection = aio.collection(EmployeeAttendanceMonth)
+    if (await collection.update_one(bucket_filter(emp_id, day), update)).matched_count:
+        return
+    await collection.bulk_write([create_bucket(emp_id, day), UpdateOne(bucket_filter(emp_id, day), update)])
+
+
+def bucket_operations(days):
+    """
+    Bulk operations applying ``{(emp_id, day): (check_in, check_out, daily_id, status)}``:
+    one bucket-creating upsert per (emp_id, month), then one update per day.
+    Must run as an ordered ``bulk_write``.
+    """
+    creates, updates = {}, []
+    for (emp_id, day), values in days.items():
+        update = day_update(day, *values)
+        if not update:
+            continue
+        creates.setdefault((emp_id, month_key(day)), create_bucket(emp_id, day))
+        updates.append(UpdateOne(bucket_filter(emp_id, day), update))
+    return list(creates.values()) + updates
+
+
+def write_bucket_days(days):
+    operations = bucket_operations(days)
+    if operations:
+        EmployeeAttendanceMonth._get_collection().bulk_write(operations, ordered=True)
+
+
+def migrate_rows(rows):
+    """Merge raw ``EmployeeAttendanceDaily`` rows into their buckets; returns the days written."""
+    days = {}
+    for row in rows:
+        records = row.get('records') or {}
+        days[(row['emp_id'], row['date'])] = (
+            records.get('check_in') or None,
+            records.get('check_out') or None,
+            row['_id'],
+            row.get('status'),
+        )
+    write_bucket_days(days)
+    return len(days)
+
+
+# -- reads ----------------------------------------------------------------------
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def find_buckets(emp_ids, start, end, projection=None):
+    emp_ids = list(emp_ids)
+    query = {
+        'emp_id': emp_ids[0] if len(emp_ids) == 1 else {'$in': emp_ids},
+        'month': {'$gte': month_key(start), '$lte': month_key(end)},
+    }
+    return read_collection(EmployeeAttendanceMonth).find(query, projection or {'emp_id': 1, 'month': 1, 'days': 1})
+
+
+def iter_days(bucket, start, end):
+    """Yield ``(date, entry)`` for the non-empty days of ``bucket`` within [start, end]."""
+    month = bucket['month']
+    for index, entry in enumerate(bucket.get('days') or ()):
+        if entry:
+            day = date(month.year, month.month, index + 1)
+            if start <= day <= end:
+                yield day, entry
+
+
+def attendance_by_day(emp_ids, start, end):
+    """``api.attendance.attendance_by_day`` read from buckets."""
+    start, end = _as_date(start), _as_date(end)
+    emp_ids = list(emp_ids)
+    result = {emp_id: {} for emp_id in emp_ids}
+    if not emp_ids:
+        return result
+    for bucket in find_buckets(emp_ids, start, end):
+        days = result[bucket['emp_id']]
+        for day, entry in iter_days(bucket, start, end):
+            days[day.strftime('%Y-%m-%d')] = day_record(entry)
+    return result
+
+
+def attendance_totals(emp_ids, start, end):
+    """``{emp_id: (present_days, halfdays)}`` between ``start`` and ``end``."""
+    start, end = _as_date(start), _as_date(end)
+    totals = {}
+    if not emp_ids:
+        return totals
+    for bucket in find_buckets(emp_ids, start, end):
+        present = half = 0
+        for _, entry in iter_days(bucket, start, end):
+            status = entry.get('s', 'Present')
+            present += status == 'Present'
+            half += status == 'Halfday'
+        previous = totals.get(bucket['emp_id'], (0, 0))
+        totals[bucket['emp_id']] = (previous[0] + present, previous[1] + half)
+    return totals
@@ -0,0 +1,198 @@
+"""
+Bulk employee import.
+
+Rows are read from a streamed CSV or NDJSON upload and processed in chunks:
+every chunk checks email / emp_id uniqueness with one query, validates its
+references against the reference cache in bulk and is written with one
+unordered ``insert_many``. Only one chunk is held in memory at a time.
+"""
+import codecs
+import csv
+import json
+from collections import Counter
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from mongoengine import ValidationError
+from mongoengine.queryset.visitor import Q
+from pymongo.errors import BulkWriteError
+
+from .cache import reference_cache
+from .counters import employee_deltas, increment
+from .models import Branch, Department, Designation, Employee, Location
+from .search import employee_search_index
+from .versions import bump_version
+
+DEFAULT_CHUNK_SIZE = 1000
+
+CSV_CONTENT_TYPES = ('text/csv',)
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+REFERENCE_FIELDS = (
+    ('designation', Designation),
+    ('department', Department),
+    ('location', Location),
+    ('branch', Branch),
+)
+REQUIRED_FIELDS = ('name', 'emp_id', 'email')
+
+FALSE_VALUES = {'false', '0', 'no', 'inactive'}
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def read_rows(stream, content_type):
+    """
+    Yield ``(row_number, dict)`` from an uploaded CSV or NDJSON stream.
+    Parameters of the content type (``; charset=utf-8``) are ignored; CSV is
+    read as UTF-8.
+    """
+    if stream is None:
+        return
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+        for number, row in enumerate(reader, 1):
+            yield number, row
+    elif content_type in NDJSON_CONTENT_TYPES:
+        number = 0
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    else:
+        raise UnsupportedFormat(content_type)
+
+
+def _parse_status(value):
+    if value is None or value == '':
+        return True
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in FALSE_VALUES
+
+
+def _clean(row):
+    """Turn an uploaded row into an employee document, or raise ValueError."""
+    if row is None:
+        raise ValueError('Row is not a JSON object.')
+    doc = {}
+    for field in REQUIRED_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if not value:
+            raise ValueError(f'{field} is required.')
+        try:
+            Employee._fields[field].validate(value)
+        except ValidationError as e:
+            raise ValueError(f'{field}: {e.message}')
+        doc[field] = value
+    for field, _model in REFERENCE_FIELDS:
+        try:
+            doc[field] = ObjectId(row.get(field))
+        except (InvalidId, TypeError):
+            raise ValueError(f'Invalid {field} ID.')
+    doc['emp_status'] = _parse_status(row.get('status'))
+    try:
+        doc['basic_salary'] = float(row.get('basic_salary') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('basic_salary must be a number.')
+    return doc
+
+
+class EmployeeImport:
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or getattr(settings, 'EMPLOYEE_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        self.received = 0
+        self.inserted = 0
+        self.errors = []
+        self._seen_emails = set()
+        self._seen_emp_ids = set()
+
+    def run(self, rows):
+        chunk = []
+        for number, row in rows:
+            self.received += 1
+            try:
+                chunk.append((number, _clean(row)))
+            except ValueError as e:
+                self.errors.append({'row': number, 'detail': str(e)})
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._write_chunk(chunk)
+        return self.report()
+
+    def report(self):
+        self.errors.sort(key=lambda error: error['row'])
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+    def _reject(self, number, detail):
+        self.errors.append({'row': number, 'detail': detail})
+
+    def _write_chunk(self, chunk):
+        emails = {doc['email'] for _, doc in chunk}
+        emp_ids = {doc['emp_id'] for _, doc in chunk}
+        taken_emails, taken_emp_ids = set(), set()
+        for row in Employee.objects(Q(email__in=list(emails)) | Q(emp_id__in=list(emp_ids))).only(
+            'email', 'emp_id'
+        ).as_pymongo():
+            taken_emails.add(row.get('email'))
+            taken_emp_ids.add(row.get('emp_id'))
+
+        missing = {
+            field: reference_cache(model).missing(doc[field] for _, doc in chunk)
+            for field, model in REFERENCE_FIELDS
+        }
+
+        accepted = []
+        for number, doc in chunk:
+            if doc['email'] in taken_emails or doc['email'] in self._seen_emails:
+                self._reject(number, 'Employee with this email already exists.')
+                continue
+            if doc['emp_id'] in taken_emp_ids or doc['emp_id'] in self._seen_emp_ids:
+                self._reject(number, 'Employee with this Emp ID already exists.')
+                continue
+            invalid = next((field for field, _ in REFERENCE_FIELDS if doc[field] in missing[field]), None)
+            if invalid:
+                self._reject(number, f'Invalid {invalid} ID.')
+                continue
+            self._seen_emails.add(doc['email'])
+            self._seen_emp_ids.add(doc['emp_id'])
+            accepted.append((number, doc))
+
+        if not accepted:
+            return
+        failed = set()
+        try:
+            Employee._get_collection().insert_many([doc for _, doc in accepted], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                failed.add(error['index'])
+                self._reject(accepted[error['index']][0], error.get('errmsg', 'Write failed.'))
+        self.inserted += len(accepted) - len(failed)
+
+        inserted = [doc for index, (_, doc) in enumerate(accepted) if index not in failed]
+        deltas = Counter()
+        for doc in inserted:
+            deltas.update(employee_deltas(after=doc))
+        increment(deltas)
+        employee_search_index().upsert_many(inserted)
+        if inserted:
+            bump_version(Employee)
@@ -0,0 +1,201 @@
+"""
+Process-local cache of the small reference collections.
+
+Departments, designations, locations and branches are tiny and rarely
+change, yet every employee write used to check each reference with its own
+query. Each collection is cached here as an ``_id -> name`` snapshot loaded
+with one query, kept for ``REFERENCE_CACHE_TTL`` seconds and dropped by the
+create/update/delete views of that collection.
+
+Those views drop the snapshot of their own process only; other workers see
+the write through the collection's version stamp (``api/versions.py``),
+which each cache re-reads at most every ``REFERENCE_CACHE_VERSION_CHECK``
+seconds and reloads on when it moved. A rename or delete made in another
+worker is therefore seen within that many seconds (writes that bypass the
+views, within ``REFERENCE_CACHE_TTL``).
+
+A snapshot is only kept while the collection has at most
+``REFERENCE_CACHE_MAX_ENTRIES`` documents; larger collections fall back to a
+direct lookup per id. An id missing from a fresh snapshot is also checked
+against the database once, so documents created by another worker are not
+rejected before the snapshot expires.
+"""
+import threading
+import time
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+
+from .models import Branch, Department, Designation, Location
+from .versions import current_versions
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_VERSION_CHECK = 5
+
+
+class ReferenceCache:
+    def __init__(self, model, name_field):
+        self.model = model
+        self.name_field = name_field
+        self._lock = threading.Lock()
+        self._names = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._stamp = None
+        self._oversized = False
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'REFERENCE_CACHE_TTL', DEFAULT_TTL)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'REFERENCE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+    @property
+    def version_check(self):
+        return getattr(settings, 'REFERENCE_CACHE_VERSION_CHECK', DEFAULT_VERSION_CHECK)
+
+    def _current_stamp(self):
+        name = self.model._get_collection_name()
+        return current_versions([name])[name]
+
+    def _fresh(self, now):
+        """True if the snapshot is within its TTL and the collection's stamp has not moved."""
+        if now - self._loaded_at >= self.ttl:
+            return False
+        if now - self._checked_at < self.version_check:
+            return True
+        self._checked_at = now
+        return self._current_stamp() == self._stamp
+
+    def _snapshot(self):
+        """Return the current ``_id -> name`` map, reloading it if stale."""
+        with self._lock:
+            if self._fresh(time.monotonic()):
+                return None if self._oversized else self._names
+            # The stamp is read before the documents: a write in between
+            # leaves an older stamp and triggers one extra reload.
+            self._stamp = self._current_stamp()
+            rows = list(
+                self.model.objects.only(self.name_field).limit(self.max_entries + 1).as_pymongo()
+            )
+            self.loads += 1
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._oversized = len(rows) > self.max_entries
+            self._names = None if self._oversized else {row['_id']: row.get(self.name_field) for row in rows}
+            return self._names
+
+    def _fetch(self, oid):
+        """Load one id from the database, remembering it in the snapshot."""
+        row = self.model.objects(id=oid).only(self.name_field).as_pymongo().first()
+        if row is None:
+            return None
+        with self._lock:
+            if self._names is not None and len(self._names) < self.max_entries:
+                self._names[oid] = row.get(self.name_field)
+        return row
+
+    def exists(self, value):
+        """True if a document with this id exists. Malformed ids are False."""
+        try:
+            oid = ObjectId(value)
+        except (InvalidId, TypeError):
+            return False
+        names = self._snapshot()
+        if names is not None and oid in names:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return self._fetch(oid) is not None
+
+    def missing(self, oids):
+        """
+        Return the subset of ``oids`` (ObjectIds) that do not exist.
+
+        Ids absent from the snapshot are checked with a single ``$in`` query.
+        """
+        oids = set(oids)
+        names = self._snapshot()
+        unknown = oids if names is None else {oid for oid in oids if oid not in names}
+        self.hits += len(oids) - len(unknown)
+        if not unknown:
+            return set()
+        self.misses += len(unknown)
+        rows = list(self.model.objects(id__in=list(unknown)).only(self.name_field).as_pymongo())
+        with self._lock:
+            if self._names is not None and len(self._names) + len(rows) <= self.max_entries:
+                self._names.update((row['_id'], row.get(self.name_field)) for row in rows)
+        return unknown - {row['_id'] for row in rows}
+
+    def name_of(self, value):
+        """The display name for an id, or None if it does not exist."""
+        try:
+            oid = ObjectId(value)
+        except (InvalidId, TypeError):
+            return None
+        names = self._snapshot()
+        if names is not None and oid in names:
+            self.hits += 1
+            return names[oid]
+        self.misses += 1
+        row = self._fetch(oid)
+        return row.get(self.name_field) if row else None
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+            self._loaded_at = self._checked_at = 0.0
+            self._stamp = None
+            self._oversized = False
+
+    def reset(self):
+        self.invalidate()
+        self.hits = self.misses = self.loads = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'loads': self.loads,
+            'size': len(self._names) if self._names is not None else 0,
+            'oversized': self._oversized,
+        }
+
+
+reference_caches = {
+    Department: ReferenceCache(Department, 'name'),
+    Designation: ReferenceCache(Designation, 'designation_name'),
+    Location: ReferenceCache(Location, 'location_name'),
+    Branch: ReferenceCache(Branch, 'branch_name'),
+}
+
+
+def reference_cache(model):
+    return reference_caches[model]
+
+
+def invalid_reference(references):
+    """
+    Validate ``{field: (model, id)}`` against the cache.
+
+    Returns the first field whose id does not exist, or None if all do.
+    """
+    for field, (model, value) in references.items():
+        if not reference_caches[model].exists(value):
+            return field
+    return None
+
+
+def cache_stats():
+    return {cache.model._get_collection_name(): cache.stats() for cache in reference_caches.values()}
+
+
+def reset_reference_caches():
+    for cache in reference_caches.values():
+        cache.reset()
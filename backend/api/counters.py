@@ -0,0 +1,124 @@
+"""
+Incrementally maintained dashboard counters.
+
+Every employee and attendance write adjusts a handful of counter documents
+in ``dashboard_counters`` with atomic ``$inc`` upserts, so the dashboard
+summary reads a few small documents instead of scanning employees and
+attendance. Keys:
+
+* ``employees:total``, ``employees:active``, ``employees:inactive``
+* ``department:<id>``, ``location:<id>``, ``branch:<id>`` (headcount)
+* ``attendance:<YYYY-MM-DD>:<status>`` (daily documents per status)
+
+``python manage.py rebuild_dashboard_counters`` recomputes all of them from
+scratch and reports any drift.
+"""
+from collections import Counter
+
+from pymongo import DeleteOne, UpdateOne
+
+from . import aio
+from .models import DashboardCounter, Employee, EmployeeAttendanceDaily
+
+HEADCOUNT_FIELDS = ('department', 'location', 'branch')
+ATTENDANCE_STATUSES = ('Present', 'Absent', 'Halfday')
+
+
+def attendance_key(day, status):
+    return f'attendance:{day:%Y-%m-%d}:{status}'
+
+
+def employee_values(employee):
+    """The counted fields of an Employee document, as a plain dict."""
+    return {field: getattr(employee, field) for field in HEADCOUNT_FIELDS + ('emp_status',)}
+
+
+def employee_keys(values):
+    # A missing/None emp_status reads back as the field default (active).
+    keys = ['employees:total', 'employees:inactive' if values.get('emp_status') is False else 'employees:active']
+    for field in HEADCOUNT_FIELDS:
+        if values.get(field):
+            keys.append(f'{field}:{values[field]}')
+    return keys
+
+
+def employee_deltas(before=None, after=None):
+    """Counter changes for an employee going from ``before`` to ``after``."""
+    deltas = Counter()
+    if before:
+        deltas.subtract(employee_keys(before))
+    if after:
+        deltas.update(employee_keys(after))
+    return deltas
+
+
+def increment_operations(deltas):
+    return [
+        UpdateOne({'_id': key}, {'$inc': {'value': delta}}, upsert=True)
+        for key, delta in deltas.items()
+        if delta
+    ]
+
+
+def increment(deltas):
+    """Apply ``{key: delta}`` with one unordered bulk of ``$inc`` upserts."""
+    operations = increment_operations(deltas)
+    if operations:
+        DashboardCounter._get_collection().bulk_write(operations, ordered=False)
+
+
+async def increment_async(deltas):
+    operations = increment_operations(deltas)
+    if operations:
+        await aio.collection(DashboardCounter).bulk_write(operations, ordered=False)
+
+
+def record_employee_change(before=None, after=None):
+    increment(employee_deltas(before, after))
+
+
+def read_counters(keys=None, prefixes=()):
+    """Return ``{key: value}`` for the given keys and key prefixes."""
+    clauses = []
+    if keys:
+        clauses.append({'_id': {'$in': list(keys)}})
+    for prefix in prefixes:
+        clauses.append({'_id': {'$regex': f'^{prefix}'}})
+    if not clauses:
+        return {}
+    query = clauses[0] if len(clauses) == 1 else {'$or': clauses}
+    return {row['_id']: row.get('value', 0) for row in DashboardCounter._get_collection().find(query)}
+
+
+def compute_counters():
+    """Recompute every counter from the employees and attendance collections."""
+    counters = Counter()
+    fields = {field: 1 for field in HEADCOUNT_FIELDS + ('emp_status',)}
+    for row in Employee._get_collection().find({}, fields):
+        counters.update(employee_keys(row))
+    pipeline = [{'$group': {'_id': {'date': '$date', 'status': '$status'}, 'count': {'$sum': 1}}}]
+    for row in EmployeeAttendanceDaily._get_collection().aggregate(pipeline):
+        if row['_id'].get('status') and row['_id'].get('date'):
+            counters[attendance_key(row['_id']['date'], row['_id']['status'])] += row['count']
+    return counters
+
+
+def counter_drift():
+    """``{key: (stored, actual)}`` for every counter that is wrong."""
+    actual = compute_counters()
+    stored = {row['_id']: row.get('value', 0) for row in DashboardCounter._get_collection().find()}
+    return {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in set(actual) | set(stored)
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+
+
+def rebuild_counters(drift):
+    """Overwrite the drifted counters with their recomputed values."""
+    operations = [
+        DeleteOne({'_id': key}) if value == 0 else UpdateOne({'_id': key}, {'$set': {'value': value}}, upsert=True)
+        for key, (_, value) in drift.items()
+    ]
+    if operations:
+        DashboardCounter._get_collection().bulk_write(operations, ordered=False)
@@ -0,0 +1,128 @@
+"""
+Index builds and query-plan verification.
+
+Indexes are declared in each model's ``meta``; ``ensure_indexes`` builds
+them. ``QUERY_CATALOGUE`` lists the query shapes the views issue, with
+sample values, so ``manage.py ensure_indexes`` can ``explain()`` each one
+and fail on collection scans. Add an entry here whenever a view gains a
+new query.
+"""
+from datetime import datetime
+
+from bson import ObjectId
+
+from .models import (
+    Branch,
+    CollectionVersion,
+    DashboardCounter,
+    Department,
+    Designation,
+    Employee,
+    EmployeeAttendanceDaily,
+    EmployeeAttendanceMonth,
+    Location,
+    Payroll,
+    RevokedToken,
+)
+
+MODELS = (
+    Employee,
+    Department,
+    Designation,
+    Location,
+    Branch,
+    EmployeeAttendanceDaily,
+    EmployeeAttendanceMonth,
+    Payroll,
+    DashboardCounter,
+    CollectionVersion,
+    RevokedToken,
+)
+
+_OID = ObjectId()
+_DAY = datetime(2025, 1, 6)
+
+# (label, model, filter, sort)
+QUERY_CATALOGUE = [
+    ('employee list page', Employee, {'_id': {'$gt': _OID}}, [('_id', 1)]),
+    ('employee by id', Employee, {'_id': _OID}, None),
+    ('employee by email', Employee, {'email': 'someone@example.com'}, None),
+    ('employee by emp_id', Employee, {'emp_id': 'E00001'}, None),
+    (
+        'employee bulk uniqueness',
+        Employee,
+        {'$or': [{'email': {'$in': ['a@example.com']}}, {'emp_id': {'$in': ['E00001']}}]},
+        None,
+    ),
+    ('employees by department', Employee, {'department': _OID}, None),
+    ('employees by designation', Employee, {'designation': _OID}, None),
+    ('employees by location', Employee, {'location': _OID}, None),
+    ('employees by branch', Employee, {'branch': _OID}, None),
+    ('department list page', Department, {'_id': {'$gt': _OID}}, [('_id', 1)]),
+    ('departments by id batch', Department, {'_id': {'$in': [_OID]}}, None),
+    ('designation list page', Designation, {'_id': {'$gt': _OID}}, [('_id', 1)]),
+    ('location list page', Location, {'_id': {'$gt': _OID}}, [('_id', 1)]),
+    ('locations by id batch', Location, {'_id': {'$in': [_OID]}}, None),
+    ('branch list page', Branch, {'_id': {'$gt': _OID}}, [('_id', 1)]),
+    ('attendance by emp_id and date', EmployeeAttendanceDaily, {'emp_id': 'E00001', 'date': _DAY}, None),
+    (
+        'attendance range for a department',
+        EmployeeAttendanceDaily,
+        {'emp_id': {'$in': ['E00001', 'E00002']}, 'date': {'$gte': _DAY, '$lt': datetime(2025, 2, 1)}},
+        None,
+    ),
+    ('attendance bucket by emp_id and month', EmployeeAttendanceMonth, {'emp_id': 'E00001', 'month': _DAY}, None),
+    (
+        'attendance buckets for a department',
+        EmployeeAttendanceMonth,
+        {'emp_id': {'$in': ['E00001', 'E00002']}, 'month': {'$gte': _DAY, '$lte': datetime(2025, 2, 1)}},
+        None,
+    ),
+    ('payroll for a month', Payroll, {'year': 2025, 'month': 1}, None),
+    ('payroll for a department month', Payroll, {'year': 2025, 'month': 1, 'department': _OID}, None),
+    ('payroll list page', Payroll, {'year': 2025, 'month': 1, '_id': {'$gt': _OID}}, [('_id', 1)]),
+    ('collection versions', CollectionVersion, {'_id': {'$in': ['employees', 'departments']}}, None),
+    (
+        'dashboard counters',
+        DashboardCounter,
+        {'$or': [{'_id': {'$in': ['employees:total']}}, {'_id': {'$regex': '^department:'}}]},
+        None,
+    ),
+    ('unexpired revoked tokens', RevokedToken, {'expires_at': {'$gt': _DAY}}, None),
+    ('tokens revoked since', RevokedToken, {'revoked_at': {'$gte': _DAY}}, None),
+]
+
+
+def ensure_indexes(model, background=True):
+    """Build every index declared in ``model``'s meta; return their names."""
+    collection = model._get_collection()
+    names = []
+    for spec in model._meta['index_specs']:
+        options = dict(spec)
+        fields = options.pop('fields')
+        options.pop('cls', None)
+        names.append(collection.create_index(fields, background=background, **options))
+    return names
+
+
+def plan_stages(plan):
+    """Yield every ``stage`` name in an ``explain()`` plan tree."""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def explain(model, query, sort=None):
+    cursor = model._get_collection().find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor.explain()
+
+
+def winning_stages(explanation):
+    return list(plan_stages(explanation.get('queryPlanner', {}).get('winningPlan', {})))
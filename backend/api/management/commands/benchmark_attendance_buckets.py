@@ -0,0 +1,161 @@
+"""
+Compare the daily and month-bucket attendance layouts: document and index
+sizes, and the latency of month reads.
+
+Run with: python manage.py benchmark_attendance_buckets --mongomock --employees 500 --months 3
+(without --mongomock it seeds, and then drops, both attendance collections
+of the configured database)
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import bson
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from pymongo.errors import OperationFailure
+
+from api.attendance import attendance_by_day, month_range
+from api.buckets import migrate_rows
+from api.models import EmployeeAttendanceDaily, EmployeeAttendanceMonth
+
+from .benchmark_conditional_get import use_mongomock
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def seed_daily(employees, months, rng):
+    """Insert a working month (weekdays, ~95% attendance) per employee per month."""
+    rows = []
+    first = date(2025, 1, 1)
+    for month in range(months):
+        start, end = month_range(2025, first.month + month)
+        day = start
+        while day <= end:
+            if day.weekday() < 5:
+                for emp in range(employees):
+                    if rng.random() < 0.95:
+                        rows.append({
+                            '_id': ObjectId(),
+                            'emp_id': f'E{emp:06d}',
+                            'date': datetime(day.year, day.month, day.day),
+                            'status': 'Present',
+                            'records': {
+                                'check_in': f'09:{rng.randint(0, 59):02d}:00',
+                                'check_out': f'18:{rng.randint(0, 59):02d}:00',
+                            },
+                        })
+            day += timedelta(days=1)
+    collection = EmployeeAttendanceDaily._get_collection()
+    for offset in range(0, len(rows), 10000):
+        collection.insert_many(rows[offset:offset + 10000])
+    return rows
+
+
+def layout_sizes(model, key_fields):
+    """Documents, index entries and sizes of one layout's collection."""
+    collection = model._get_collection()
+    try:
+        stats = collection.database.command({'collStats': collection.name})
+        return {
+            'documents': stats['count'],
+            'index_entries': stats['count'] * stats['nindexes'],
+            'data_bytes': stats['size'],
+            'index_bytes': stats['totalIndexSize'],
+            'estimated': False,
+        }
+    except (OperationFailure, NotImplementedError, KeyError):
+        pass
+    # No collStats (mongomock): BSON sizes of the documents and of the keys
+    # of the _id index and the unique compound index.
+    documents = data_bytes = index_bytes = 0
+    for row in collection.find():
+        documents += 1
+        data_bytes += len(bson.encode(row))
+        index_bytes += len(bson.encode({'_id': row['_id']}))
+        index_bytes += len(bson.encode({field: row[field] for field in key_fields}))
+    return {
+        'documents': documents,
+        'index_entries': documents * 2,
+        'data_bytes': data_bytes,
+        'index_bytes': index_bytes,
+        'estimated': True,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Seed daily attendance, migrate it to month buckets and compare sizes and month-read latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=500)
+        parser.add_argument('--months', type=int, default=3)
+        parser.add_argument('--department-size', type=int, default=50)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--mongomock', action='store_true', help='Run against an in-memory database.')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['months'] <= 12:
+            raise CommandError('--months must be between 1 and 12.')
+        if options['mongomock']:
+            use_mongomock()
+        rng = random.Random(options['seed'])
+        EmployeeAttendanceDaily.drop_collection()
+        EmployeeAttendanceMonth.drop_collection()
+        for model in (EmployeeAttendanceDaily, EmployeeAttendanceMonth):
+            model.ensure_indexes()
+
+        rows = seed_daily(options['employees'], options['months'], rng)
+        started = time.perf_counter()
+        for offset in range(0, len(rows), 1000):
+            migrate_rows(rows[offset:offset + 1000])
+        migrate_secs = time.perf_counter() - started
+
+        sizes = {
+            'daily': layout_sizes(EmployeeAttendanceDaily, ('emp_id', 'date')),
+            'buckets': layout_sizes(EmployeeAttendanceMonth, ('emp_id', 'month')),
+        }
+
+        emp_ids = [f'E{emp:06d}' for emp in range(options['employees'])]
+        size = min(options['department_size'], len(emp_ids))
+        queries = []
+        for _ in range(options['queries']):
+            start, end = month_range(2025, rng.randint(1, options['months']))
+            if rng.random() < 0.5:
+                queries.append(([rng.choice(emp_ids)], start, end))
+            else:
+                offset = rng.randrange(0, len(emp_ids) - size + 1)
+                queries.append((emp_ids[offset:offset + size], start, end))
+
+        latencies = {}
+        for layout in ('daily', 'buckets'):
+            timings = []
+            with override_settings(ATTENDANCE_MONTH_READS=layout):
+                for query in queries:
+                    begun = time.perf_counter()
+                    attendance_by_day(*query)
+                    timings.append((time.perf_counter() - begun) * 1000)
+            latencies[layout] = sorted(timings)
+
+        self.stdout.write(
+            f'{options["employees"]} employees x {options["months"]} months: {len(rows)} attendance days, '
+            f'migrated in {migrate_secs * 1000:.0f} ms'
+        )
+        for layout, stats in sizes.items():
+            note = ' (estimated)' if stats['estimated'] else ''
+            self.stdout.write(
+                f'  {layout:<8}: {stats["documents"]:>8} docs  {stats["index_entries"]:>8} index entries  '
+                f'{stats["index_bytes"] / 1e6:>7.2f} MB indexes{note}  {stats["data_bytes"] / 1e6:>7.2f} MB data'
+            )
+        for layout, timings in latencies.items():
+            self.stdout.write(
+                f'  {layout:<8}: month read p50 {percentile(timings, 0.5):>8.2f} ms  '
+                f'p99 {percentile(timings, 0.99):>8.2f} ms'
+            )
+
+        EmployeeAttendanceDaily.drop_collection()
+        EmployeeAttendanceMonth.drop_collection()
+
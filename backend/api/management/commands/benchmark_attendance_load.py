@@ -0,0 +1,163 @@
+"""
+Load-test the attendance check-in hot path, sync (WSGI) against async (ASGI).
+
+Start the same code base under both servers, pointing at the same Mongo,
+for example:
+
+    gunicorn backend.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+    uvicorn backend.asgi:application --workers 4 --port 8001
+
+then run:
+
+    python manage.py benchmark_attendance_load --username admin \
+        --sync-url http://127.0.0.1:8000 --async-url http://127.0.0.1:8001 --clients 1000
+
+Every client holds its own connection and posts check-ins back to back for
+its own employee id; requests/sec and latency percentiles are reported per
+target. The HTTP client is a minimal asyncio HTTP/1.1 client so the
+benchmark has no extra dependencies.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+PATHS = {
+    'sync': '/api/employee_attendance-check_in/',
+    'async': '/api/async/employee_attendance-check_in/',
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection that reconnects when the server closes it."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+    async def post(self, path, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = f'POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Length: {len(body)}\r\n'
+        head += ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        self.writer.write(head.encode() + b'\r\n' + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by server')
+        status = int(status_line.split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and value.lower() == 'close':
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return status
+
+
+async def run_client(index, url, path, token, requests, latencies, errors):
+    parts = urlsplit(url)
+    connection = Connection(parts.hostname, parts.port or 80)
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    try:
+        for i in range(requests):
+            body = json.dumps({
+                'employee_id': f'LOAD{index:05d}',
+                'date': '2025-01-06',
+                'check_in': f'09:{i % 60:02d}:00',
+            }).encode()
+            started = time.perf_counter()
+            try:
+                status = await connection.post(path, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                await connection.close()
+                errors.append('connection')
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        await connection.close()
+
+
+async def run_target(url, path, token, clients, requests):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(i, url, path, token, requests, latencies, errors) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies) + errors.count('connection'),
+        'errors': len(errors),
+        'elapsed_s': round(elapsed, 2),
+        'requests_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/sec and p99 latency of the sync and async check-in views under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='User to mint the JWT access token for.')
+        parser.add_argument('--sync-url', help='Base URL of the WSGI server.')
+        parser.add_argument('--async-url', help='Base URL of the ASGI server.')
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=20, help='Requests per client.')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user named {options["username"]!r}.')
+        token = str(RefreshToken.for_user(user).access_token)
+
+        targets = [(kind, options[f'{kind}_url']) for kind in PATHS if options[f'{kind}_url']]
+        if not targets:
+            raise CommandError('Pass --sync-url and/or --async-url.')
+
+        results = {}
+        for kind, url in targets:
+            results[kind] = asyncio.run(
+                run_target(url.rstrip('/'), PATHS[kind], token, options['clients'], options['requests'])
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{options["clients"]} clients x {options["requests"]} check-ins')
+        for kind, result in results.items():
+            self.stdout.write(
+                f'  {kind:<5}: {result["requests_per_s"]:>8.1f} req/s  p50 {result["p50_ms"]:>7.1f} ms  '
+                f'p99 {result["p99_ms"]:>7.1f} ms  errors {result["errors"]}'
+            )
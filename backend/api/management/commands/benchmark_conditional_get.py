@@ -0,0 +1,134 @@
+"""
+Measure what conditional GETs save for clients polling an unchanged list.
+
+Run with: python manage.py benchmark_conditional_get --mongomock --employees 5000
+(without --mongomock it polls the configured database as it is; --mongomock needs
+requirements-dev.txt)
+"""
+import time
+
+import mongoengine
+from bson import ObjectId
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from api.models import Branch, Department, Designation, Employee, Location
+
+
+class AsyncCollection:
+    """Awaitable facade over a mongomock collection, in place of pymongo's async driver."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+    def find(self, *args, **kwargs):
+        rows = list(self._collection.find(*args, **kwargs))
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return rows
+        return Cursor()
+
+
+def use_mongomock():
+    """
+    Point the default and report aliases, and the async views, at one
+    in-memory mongomock client.
+    """
+    import mongomock
+    from api import aio
+
+    # mongomock's bulk builder predates the ``sort`` argument pymongo 4.11+ passes.
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ('add_update', 'add_replace'):
+        method = getattr(builder, name)
+        setattr(builder, name, lambda self, *args, sort=None, _method=method, **kwargs: _method(self, *args, **kwargs))
+
+    mongoengine.disconnect()
+    mongoengine.disconnect(alias=settings.MONGO_READ_ALIAS)
+    mongoengine.connect('hrms_benchmark', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    mongoengine.connect(
+        'hrms_benchmark',
+        alias=settings.MONGO_READ_ALIAS,
+        host='mongodb://localhost',
+        mongo_client_class=lambda **kwargs: mongoengine.get_connection(),
+    )
+    aio.collection = lambda model: AsyncCollection(model._get_collection())
+
+
+def seed_employees(count):
+    location = Location(location_name='Chennai').save()
+    branch = Branch(branch_name='T Nagar', location_name=location).save()
+    department = Department(name='Engineering').save()
+    designation = Designation(designation_name='Engineer', department_name=department).save()
+    Employee._get_collection().insert_many([
+        {
+            '_id': ObjectId(),
+            'name': f'Employee {i}',
+            'emp_id': f'E{i:06d}',
+            'email': f'employee{i}@example.com',
+            'designation': designation.id,
+            'department': department.id,
+            'location': location.id,
+            'branch': branch.id,
+            'emp_status': True,
+            'basic_salary': 30000.0,
+        }
+        for i in range(count)
+    ])
+
+
+class Command(BaseCommand):
+    help = 'Poll a list endpoint with and without If-None-Match and report bytes and CPU saved.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/employees/')
+        parser.add_argument('--polls', type=int, default=200)
+        parser.add_argument('--employees', type=int, default=5000, help='Employees to seed (--mongomock only).')
+        parser.add_argument('--mongomock', action='store_true', help='Run against a seeded in-memory database.')
+
+    def handle(self, *args, **options):
+        if options['mongomock']:
+            use_mongomock()
+            seed_employees(options['employees'])
+
+        client = APIClient()
+        client.force_authenticate(User(username='benchmark'))
+        url, polls = options['url'], options['polls']
+        etag = client.get(url)['ETag']
+
+        results = {}
+        for label, headers in (('full body', {}), ('if-none-match', {'HTTP_IF_NONE_MATCH': etag})):
+            sent = statuses = 0
+            wall, cpu = time.perf_counter(), time.process_time()
+            for _ in range(polls):
+                response = client.get(url, **headers)
+                sent += len(response.content)
+                statuses += response.status_code == 304
+            results[label] = {
+                'bytes': sent,
+                'not_modified': statuses,
+                'wall_ms': (time.perf_counter() - wall) * 1000 / polls,
+                'cpu_ms': (time.process_time() - cpu) * 1000 / polls,
+            }
+
+        full, conditional = results['full body'], results['if-none-match']
+        self.stdout.write(f'{polls} polls of {url}')
+        for label, result in results.items():
+            self.stdout.write(
+                f'  {label:<14}: {result["bytes"] / polls:>11.0f} body B/poll  {result["cpu_ms"]:>8.2f} ms CPU/poll  '
+                f'{result["wall_ms"]:>8.2f} ms/poll  ({result["not_modified"]} x 304)'
+            )
+        self.stdout.write(
+            f'  saved         : {100 * (1 - conditional["bytes"] / max(full["bytes"], 1)):.1f}% body bytes, '
+            f'{100 * (1 - conditional["cpu_ms"] / max(full["cpu_ms"], 1e-9)):.1f}% CPU'
+        )
@@ -0,0 +1,119 @@
+"""
+Benchmark the in-memory employee search index.
+
+Run with: python manage.py benchmark_employee_search --employees 500000 [--memory]
+
+``--memory`` traces allocations (which slows everything down) to report the
+memory the index keeps and its peak while building and repacking.
+"""
+import random
+import string
+import time
+import tracemalloc
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+
+from api.search import EmployeeSearchIndex
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Anand', 'Anitha', 'Arjun', 'Bala', 'Deepa', 'Divya', 'Ganesh', 'Gowtham',
+    'Hari', 'Kavin', 'Karthik', 'Lakshmi', 'Meena', 'Mohan', 'Nandhini', 'Pooja', 'Priya', 'Rahul',
+    'Ravi', 'Sanjay', 'Saranya', 'Senthil', 'Sneha', 'Surya', 'Tamil', 'Uma', 'Vignesh', 'Vijay',
+]
+
+
+def synthetic_rows(count, rng):
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))).title()
+        yield {
+            '_id': ObjectId(),
+            'name': f'{first} {last}',
+            'emp_id': f'E{i:06d}',
+            'email': f'{first.lower()}.{last.lower()}{i}@example.com',
+            'emp_status': True,
+        }
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = 'Build the employee search index over synthetic employees and time typeahead queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=500000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--memory', action='store_true', help='Report the memory the index holds and its peaks.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = list(synthetic_rows(options['employees'], rng))
+        index = EmployeeSearchIndex()
+
+        if options['memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        index.build(rows)
+        build_secs = time.perf_counter() - started
+        if options['memory']:
+            retained, build_peak = tracemalloc.get_traced_memory()
+
+        queries = []
+        for _ in range(options['queries']):
+            row = rng.choice(rows)
+            first, last = row['name'].split()
+            queries.append(rng.choice([
+                first[:rng.randint(1, 4)],
+                f'{first[:3]} {last[:2]}',
+                row['emp_id'][:rng.randint(2, 7)],
+                row['email'][:rng.randint(3, 12)],
+                last[:rng.randint(2, 5)],
+            ]))
+
+        timings = []
+        for q in queries:
+            started = time.perf_counter()
+            index.search(q, options['limit'])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        extra = list(synthetic_rows(1000, rng))
+        started = time.perf_counter()
+        for row in extra:
+            index.upsert(row)
+        upsert_ms = (time.perf_counter() - started) * 1000 / len(extra)
+
+        # Queries again with the writes sitting in the delta.
+        after = []
+        for q in queries[:500]:
+            started = time.perf_counter()
+            index.search(q, options['limit'])
+            after.append((time.perf_counter() - started) * 1000)
+        after.sort()
+
+        stats = index.stats()
+        self.stdout.write(
+            f'{stats["employees"]} employees, {stats["tokens"]} tokens ({stats["distinct_tokens"]} distinct)'
+        )
+        self.stdout.write(f'  build        : {build_secs * 1000:>9.1f} ms')
+        self.stdout.write(f'  query p50    : {percentile(timings, 0.50):>9.3f} ms')
+        self.stdout.write(f'  query p99    : {percentile(timings, 0.99):>9.3f} ms')
+        self.stdout.write(f'  query max    : {timings[-1]:>9.3f} ms')
+        self.stdout.write(f'  upsert (avg) : {upsert_ms:>9.3f} ms')
+        self.stdout.write(f'  p99 w/ delta : {percentile(after, 0.99):>9.3f} ms')
+        if options['memory']:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            index._start_refresh()
+            index._repack()
+            repack_peak = tracemalloc.get_traced_memory()[1] - before
+            tracemalloc.stop()
+            mib = 1024 * 1024
+            self.stdout.write(f'  retained     : {retained / mib:>9.1f} MiB ({stats["packed_bytes"] / mib:.1f} MiB packed arrays)')
+            self.stdout.write(f'  build peak   : {(build_peak - retained) / mib:>9.1f} MiB above retained')
+            self.stdout.write(f'  repack peak  : {repack_peak / mib:>9.1f} MiB above retained')
@@ -0,0 +1,563 @@
+"""
+Benchmark every route in ``api/urls.py`` in-process: throughput, p50/p99
+latency and Mongo queries per request, per endpoint, saved as JSON so two
+runs can be diffed.
+
+Run with:
+
+    python manage.py benchmark_endpoints --mongomock --employees 1k
+    python manage.py benchmark_endpoints --database hrms_benchmark --employees 100k
+    python manage.py benchmark_endpoints --mongomock --baseline var/benchmarks/endpoints-<earlier>.json
+
+The data set is ``seed_hrms``'s synthetic organisation with ``--months`` of
+attendance, plus the first month's payroll. ``--database`` seeds (and
+afterwards drops) a separate database on the configured Mongo server, never
+``MONGO_DB_NAME``. mongomock scans every collection linearly, so use a real
+mongod, and ``--processes``, for 100k and 1M employees.
+
+Requests go through the full middleware/DRF stack with a real JWT, one at
+a time. Django users created for the run (login, logout, refresh) are
+rolled back. Every named route must have a scenario below. The command
+refuses to run if one is missing, so new endpoints get benchmarked.
+"""
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import mongoengine
+from bson import ObjectId
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from pymongo import ReadPreference, monitoring
+from rest_framework.test import APIClient
+
+from api import urls
+from api.authentication import UserRefreshToken
+from api.cache import reset_reference_caches
+from api.indexes import MODELS
+from api.models import Branch, Department, Designation, Employee, Location
+from api.metrics import command_timer
+from api.mongo import pool_monitor
+from api.payroll import generate_company_payroll
+from api.search import employee_search_index
+from api.slow_queries import slow_command_log
+
+from .benchmark_conditional_get import use_mongomock
+from .seed_hrms import AREAS, CITIES, DEPARTMENTS, FIRST_NAMES, LAST_NAMES, LEVELS, Org, object_id, scale, seed_org
+
+# Benchmarked month: seeded attendance and payroll start here.
+YEAR, MONTH = 2025, 1
+PASSWORD = 'benchmark-password'
+WRITE_METHODS = (
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one', 'delete_many',
+    'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete', 'bulk_write',
+)
+READ_METHODS = ('find', 'find_one', 'aggregate', 'count_documents', 'estimated_document_count', 'distinct')
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# -- Mongo query counting -----------------------------------------------------------------
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands a pymongo client sends (find, getMore, update, ...)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name != 'endSessions':
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class CallCounter:
+    """
+    Counts collection method calls on mongomock, which has no command
+    monitoring. Calls made inside another counted call (``find_one`` going
+    through ``find``) count once.
+    """
+
+    def __init__(self):
+        import mongomock
+
+        self.count = 0
+        self._depth = threading.local()
+        collection_class = mongomock.collection.Collection
+        for name in READ_METHODS + WRITE_METHODS:
+            setattr(collection_class, name, self._counted(getattr(collection_class, name)))
+
+    def _counted(self, method):
+        def counted(collection, *args, **kwargs):
+            depth = getattr(self._depth, 'value', 0)
+            if not depth:
+                self.count += 1
+            self._depth.value = depth + 1
+            try:
+                return method(collection, *args, **kwargs)
+            finally:
+                self._depth.value = depth
+        return counted
+
+
+def use_database(name, listener):
+    """Reconnect both aliases (and the async views) to database ``name``, with ``listener``."""
+    if name == settings.MONGO_SETTINGS['db']:
+        raise CommandError('--database must not be MONGO_DB_NAME: the benchmark seeds and drops it.')
+    settings.MONGO_SETTINGS['db'] = name
+    # Inherited by seed_hrms's spawned workers, whose settings read it.
+    os.environ['MONGO_DB_NAME'] = name
+    # The async views' clients are created lazily and pick up global listeners.
+    monitoring.register(listener)
+    mongoengine.disconnect()
+    mongoengine.disconnect(alias=settings.MONGO_READ_ALIAS)
+    mongoengine.connect(
+        **settings.MONGO_SETTINGS,
+        **settings.MONGO_CLIENT_OPTIONS,
+        event_listeners=[pool_monitor('default'), command_timer, slow_command_log, listener],
+    )
+    mongoengine.connect(
+        alias=settings.MONGO_READ_ALIAS,
+        **settings.MONGO_SETTINGS,
+        **{**settings.MONGO_CLIENT_OPTIONS, 'maxPoolSize': settings.MONGO_READ_MAX_POOL_SIZE},
+        read_preference=getattr(ReadPreference, settings.MONGO_READ_PREFERENCE),
+        event_listeners=[pool_monitor(settings.MONGO_READ_ALIAS), command_timer, slow_command_log, listener],
+    )
+
+
+# -- seeding ------------------------------------------------------------------------------
+
+
+def insert(model, rows, chunk=10000):
+    collection = model._get_collection()
+    for start in range(0, len(rows), chunk):
+        collection.insert_many(rows[start:start + chunk], ordered=False)
+    return [row['_id'] for row in rows]
+
+
+def seed(employees, months=1, processes=1):
+    """
+    Seed ``employees`` employees and ``months`` months of attendance with
+    ``seed_hrms``, plus the first month's payroll. Returns the ids the
+    scenarios use.
+    """
+    for model in MODELS:
+        model.drop_collection()
+    org = Org(employees, months=months, start=date(YEAR, MONTH, 1))
+    seed_org(org, processes)
+    call_command('rebuild_dashboard_counters', stdout=io.StringIO())
+    generate_company_payroll(YEAR, MONTH)
+    reset_reference_caches()
+    employee_search_index().reset()
+    active = Employee._get_collection().find({'emp_status': True}, {'emp_id': 1}).limit(1000)
+    return {
+        'org': org,
+        'locations': [object_id('location', number) for number in range(org.locations)],
+        'branches': [object_id('branch', number) for number in range(org.branches)],
+        'departments': [object_id('department', number) for number in range(org.departments)],
+        'designations': [object_id('designation', number) for number in range(org.designations)],
+        'emp_ids': [f'E{number:07d}' for number in range(employees)],
+        'employees': [object_id('employee', number) for number in range(min(employees, 1000))],
+        # Inactive employees have no attendance and no payroll.
+        'active': [row['emp_id'] for row in active],
+    }
+
+
+# -- scenarios ----------------------------------------------------------------------------
+
+
+class Scenario:
+    """
+    Requests against one route. ``build(count)`` runs before timing (to
+    create the documents that deletes delete, say) and returns a function
+    of the request number giving ``(path, data, extra)``; ``extra`` holds
+    ``format``/``content_type`` and headers. ``max_requests`` caps the
+    timed requests of slow endpoints (password hashing, payroll runs).
+    """
+
+    def __init__(self, route, method, build, label='', max_requests=None):
+        self.route = route
+        self.method = method
+        self.build = build
+        self.max_requests = max_requests
+        self.label = f'{route} {method}{" " + label if label else ""}'
+
+
+def fixed(path, data=None, **extra):
+    return lambda count: lambda number: (path, data, extra)
+
+
+def cycling(make):
+    return lambda count: make
+
+
+def targets(model, make_row, request):
+    """Insert ``count`` throwaway documents and hand one to each request, as ``request(number, id)``."""
+    def build(count):
+        ids = insert(model, [make_row(number) for number in range(count)])
+        return lambda number: request(number, ids[number])
+    return build
+
+
+def deleted(model, make_row, path):
+    return targets(model, make_row, lambda number, id: (path.format(id=id), None, {}))
+
+
+def scenarios(org, user):
+    """One or more scenarios for every named route in ``api/urls.py``."""
+    emp_ids, employees, active = org['emp_ids'], org['employees'], org['active']
+    location, branch = org['locations'][0], org['branches'][0]
+    department, designation = org['departments'][0], org['designations'][0]
+    # Created employees join the last department, so department 0's reads see the seeded data only.
+    hires = {
+        'designation': str(org['designations'][-1]),
+        'department': str(org['departments'][-1]),
+        'location': str(org['locations'][-1]),
+        'branch': str(org['branches'][-1]),
+    }
+    period = {'year': YEAR, 'month': MONTH}
+    day = next(org['org'].days()).isoformat()
+
+    def pick(values, number):
+        return values[number * 7919 % len(values)]
+
+    def new_employee(number, prefix):
+        return {
+            'name': f'Benchmark {prefix}{number}',
+            'emp_id': f'{prefix}{number:07d}',
+            'email': f'{prefix.lower()}{number}@benchmark.example.com',
+            **hires,
+            'status': True,
+            'basic_salary': 30000,
+        }
+
+    def employee_target(prefix):
+        return lambda number: {
+            **org['org'].employee(number)[0],
+            '_id': ObjectId(),
+            **{key: new_employee(number, prefix)[key] for key in ('name', 'emp_id', 'email')},
+            **{key: ObjectId(value) for key, value in hires.items()},
+        }
+
+    def tokens(path, logout=False):
+        def build(count):
+            refresh = [UserRefreshToken.for_user(user) for _ in range(count)]
+
+            def request(number):
+                extra = {'format': 'json'}
+                if logout:
+                    extra['HTTP_AUTHORIZATION'] = f'Bearer {refresh[number].access_token}'
+                return path, {'refresh': str(refresh[number])}, extra
+            return request
+        return build
+
+    def bulk_import(number):
+        rows = [new_employee(number * 100 + row, 'BI') for row in range(100)]
+        body = '\n'.join(json.dumps(row) for row in rows).encode()
+        return '/api/employees/bulk/', body, {'content_type': 'application/x-ndjson'}
+
+    def punches(number):
+        punched = [
+            {'employee_id': pick(emp_ids, number * 50 + i), 'timestamp': f'{day}T09:{i:02d}:00', 'direction': 'in'}
+            for i in range(50)
+        ]
+        return '/api/employee_attendance-punches/', {'punches': punched}, {'format': 'json'}
+
+    def each(make):
+        return cycling(lambda number: make(number))
+
+    return [
+        Scenario('health-check', 'GET', fixed('/api/health')),
+        Scenario('login', 'POST', fixed(
+            '/api/auth/login/', {'username': user.username, 'password': PASSWORD}, format='json'
+        ), max_requests=20),
+        Scenario('logout', 'POST', tokens('/api/auth/logout/', logout=True)),
+        Scenario('token-refresh', 'POST', tokens('/api/auth/refresh/')),
+        Scenario('reference-cache-stats', 'GET', fixed('/api/cache/stats')),
+        Scenario('mongo-pool-stats', 'GET', fixed('/api/db/pool')),
+        Scenario('metrics', 'GET', fixed('/api/metrics')),
+
+        Scenario('employee-list-create', 'GET', fixed('/api/employees/', {'limit': 100}), 'page of 100'),
+        Scenario('employee-list-create', 'POST', each(
+            lambda number: ('/api/employees/', new_employee(number, 'BC'), {'format': 'json'})
+        )),
+        Scenario('employee-bulk-import', 'POST', each(bulk_import), '100 rows', max_requests=20),
+        Scenario('employee-search', 'GET', each(
+            lambda number: ('/api/employees/search', {'q': f'{pick(FIRST_NAMES, number)} {pick(LAST_NAMES, number)}'}, {})
+        )),
+        Scenario('get-employee-by-id', 'GET', each(
+            lambda number: (f'/api/employees/{pick(employees, number)}/', None, {})
+        )),
+        Scenario('update-employee-by-id', 'PUT', targets(
+            Employee, employee_target('BU'), lambda number, id: (
+                f'/api/employees/update/{id}', new_employee(number, 'BU'), {'format': 'json'}
+            ),
+        )),
+        Scenario('delete-employee-by-id', 'DELETE', deleted(
+            Employee, employee_target('BD'), '/api/employees/delete/{id}'
+        )),
+
+        Scenario('department-list-create', 'GET', fixed('/api/departments/')),
+        Scenario('department-list-create', 'POST', each(
+            lambda number: ('/api/departments/', {'name': f'Benchmark {number}'}, {'format': 'json'})
+        )),
+        Scenario('get-department-by-id', 'GET', fixed(f'/api/departments/{department}/')),
+        Scenario('update-department-by-id', 'PUT', each(lambda number: (
+            f'/api/departments/update/{department}/', {'name': DEPARTMENTS[0][0], 'description': f'rev {number}'},
+            {'format': 'json'},
+        ))),
+        Scenario('delete-department-by-id', 'DELETE', deleted(
+            Department, lambda number: {'_id': ObjectId(), 'name': f'Doomed {number}'},
+            '/api/departments/delete/{id}/',
+        )),
+
+        Scenario('designation-list-create', 'GET', fixed('/api/designations/')),
+        Scenario('designation-list-create', 'POST', each(lambda number: (
+            '/api/designations/', {'designation_name': f'Benchmark {number}', 'department_name': str(department)},
+            {'format': 'json'},
+        ))),
+        Scenario('get-designation-by-id', 'GET', fixed(f'/api/designations/{designation}/')),
+        Scenario('update-designation-by-id', 'PUT', fixed(
+            f'/api/designations/update/{designation}/',
+            {'designation_name': f'{LEVELS[0]} {DEPARTMENTS[0][0]}', 'department_name': str(department)}, format='json',
+        )),
+        Scenario('delete-designation-by-id', 'DELETE', deleted(
+            Designation,
+            lambda number: {'_id': ObjectId(), 'designation_name': f'Doomed {number}', 'department_name': department},
+            '/api/designations/delete/{id}/',
+        )),
+
+        Scenario('location-list-create', 'GET', fixed('/api/locations/')),
+        Scenario('location-list-create', 'POST', each(
+            lambda number: ('/api/locations/', {'location_name': f'Benchmark {number}'}, {'format': 'json'})
+        )),
+        Scenario('location-by-id', 'GET', fixed(f'/api/locations/{location}/')),
+        Scenario('update-location-by-id', 'PUT', fixed(
+            f'/api/locations/update/{location}/', {'location_name': CITIES[0]}, format='json'
+        )),
+        Scenario('delete-location-by-id', 'DELETE', deleted(
+            Location, lambda number: {'_id': ObjectId(), 'location_name': f'Doomed {number}'},
+            '/api/locations/delete/{id}/',
+        )),
+
+        Scenario('branch-list-create', 'GET', fixed('/api/branches/')),
+        Scenario('branch-list-create', 'POST', each(lambda number: (
+            '/api/branches/', {'branch_name': f'Benchmark {number}', 'location_name': str(location)},
+            {'format': 'json'},
+        ))),
+        Scenario('branch-by-id', 'GET', fixed(f'/api/branches/{branch}/')),
+        Scenario('update-branch-by-id', 'PUT', fixed(
+            f'/api/branches/update/{branch}/', {'branch_name': f'{CITIES[0]} {AREAS[0]}', 'location_name': str(location)},
+            format='json',
+        )),
+        Scenario('delete-branch-by-id', 'DELETE', deleted(
+            Branch, lambda number: {'_id': ObjectId(), 'branch_name': f'Doomed {number}', 'location_name': location},
+            '/api/branches/delete/{id}/',
+        )),
+
+        Scenario('get_employee_attendance', 'GET', each(lambda number: (
+            '/api/get_employee_attendance/', {'emp_id': pick(active, number), 'date': day}, {}
+        ))),
+        Scenario('employee_attendance-check_in', 'POST', each(lambda number: (
+            '/api/employee_attendance-check_in/',
+            {'employee_id': pick(emp_ids, number), 'date': day, 'check_in': '08:59:00'}, {'format': 'json'},
+        ))),
+        Scenario('employee_attendance-check_out', 'POST', each(lambda number: (
+            '/api/employee_attendance-check_out/',
+            {'employee_id': pick(emp_ids, number), 'date': day, 'check_out': '19:00:00'}, {'format': 'json'},
+        ))),
+        Scenario('employee_attendance-punches', 'POST', each(punches), '50 punches'),
+        Scenario('attendance-range', 'GET', each(lambda number: (
+            '/api/attendance/', {'emp_id': pick(active, number), **period}, {}
+        )), 'employee month'),
+        Scenario('attendance-range', 'GET', fixed(
+            '/api/attendance/', {'department': str(department), **period}
+        ), 'department month'),
+        Scenario('async-get_employee_attendance', 'GET', each(lambda number: (
+            '/api/async/get_employee_attendance/', {'emp_id': pick(active, number), 'date': day}, {}
+        ))),
+        Scenario('async-employee_attendance-check_in', 'POST', each(lambda number: (
+            '/api/async/employee_attendance-check_in/',
+            {'employee_id': pick(emp_ids, number), 'date': day, 'check_in': '08:58:00'}, {'format': 'json'},
+        ))),
+        Scenario('async-employee_attendance-check_out', 'POST', each(lambda number: (
+            '/api/async/employee_attendance-check_out/',
+            {'employee_id': pick(emp_ids, number), 'date': day, 'check_out': '19:01:00'}, {'format': 'json'},
+        ))),
+
+        Scenario('payroll-list', 'GET', fixed('/api/payroll/', {**period, 'limit': 100}), 'page of 100'),
+        Scenario('payroll-generate', 'POST', fixed(
+            '/api/payroll/generate/', {**period, 'department': str(department)}, format='json'
+        ), 'department', max_requests=3),
+        Scenario('payroll-payslip', 'GET', each(
+            lambda number: (f'/api/payroll/{pick(active, number)}/payslip/', period, {})
+        )),
+        Scenario('dashboard-summary', 'GET', fixed('/api/dashboard/summary', {'date': day})),
+    ]
+
+
+def missing_routes(defined):
+    covered = {scenario.route for scenario in defined}
+    return sorted(pattern.name for pattern in urls.urlpatterns if pattern.name and pattern.name not in covered)
+
+
+# -- running ------------------------------------------------------------------------------
+
+
+def run(client, scenario, counter, count, warmup, token):
+    """Send ``warmup + count`` requests; time (and count the queries of) the last ``count``."""
+    request = scenario.build(warmup + count)
+    send = getattr(client, scenario.method.lower())
+    latencies, queries, errors, statuses = [], 0, 0, {}
+    started = time.perf_counter()
+    for number in range(warmup + count):
+        path, data, extra = request(number)
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}', **extra}
+        if number == warmup:
+            started, queries = time.perf_counter(), 0
+        before = counter.count
+        begun = time.perf_counter()
+        response = send(path, data, **extra)
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - begun
+        if number < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries += counter.count - before
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        errors += response.status_code >= 400
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': errors,
+        'statuses': {str(code): total for code, total in sorted(statuses.items())},
+        'throughput_rps': round(count / seconds, 1),
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / count, 3),
+        'queries_per_request': round(queries / count, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(current, previous):
+    if not previous:
+        return ''
+    return f'{100 * (current - previous) / previous:+6.1f}%'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API route against a seeded database and save the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=scale, default='1k', help='Seeded employees: 1k, 100k, 1M, ...')
+        parser.add_argument('--months', type=int, default=1, help='Seeded months of attendance.')
+        parser.add_argument('--processes', type=int, default=1, help='seed_hrms worker processes (mongod only).')
+        parser.add_argument('--requests', type=int, default=100, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint first.')
+        parser.add_argument('--only', help='Only run endpoints whose label matches this regular expression.')
+        parser.add_argument('--output', help='Results file (default var/benchmarks/endpoints-<time>.json).')
+        parser.add_argument('--baseline', help='Earlier results file to compare against.')
+        parser.add_argument('--mongomock', action='store_true', help='Run against an in-memory database.')
+        parser.add_argument('--database', default='hrms_benchmark', help='Database to seed on the Mongo server.')
+        parser.add_argument('--keep', action='store_true', help='Do not drop the seeded collections afterwards.')
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())['endpoints']
+        if options['mongomock']:
+            use_mongomock()
+            counter = CallCounter()
+        else:
+            counter = CommandCounter()
+            use_database(options['database'], counter)
+        only = re.compile(options['only']) if options['only'] else None
+
+        started = time.perf_counter()
+        org = seed(options['employees'], options['months'], 1 if options['mongomock'] else options['processes'])
+        self.stdout.write(
+            f'Seeded {options["employees"]} employees x {options["months"]} month(s) of attendance '
+            f'in {time.perf_counter() - started:.1f} s'
+        )
+
+        results = {}
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user('benchmark-endpoints', password=PASSWORD, is_staff=True)
+                token = str(UserRefreshToken.for_user(user).access_token)
+                defined = scenarios(org, user)
+                missing = missing_routes(defined)
+                if missing:
+                    raise CommandError(f'No benchmark scenario for: {", ".join(missing)}')
+                client = APIClient()
+                for scenario in defined:
+                    if only and not only.search(scenario.label):
+                        continue
+                    count = min(options['requests'], scenario.max_requests or options['requests'])
+                    warmup = min(options['warmup'], max(1, count // 5))
+                    results[scenario.label] = run(client, scenario, counter, count, warmup, token)
+                    self.report(scenario.label, results[scenario.label], baseline.get(scenario.label))
+                transaction.set_rollback(True)
+        finally:
+            if not options['keep']:
+                for model in MODELS:
+                    model.drop_collection()
+
+        output = Path(options['output'] or (
+            settings.BASE_DIR / 'var' / 'benchmarks' / f'endpoints-{datetime.now():%Y%m%d-%H%M%S}.json'
+        ))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'backend': 'mongomock' if options['mongomock'] else 'mongod',
+                'employees': options['employees'],
+                'months': options['months'],
+                'requests': options['requests'],
+                'python': platform.python_version(),
+            },
+            'endpoints': results,
+        }, indent=2, sort_keys=True) + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def report(self, label, result, previous):
+        previous = previous or {}
+        errors = f'  {result["errors"]} errors {result["statuses"]}' if result['errors'] else ''
+        self.stdout.write(
+            f'{label:<52} {result["throughput_rps"]:>8.1f} req/s {change(result["throughput_rps"], previous.get("throughput_rps"))}'
+            f'  p50 {result["p50_ms"]:>8.2f} ms {change(result["p50_ms"], previous.get("p50_ms"))}'
+            f'  p99 {result["p99_ms"]:>8.2f} ms {change(result["p99_ms"], previous.get("p99_ms"))}'
+            f'  {result["queries_per_request"]:>6.2f} queries'
+            f'{errors}'
+        )
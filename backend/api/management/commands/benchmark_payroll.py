@@ -0,0 +1,68 @@
+"""
+Benchmark payroll computation for one month.
+
+Run with: python manage.py benchmark_payroll --employees 100000
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.payroll import compute_pay, generate_company_payroll, working_days
+
+
+def loop_pay(basic, present, half, working, allowance_rate, deduction_rate):
+    """Per-employee Python loop with the same rules, for comparison."""
+    rows = []
+    for b, p, h in zip(basic, present, half):
+        payable = min(p + 0.5 * h, working)
+        earned = payable / working
+        allowances = b * allowance_rate
+        gross = b + allowances
+        deductions = gross * (1.0 - earned) + b * earned * deduction_rate
+        rows.append((payable, round(allowances, 2), round(gross, 2), round(deductions, 2), round(gross - deductions, 2)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorised payroll computation against a per-employee loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100000)
+        parser.add_argument('--year', type=int, default=2025)
+        parser.add_argument('--month', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument(
+            '--db',
+            action='store_true',
+            help='Also run a full company-wide generation against the configured Mongo.',
+        )
+        parser.add_argument('--processes', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['employees']
+        working = working_days(options['year'], options['month'])
+        basic = [float(rng.randrange(20000, 200000)) for _ in range(count)]
+        present = [rng.randint(0, working) for _ in range(count)]
+        half = [rng.randint(0, working - p) // 3 for p in present]
+
+        started = time.perf_counter()
+        loop_pay(basic, present, half, working, 0.2, 0.12)
+        loop_secs = time.perf_counter() - started
+
+        started = time.perf_counter()
+        compute_pay(basic, present, half, working, 0.2, 0.12)
+        vector_secs = time.perf_counter() - started
+
+        self.stdout.write(f'{count} employees x 1 month ({working} working days)')
+        self.stdout.write(f'  python loop : {loop_secs * 1000:>9.1f} ms')
+        self.stdout.write(f'  numpy       : {vector_secs * 1000:>9.1f} ms')
+        self.stdout.write(f'  speed-up    : {loop_secs / vector_secs:>9.1f}x')
+
+        if options['db']:
+            summary = generate_company_payroll(options['year'], options['month'], processes=options['processes'])
+            self.stdout.write(
+                f'  full run    : {summary["elapsed_ms"]:>9.1f} ms for {summary["generated"]} records '
+                f'({options["processes"]} process(es))'
+            )
@@ -0,0 +1,117 @@
+"""
+Compare direct attendance upserts with the write-behind punch buffer.
+
+Run with: python manage.py benchmark_punch_buffer --mongomock --latency-ms 2
+(without --mongomock it writes to the configured database; --latency-ms adds
+a simulated round trip to every Mongo write, for an in-memory database)
+"""
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+
+from api.attendance import apply_punch
+from api.models import EmployeeAttendanceDaily
+from api.punch_log import PunchBuffer
+
+from .benchmark_conditional_get import use_mongomock
+
+WRITE_METHODS = ('find_one_and_update', 'bulk_write', 'update_one')
+
+
+@contextmanager
+def write_latency(seconds):
+    """Sleep ``seconds`` before every Mongo write, like a network round trip."""
+    if not seconds:
+        yield
+        return
+    collection_class = type(EmployeeAttendanceDaily._get_collection())
+    patches = []
+    for name in WRITE_METHODS:
+        original = getattr(collection_class, name)
+
+        def delayed(self, *args, _original=original, **kwargs):
+            time.sleep(seconds)
+            return _original(self, *args, **kwargs)
+
+        patches.append(mock.patch.object(collection_class, name, delayed))
+    for patch in patches:
+        patch.start()
+    try:
+        yield
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_clients(clients, punches, punch):
+    """Run ``clients`` threads each sending ``punches`` punches; return (seconds, latencies)."""
+    latencies = [[] for _ in range(clients)]
+    start_day = datetime(2025, 1, 1)
+
+    def client(number):
+        for i in range(punches):
+            day = start_day + timedelta(days=i % 28)
+            started = time.perf_counter()
+            punch(f'E{number:05d}', day, f'09:{i % 60:02d}:00')
+            latencies[number].append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(value for values in latencies for value in values)
+
+
+class Command(BaseCommand):
+    help = 'Measure check-in throughput and latency with direct upserts and with the write-behind buffer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=64)
+        parser.add_argument('--punches', type=int, default=100, help='Punches per client.')
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated round trip per Mongo write.')
+        parser.add_argument('--group-commit-ms', type=int, default=2)
+        parser.add_argument('--mongomock', action='store_true', help='Run against an in-memory database.')
+
+    def handle(self, *args, **options):
+        if options['mongomock']:
+            use_mongomock()
+        clients, punches = options['clients'], options['punches']
+        total = clients * punches
+
+        with write_latency(options['latency_ms'] / 1000):
+            EmployeeAttendanceDaily.drop_collection()
+            direct_secs, direct = run_clients(
+                clients, punches, lambda emp_id, day, check_in: apply_punch(emp_id, day, check_in=check_in)
+            )
+            expected = sorted(EmployeeAttendanceDaily.objects.exclude('id').as_pymongo(), key=str)
+
+            EmployeeAttendanceDaily.drop_collection()
+            with tempfile.TemporaryDirectory() as log_dir:
+                buffer = PunchBuffer(log_dir, group_commit_ms=options['group_commit_ms']).start()
+                buffered_secs, buffered = run_clients(
+                    clients, punches, lambda emp_id, day, check_in: buffer.append(emp_id, day, check_in=check_in)
+                )
+                drain_started = time.perf_counter()
+                buffer.stop()
+                drain_secs = time.perf_counter() - drain_started
+            actual = sorted(EmployeeAttendanceDaily.objects.exclude('id').as_pymongo(), key=str)
+
+        self.stdout.write(f'{total} check-ins from {clients} clients, {options["latency_ms"]} ms simulated write latency')
+        for label, seconds, latencies in (('direct', direct_secs, direct), ('write-behind', buffered_secs, buffered)):
+            self.stdout.write(
+                f'  {label:<12}: {total / seconds:>9.0f} punches/s  p50 {percentile(latencies, 0.5):>7.2f} ms  '
+                f'p99 {percentile(latencies, 0.99):>7.2f} ms'
+            )
+        self.stdout.write(f'  final drain : {drain_secs * 1000:>9.1f} ms')
+        self.stdout.write(f'  same daily documents: {actual == expected}')
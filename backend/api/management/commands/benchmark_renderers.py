@@ -0,0 +1,78 @@
+"""
+Benchmark JSON rendering of employee lists.
+
+Run with: python manage.py benchmark_renderers --employees 100000
+"""
+import datetime
+import gc
+import time
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer, encode_stream, gzip_stream
+
+
+def employee_dicts(count):
+    """Rows shaped like ``Employee.to_dict()`` with references resolved."""
+    joined = datetime.date(2024, 4, 1)
+    return [
+        {
+            'id': str(ObjectId()),
+            'name': f'Employee {i}',
+            'emp_id': f'E{i:06d}',
+            'email': f'employee{i}@example.com',
+            'phone': f'98400{i:05d}',
+            'designation': 'Software Engineer',
+            'department': 'Engineering',
+            'location': 'Chennai',
+            'branch': 'T Nagar',
+            'emp_status': True,
+            'basic_salary': 30000.0 + i % 500,
+            'date_of_joining': joined + datetime.timedelta(days=i % 365),
+            'created_at': datetime.datetime(2025, 1, 6, 9, 30, 15, 123456),
+        }
+        for i in range(count)
+    ]
+
+
+def batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Time DRF JSONRenderer against ORJSONRenderer and the streaming encoder on synthetic employees.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs per case.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = employee_dicts(options['employees'])
+        size = options['batch_size']
+        cases = (
+            ('drf JSONRenderer', lambda: JSONRenderer().render(rows)),
+            ('ORJSONRenderer', lambda: ORJSONRenderer().render(rows)),
+            ('stream json', lambda: b''.join(encode_stream(batches(rows, size), 'json'))),
+            ('stream ndjson', lambda: b''.join(encode_stream(batches(rows, size), 'ndjson'))),
+            ('stream json+gzip', lambda: b''.join(gzip_stream(encode_stream(batches(rows, size), 'json')))),
+        )
+
+        self.stdout.write(f'{len(rows)} employee dicts, best of {options["repeat"]}')
+        baseline = None
+        for label, render in cases:
+            best, body = None, b''
+            for _ in range(options['repeat']):
+                gc.collect()
+                started = time.perf_counter()
+                body = render()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            self.stdout.write(
+                f'  {label:<17}: {best * 1000:>8.1f} ms  {len(body) / 1e6:>7.2f} MB  '
+                f'{len(rows) / best / 1e6:>5.2f} M rows/s  x{baseline / best:.1f}'
+            )
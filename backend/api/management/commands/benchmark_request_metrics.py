@@ -0,0 +1,135 @@
+"""
+Measure the overhead of the request metrics (``api/metrics.py``).
+
+End-to-end latencies vary by more than the few microseconds the metrics
+cost, so the cost is measured directly and compared with each GET
+scenario of ``benchmark_endpoints``:
+
+* per request: ``RequestMetricsMiddleware`` around a trivial view, with
+  ``REQUEST_METRICS`` on minus off;
+* per Mongo command: the ``CommandTimer`` and ``SlowCommandLog`` events of
+  a command under ``SLOW_QUERY_MS`` (mongomock emits none);
+* per endpoint: p50 latency with the metrics off and Mongo commands per
+  request, giving ``(request cost + commands x command cost) / p50``.
+
+Run with:
+
+    python manage.py benchmark_request_metrics --mongomock --employees 1k
+    python manage.py benchmark_request_metrics --database hrms_benchmark --employees 100k
+"""
+import re
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.test import APIClient
+
+from api import metrics
+from api.authentication import UserRefreshToken
+from api.indexes import MODELS
+from api.slow_queries import slow_command_log
+
+from .benchmark_conditional_get import use_mongomock
+from .benchmark_endpoints import PASSWORD, CallCounter, CommandCounter, run, scenarios, seed, use_database
+from .seed_hrms import scale
+
+
+def listener_cost(events=200000):
+    """Seconds per Mongo command inside a request: ``CommandTimer`` and a fast command through ``SlowCommandLog``."""
+    event = SimpleNamespace(
+        command_name='find', command={'find': 'employees'}, database_name='hrms', connection_id=('db', 27017),
+        request_id=1, duration_micros=250,
+    )
+    token = metrics._current.set(metrics.RequestTimings())
+    try:
+        started = time.perf_counter()
+        for _ in range(events):
+            for listener in (metrics.command_timer, slow_command_log):
+                listener.started(event)
+                listener.succeeded(event)
+        return (time.perf_counter() - started) / events
+    finally:
+        metrics._current.reset(token)
+
+
+def middleware_cost(requests=50000, rounds=5):
+    """Seconds the middleware adds to a request: best of ``rounds``, on minus off."""
+    request = RequestFactory().get('/api/health')
+    request.resolver_match = SimpleNamespace(url_name='health-check')
+    response = HttpResponse()
+
+    def view(request):
+        return response
+
+    best = {}
+    for enabled in (False, True) * rounds:
+        with override_settings(REQUEST_METRICS=enabled):
+            middleware = metrics.RequestMetricsMiddleware(view)
+        started = time.perf_counter()
+        for _ in range(requests):
+            middleware(request)
+        elapsed = (time.perf_counter() - started) / requests
+        best[enabled] = min(best.get(enabled, elapsed), elapsed)
+    metrics.request_metrics.reset()
+    return best[True] - best[False]
+
+
+class Command(BaseCommand):
+    help = 'Measure what REQUEST_METRICS adds to the latency of each GET endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=scale, default='1k')
+        parser.add_argument('--requests', type=int, default=100, help='Timed requests per endpoint.')
+        parser.add_argument('--only', help='Only run endpoints whose label matches this regular expression.')
+        parser.add_argument('--mongomock', action='store_true', help='Run against an in-memory database.')
+        parser.add_argument('--database', default='hrms_benchmark', help='Database to seed on the Mongo server.')
+
+    def handle(self, *args, **options):
+        if options['mongomock']:
+            use_mongomock()
+            counter = CallCounter()
+        else:
+            counter = CommandCounter()
+            use_database(options['database'], counter)
+        only = re.compile(options['only']) if options['only'] else None
+
+        per_request = middleware_cost()
+        per_command = listener_cost()
+        self.stdout.write(
+            f'RequestMetricsMiddleware: {per_request * 1e6:.2f} us per request, '
+            f'command listeners: {per_command * 1e6:.3f} us per Mongo command'
+        )
+
+        org = seed(options['employees'])
+        overheads = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user('benchmark-metrics', password=PASSWORD, is_staff=True)
+                token = str(UserRefreshToken.for_user(user).access_token)
+                with override_settings(REQUEST_METRICS=False):
+                    client = APIClient()
+                    for scenario in scenarios(org, user):
+                        if scenario.method != 'GET' or (only and not only.search(scenario.label)):
+                            continue
+                        result = run(client, scenario, counter, options['requests'], 5, token)
+                        cost_ms = (per_request + result['queries_per_request'] * per_command) * 1000
+                        overhead = 100 * cost_ms / result['p50_ms']
+                        overheads.append(overhead)
+                        self.stdout.write(
+                            f'{scenario.label:<52} p50 {result["p50_ms"]:>8.3f} ms  '
+                            f'{result["queries_per_request"]:>6.2f} queries  +{cost_ms * 1000:>6.2f} us  {overhead:5.2f}%'
+                        )
+                transaction.set_rollback(True)
+        finally:
+            for model in MODELS:
+                model.drop_collection()
+        if overheads:
+            self.stdout.write(
+                f'overhead: median {statistics.median(overheads):.2f}%, worst {max(overheads):.2f}% '
+                f'over {len(overheads)} endpoints'
+            )
@@ -0,0 +1,85 @@
+"""
+Compare Document + to_dict() against the raw-row serializers.
+
+Run with: python manage.py benchmark_serializers --rows 100000
+"""
+import time
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+
+from api.models import Department, Employee, Location
+from api.serializers import (
+    department_rows,
+    employee_rows,
+    location_rows,
+    serialize_departments,
+    serialize_employees,
+    serialize_locations,
+)
+
+
+def synthetic_rows(kind, count):
+    refs = [ObjectId() for _ in range(4)]
+    for i in range(count):
+        if kind == 'employees':
+            yield {
+                '_id': ObjectId(),
+                'name': f'Employee {i}',
+                'emp_id': f'E{i:07d}',
+                'email': f'employee{i}@example.com',
+                'designation': refs[0],
+                'department': refs[1],
+                'location': refs[2],
+                'branch': refs[3],
+                'emp_status': i % 10 != 0,
+            }
+        elif kind == 'departments':
+            yield {'_id': ObjectId(), 'name': f'Department {i}', 'description': 'Team', 'manager': f'Manager {i}'}
+        else:
+            yield {'_id': ObjectId(), 'location_name': f'Location {i}'}
+
+
+CASES = {
+    'employees': (Employee, employee_rows, serialize_employees),
+    'departments': (Department, department_rows, serialize_departments),
+    'locations': (Location, location_rows, serialize_locations),
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list serialization: Document + to_dict() versus raw rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--collection', choices=sorted(CASES), default='employees')
+        parser.add_argument(
+            '--source',
+            choices=['synthetic', 'db'],
+            default='synthetic',
+            help='synthetic measures CPU only; db reads the configured Mongo collection.',
+        )
+
+    def handle(self, *args, **options):
+        model, raw_queryset, serialize = CASES[options['collection']]
+        count = options['rows']
+
+        if options['source'] == 'synthetic':
+            rows = list(synthetic_rows(options['collection'], count))
+            before = self._measure(lambda: [model._from_son(row).to_dict() for row in rows])
+            after = self._measure(lambda: serialize(rows))
+        else:
+            before = self._measure(lambda: [doc.to_dict() for doc in model.objects.limit(count)])
+            after = self._measure(lambda: serialize(raw_queryset().limit(count)))
+
+        rows_done, before_secs = before
+        _, after_secs = after
+        self.stdout.write(f'{options["collection"]}: {rows_done} rows ({options["source"]})')
+        self.stdout.write(f'  Document + to_dict: {rows_done / before_secs:>12,.0f} rows/sec')
+        self.stdout.write(f'  raw rows          : {rows_done / after_secs:>12,.0f} rows/sec')
+        self.stdout.write(f'  speed-up          : {before_secs / after_secs:>12.1f}x')
+
+    def _measure(self, fn):
+        started = time.perf_counter()
+        result = fn()
+        return len(result), time.perf_counter() - started
@@ -0,0 +1,54 @@
+"""
+Build the indexes declared on the models and verify the views' query plans.
+
+Run with: python manage.py ensure_indexes
+
+Duplicate daily attendance documents left by the old check-in view are
+merged first (``api/attendance.py``), so the unique (emp_id, date) index can
+be built on an existing database.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import OperationFailure
+
+from api.attendance import merge_duplicate_days
+from api.indexes import MODELS, QUERY_CATALOGUE, ensure_indexes, explain, winning_stages
+from api.models import EmployeeAttendanceDaily
+
+
+class Command(BaseCommand):
+    help = 'Create model indexes (idempotent, background) and fail if any catalogued query does a COLLSCAN.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-explain', action='store_true', help='Only build indexes.')
+        parser.add_argument('--no-build', action='store_true', help='Only verify query plans.')
+
+    def handle(self, *args, **options):
+        failures = []
+
+        if not options['no_build']:
+            for model in MODELS:
+                name = model._get_collection_name()
+                if model is EmployeeAttendanceDaily:
+                    merged = merge_duplicate_days()
+                    if merged:
+                        self.stdout.write(f'{name}: merged away {merged} duplicate daily documents')
+                try:
+                    indexes = ensure_indexes(model)
+                except OperationFailure as e:
+                    failures.append(f'{name}: {e}')
+                    self.stderr.write(self.style.ERROR(f'{name}: index build failed: {e}'))
+                    continue
+                self.stdout.write(f'{name}: {", ".join(indexes) or "no indexes declared"}')
+
+        if not options['no_explain']:
+            for label, model, query, sort in QUERY_CATALOGUE:
+                stages = winning_stages(explain(model, query, sort))
+                line = f'{label}: {" <- ".join(stages)}'
+                if 'COLLSCAN' in stages:
+                    failures.append(f'{label}: COLLSCAN')
+                    self.stderr.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(self.style.SUCCESS(line))
+
+        if failures:
+            raise CommandError(f'{len(failures)} problem(s): ' + '; '.join(failures))
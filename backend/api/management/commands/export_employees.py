@@ -0,0 +1,309 @@
+"""
+Stream employees, and optionally their attendance, to CSV, JSON lines or Parquet.
+
+Run with:
+
+    python manage.py export_employees --output employees.csv
+    python manage.py export_employees --output employees.parquet --department Engineering --status active
+    python manage.py export_employees --output employees.jsonl --attendance attendance.jsonl --from 2025-01-01 --to 2025-01-31
+
+Employees are read from the report alias (``api/mongo.py``) through one
+server-side cursor with a projection, ``--batch-size`` documents per
+round trip, and written a batch at a time. Reference ids are written as
+names, resolved with one ``$in`` query per batch for ids not seen before.
+Attendance is read per batch of exported employees (``emp_id $in`` on the
+``(emp_id, date)`` index), so the department/branch/status filters apply to
+it too. Memory stays at one batch plus the reference names, whatever the
+number of rows.
+
+``--format`` defaults to each file's extension. Parquet needs pyarrow, an
+optional extra not in requirements.txt (``pip install -r
+requirements-parquet.txt``); each batch becomes one row group.
+"""
+import csv
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Branch, Department, Designation, EmployeeAttendanceDaily, Employee, Location
+from api.mongo import read_collection
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+DEFAULT_BATCH_SIZE = 5000
+PROGRESS_EVERY = 100000
+
+EMPLOYEE_COLUMNS = (
+    'id', 'emp_id', 'name', 'email', 'designation', 'department', 'location', 'branch', 'emp_status', 'basic_salary',
+)
+ATTENDANCE_COLUMNS = ('emp_id', 'date', 'status', 'check_in', 'check_out')
+# Parquet column types, by column.
+PARQUET_TYPES = {'emp_status': 'bool_', 'basic_salary': 'float64', 'date': 'date32'}
+
+# Reference field -> (model, name field)
+REFERENCES = {
+    'designation': (Designation, 'designation_name'),
+    'department': (Department, 'name'),
+    'location': (Location, 'location_name'),
+    'branch': (Branch, 'branch_name'),
+}
+
+
+class ReferenceNames:
+    """``_id -> name`` of each reference collection, filled in per batch."""
+
+    def __init__(self):
+        self.names = {field: {} for field in REFERENCES}
+
+    def load(self, rows):
+        for field, (model, name_field) in REFERENCES.items():
+            names = self.names[field]
+            unseen = {row.get(field) for row in rows} - names.keys() - {None}
+            if unseen:
+                for ref in unseen:
+                    names[ref] = None
+                for row in read_collection(model).find({'_id': {'$in': list(unseen)}}, {name_field: 1}):
+                    names[row['_id']] = row.get(name_field)
+
+
+def batches(cursor, size):
+    while True:
+        batch = list(islice(cursor, size))
+        if not batch:
+            return
+        yield batch
+
+
+def employee_rows(batch, references):
+    references.load(batch)
+    designations, departments, locations, branches = (references.names[field] for field in REFERENCES)
+    return [
+        (
+            str(row['_id']),
+            row.get('emp_id'),
+            row.get('name'),
+            row.get('email'),
+            designations.get(row.get('designation')),
+            departments.get(row.get('department')),
+            locations.get(row.get('location')),
+            branches.get(row.get('branch')),
+            # BooleanField default applies when the field was never stored.
+            row.get('emp_status', True),
+            float(row.get('basic_salary') or 0.0),
+        )
+        for row in batch
+    ]
+
+
+def attendance_rows(batch):
+    rows = []
+    for row in batch:
+        records = row.get('records') or {}
+        day = row['date']
+        rows.append((
+            row['emp_id'],
+            day.date() if isinstance(day, datetime) else day,
+            row.get('status'),
+            records.get('check_in') or None,
+            records.get('check_out') or None,
+        ))
+    return rows
+
+
+# -- writers ----------------------------------------------------------------------------
+
+
+class CsvWriter:
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.stream.flush()
+
+
+class JsonlWriter:
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = columns
+
+    def write(self, rows):
+        columns = self.columns
+        self.stream.write(b''.join([orjson.dumps(dict(zip(columns, row))) + b'\n' for row in rows]))
+
+    def close(self):
+        self.stream.flush()
+
+
+class ParquetWriter:
+    def __init__(self, path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(column, getattr(pa, PARQUET_TYPES.get(column, 'string'))()) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = [self.pa.array(values, type=field.type) for values, field in zip(columns, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(target, fmt, columns):
+    """A writer for ``target`` (a path, or '-' for stdout) and a callback closing it."""
+    if fmt == 'parquet':
+        writer = ParquetWriter(target, columns)
+        return writer, writer.close
+    if fmt == 'csv':
+        stream = sys.stdout if target == '-' else open(target, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+    else:
+        stream = sys.stdout.buffer if target == '-' else open(target, 'wb', buffering=1 << 20)
+    writer = CsvWriter(stream, columns) if fmt == 'csv' else JsonlWriter(stream, columns)
+
+    def close():
+        writer.close()
+        if target != '-':
+            stream.close()
+    return writer, close
+
+
+# -- command ------------------------------------------------------------------------------
+
+
+def reference_ids(model, name_field, values, option):
+    """ObjectIds for ``--department``/``--branch`` values given as ids or names."""
+    ids = []
+    for value in values:
+        try:
+            ids.append(ObjectId(value))
+            continue
+        except (InvalidId, TypeError):
+            pass
+        row = model.objects(**{name_field: value}).only('id').as_pymongo().first()
+        if row is None:
+            raise CommandError(f'{option} {value!r}: no such {model.__name__.lower()}.')
+        ids.append(row['_id'])
+    return ids
+
+
+def parse_day(value, option):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise CommandError(f'{option} must be a date (YYYY-MM-DD).')
+
+
+def output_format(target, fmt):
+    if fmt:
+        return fmt
+    suffix = Path(target).suffix.lower()
+    if suffix not in EXTENSIONS:
+        raise CommandError(f'Cannot tell the format of {target}; pass --format.')
+    return EXTENSIONS[suffix]
+
+
+class Command(BaseCommand):
+    help = 'Stream employees (and optionally their attendance) to CSV, JSON lines or Parquet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="Employees file, or '-' for stdout (default).")
+        parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension, csv for stdout.')
+        parser.add_argument('--attendance', help='Also write the exported employees\' attendance to this file.')
+        parser.add_argument('--from', dest='start', help='First attendance day, YYYY-MM-DD.')
+        parser.add_argument('--to', dest='end', help='Last attendance day, YYYY-MM-DD.')
+        parser.add_argument('--department', action='append', default=[], help='Department id or name (repeatable).')
+        parser.add_argument('--branch', action='append', default=[], help='Branch id or name (repeatable).')
+        parser.add_argument('--status', choices=('active', 'inactive'), help='Only active or inactive employees.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Documents per cursor batch.')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['output'] == '-' else output_format(options['output'], None))
+        attendance_fmt = None
+        if options['attendance']:
+            attendance_fmt = options['format'] or (
+                'csv' if options['attendance'] == '-' else output_format(options['attendance'], None)
+            )
+        if 'parquet' in (fmt, attendance_fmt):
+            if (fmt == 'parquet' and options['output'] == '-') or (
+                attendance_fmt == 'parquet' and options['attendance'] == '-'
+            ):
+                raise CommandError('Parquet needs a file, not stdout.')
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError('Parquet export needs pyarrow: pip install -r requirements-parquet.txt')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        query = {}
+        if options['department']:
+            query['department'] = {'$in': reference_ids(Department, 'name', options['department'], '--department')}
+        if options['branch']:
+            query['branch'] = {'$in': reference_ids(Branch, 'branch_name', options['branch'], '--branch')}
+        if options['status'] == 'active':
+            query['emp_status'] = {'$ne': False}
+        elif options['status'] == 'inactive':
+            query['emp_status'] = False
+        days = {}
+        if options['start']:
+            days['$gte'] = parse_day(options['start'], '--from')
+        if options['end']:
+            days['$lte'] = parse_day(options['end'], '--to')
+
+        # Status messages go to stderr, so '-' can be piped.
+        log = self.stderr
+        writer, close = open_writer(options['output'], fmt, EMPLOYEE_COLUMNS)
+        attendance = close_attendance = None
+        if options['attendance']:
+            attendance, close_attendance = open_writer(options['attendance'], attendance_fmt, ATTENDANCE_COLUMNS)
+
+        batch_size = options['batch_size']
+        projection = {field: 1 for field in EMPLOYEE_COLUMNS[1:]}
+        references = ReferenceNames()
+        exported = attendance_days = 0
+        next_report = PROGRESS_EVERY
+        started = time.perf_counter()
+        try:
+            cursor = read_collection(Employee).find(query, projection, batch_size=batch_size)
+            for batch in batches(cursor, batch_size):
+                writer.write(employee_rows(batch, references))
+                exported += len(batch)
+                if attendance is not None:
+                    attendance_query = {'emp_id': {'$in': [row['emp_id'] for row in batch if row.get('emp_id')]}}
+                    if days:
+                        attendance_query['date'] = days
+                    days_cursor = read_collection(EmployeeAttendanceDaily).find(
+                        attendance_query, {'emp_id': 1, 'date': 1, 'status': 1, 'records': 1}, batch_size=batch_size,
+                    )
+                    for day_batch in batches(days_cursor, batch_size):
+                        attendance.write(attendance_rows(day_batch))
+                        attendance_days += len(day_batch)
+                if exported >= next_report:
+                    next_report += PROGRESS_EVERY
+                    elapsed = time.perf_counter() - started
+                    log.write(f'{exported} employees, {attendance_days} attendance days, {exported / elapsed:.0f} employees/s')
+        finally:
+            close()
+            if close_attendance is not None:
+                close_attendance()
+
+        elapsed = time.perf_counter() - started
+        summary = f'Exported {exported} employees'
+        if attendance is not None:
+            summary += f' and {attendance_days} attendance days'
+        log.write(self.style.SUCCESS(f'{summary} in {elapsed:.1f} s.'))
@@ -0,0 +1,58 @@
+"""
+Generate a month's payroll outside the web workers (api/payroll.py).
+
+Run with:
+
+    python manage.py generate_payroll --year 2025 --month 1 --processes 8
+    python manage.py generate_payroll --year 2025 --month 1 --department Engineering
+
+Company-wide runs with ``--processes`` > 1 split the work by department
+across that many worker processes, at most the CPU count. Records already
+marked paid are left untouched.
+"""
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Department
+from api.payroll import generate_company_payroll, generate_payroll
+
+
+class Command(BaseCommand):
+    help = "Generate (or regenerate) a month's payroll, optionally across several processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--month', type=int, required=True)
+        parser.add_argument('--department', help='Only this department (id or name).')
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='Worker processes for a company-wide run (default: the CPU count).',
+        )
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if not 1 <= month <= 12:
+            raise CommandError('--month must be between 1 and 12.')
+        if options['processes'] < 1:
+            raise CommandError('--processes must be positive.')
+        if options['department']:
+            summary = generate_payroll(year, month, department=self.department_id(options['department']))
+        else:
+            summary = generate_company_payroll(year, month, processes=options['processes'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {summary["generated"]} payslips for {year}-{month:02d} '
+            f'({summary["skipped_paid"]} already paid) in {summary["elapsed_ms"] / 1000:.1f} s.'
+        ))
+
+    def department_id(self, value):
+        try:
+            return ObjectId(value)
+        except (InvalidId, TypeError):
+            pass
+        row = Department.objects(name=value).only('id').as_pymongo().first()
+        if row is None:
+            raise CommandError(f'--department {value!r}: no such department.')
+        return row['_id']
@@ -0,0 +1,62 @@
+"""
+Backfill the month buckets (attendance_months) from the daily attendance documents.
+
+Run with: python manage.py migrate_attendance_buckets [--batch-size 1000] [--after <_id>] [--check]
+
+Safe to run while ATTENDANCE_DUAL_WRITE is on, and to re-run: days are
+merged with the same $min / $max rules punches use.
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.core.management.base import BaseCommand, CommandError
+
+from api.buckets import migrate_rows
+from api.models import EmployeeAttendanceDaily, EmployeeAttendanceMonth
+from api.pagination import iter_batches
+
+
+def bucket_day_count():
+    """Non-empty day slots across all buckets, and how many lack their daily _id."""
+    days = unlinked = 0
+    for bucket in EmployeeAttendanceMonth._get_collection().find({}, {'days': 1}):
+        for entry in bucket.get('days') or ():
+            if entry:
+                days += 1
+                unlinked += 'a' not in entry
+    return days, unlinked
+
+
+class Command(BaseCommand):
+    help = 'Copy daily attendance into per-employee-month buckets, one _id-ordered batch at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--after', help='Resume after this daily _id (printed with each batch).')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only compare day counts; exit non-zero if the buckets are incomplete.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            try:
+                after = ObjectId(options['after']) if options['after'] else None
+            except InvalidId:
+                raise CommandError('--after must be a daily attendance _id.')
+            migrated = 0
+            queryset = EmployeeAttendanceDaily.objects.only('emp_id', 'date', 'status', 'records').as_pymongo()
+            for batch in iter_batches(queryset, options['batch_size'], after):
+                migrated += migrate_rows(batch)
+                self.stdout.write(f'{migrated} days migrated, last _id {batch[-1]["_id"]}')
+
+        daily = EmployeeAttendanceDaily.objects.count()
+        days, unlinked = bucket_day_count()
+        self.stdout.write(f'daily documents: {daily}, bucket days: {days}, without daily _id: {unlinked}')
+        if days != daily or unlinked:
+            message = 'Buckets do not match the daily documents yet.'
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+            return
+        self.stdout.write(self.style.SUCCESS('Buckets match the daily documents.'))
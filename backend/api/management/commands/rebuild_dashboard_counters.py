@@ -0,0 +1,33 @@
+"""
+Recompute the dashboard counters from the employees and attendance collections.
+
+Run with: python manage.py rebuild_dashboard_counters [--check]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.counters import counter_drift, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute dashboard counters and overwrite any that have drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drift; exit non-zero if any counter is wrong.',
+        )
+
+    def handle(self, *args, **options):
+        drift = counter_drift()
+        for key in sorted(drift):
+            stored, actual = drift[key]
+            self.stdout.write(f'{key}: stored {stored}, actual {actual}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Dashboard counters are consistent.'))
+            return
+        if options['check']:
+            raise CommandError(f'{len(drift)} dashboard counter(s) have drifted.')
+        rebuild_counters(drift)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(drift)} dashboard counter(s).'))
@@ -0,0 +1,304 @@
+"""
+Generate a synthetic organisation for load testing: locations -> branches,
+departments -> designations, employees referencing them, and N months of
+``EmployeeAttendanceDaily`` punches.
+
+Run with: python manage.py seed_hrms --employees 1M --months 1 --processes 8 --drop
+
+Output is a pure function of ``--seed`` and the sizes: every ``_id`` is
+derived from (kind, number), and each employee draws from its own random
+stream, so the worker count and chunk size do not change a single byte.
+Workers insert their own chunks with unordered ``insert_many``; indexes are
+built once at the end, then the dashboard counters are rebuilt.
+
+Attendance: each employee has a habitual arrival time (mostly 08:30-10:00)
+and shift length (~9h). On a weekday they are absent ~4% of the time (no
+document, as with real punches), leave early on a half day ~3% of the
+time, and otherwise punch in around their habit with a late tail. ~5% of
+employees are inactive and have no attendance.
+"""
+import io
+import multiprocessing
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api.indexes import MODELS, ensure_indexes
+from api.models import Branch, Department, Designation, Employee, EmployeeAttendanceDaily, Location
+
+CITIES = (
+    'Chennai', 'Bengaluru', 'Mumbai', 'Hyderabad', 'Pune', 'Delhi', 'Kolkata', 'Ahmedabad',
+    'Kochi', 'Coimbatore', 'Jaipur', 'Lucknow', 'Chandigarh', 'Indore', 'Nagpur', 'Visakhapatnam',
+)
+AREAS = ('Central', 'North', 'South', 'East', 'West', 'Tech Park', 'Airport Road', 'Old Town')
+DEPARTMENTS = (
+    ('Engineering', 'R&D'), ('Quality', 'Testing and release'), ('Operations', 'Delivery'),
+    ('Sales', 'Revenue'), ('Marketing', 'Brand and growth'), ('Finance', 'Accounts'),
+    ('Human Resources', 'People'), ('Customer Support', 'Service desk'), ('IT', 'Internal systems'),
+    ('Legal', 'Compliance'), ('Procurement', 'Vendors'), ('Facilities', 'Workplace'),
+)
+LEVELS = ('Trainee', 'Associate', 'Senior', 'Lead', 'Manager')
+# Basic salary range per level.
+SALARIES = ((15000, 25000), (25000, 45000), (45000, 80000), (80000, 130000), (120000, 200000))
+# Share of employees per level.
+LEVEL_WEIGHTS = (10, 45, 28, 12, 5)
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Bhavna', 'Deepak', 'Divya', 'Gautam', 'Harini',
+    'Ishaan', 'Jaya', 'Karthik', 'Kavya', 'Lakshmi', 'Manoj', 'Meera', 'Naveen', 'Nisha', 'Pooja',
+    'Pranav', 'Priya', 'Rahul', 'Ramya', 'Rohan', 'Sanjay', 'Shreya', 'Suresh', 'Tanvi', 'Vikram',
+)
+LAST_NAMES = (
+    'Iyer', 'Sharma', 'Reddy', 'Nair', 'Patel', 'Gupta', 'Menon', 'Rao', 'Singh', 'Das',
+    'Kumar', 'Pillai', 'Joshi', 'Mehta', 'Krishnan', 'Bose', 'Verma', 'Naidu', 'Shetty', 'Chopra',
+)
+
+# First byte after the timestamp in every generated ObjectId.
+KINDS = {'location': 1, 'branch': 2, 'department': 3, 'designation': 4, 'employee': 5, 'attendance': 6}
+# Timestamp part of every generated ObjectId (2025-01-01T00:00:00Z).
+EPOCH = 1735689600
+DAYS_PER_EMPLOYEE = 400
+BRANCHES_PER_LOCATION = 4
+ABSENT_RATE, HALFDAY_RATE, INACTIVE_RATE = 0.04, 0.03, 0.05
+SEEDED = (Location, Branch, Department, Designation, Employee, EmployeeAttendanceDaily)
+
+
+def object_id(kind, number):
+    """Deterministic ObjectId for the ``number``-th generated document of ``kind``."""
+    return ObjectId(struct.pack('>IB', EPOCH, KINDS[kind]) + number.to_bytes(7, 'big'))
+
+
+def scale(value):
+    """``1000``, ``1k``, ``100k`` or ``1M`` as an int."""
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    try:
+        return int(value[:-1] if multiplier > 1 else value) * multiplier
+    except ValueError:
+        raise ValueError(value) from None
+
+
+class Org:
+    """The sizes of a generated organisation and the references between its parts."""
+
+    def __init__(self, employees, seed=42, months=1, start=date(2025, 1, 1), locations=None):
+        self.employees = employees
+        self.seed = seed
+        self.months = months
+        self.start = start.replace(day=1)
+        self.locations = locations or min(len(CITIES), max(4, employees // 50000))
+        self.branches = self.locations * BRANCHES_PER_LOCATION
+        self.departments = len(DEPARTMENTS)
+        self.designations = self.departments * len(LEVELS)
+        self._dates = [datetime(day.year, day.month, day.day) for day in self.days()]
+
+    def days(self):
+        """The weekdays of the generated months."""
+        day, end = self.start, self.start
+        for _ in range(self.months):
+            end = (end + timedelta(days=32)).replace(day=1)
+        while day < end:
+            if day.weekday() < 5:
+                yield day
+            day += timedelta(days=1)
+
+    def reference_rows(self):
+        """(model, rows) for locations, branches, departments and designations."""
+        yield Location, [
+            {'_id': object_id('location', i), 'location_name': CITIES[i]} for i in range(self.locations)
+        ]
+        yield Branch, [
+            {
+                '_id': object_id('branch', i),
+                'branch_name': f'{CITIES[i // BRANCHES_PER_LOCATION]} {AREAS[i % BRANCHES_PER_LOCATION]}',
+                'location_name': object_id('location', i // BRANCHES_PER_LOCATION),
+            }
+            for i in range(self.branches)
+        ]
+        yield Department, [
+            {
+                '_id': object_id('department', i),
+                'name': name,
+                'description': description,
+                'manager': '',
+                'location': CITIES[i % self.locations],
+            }
+            for i, (name, description) in enumerate(DEPARTMENTS)
+        ]
+        yield Designation, [
+            {
+                '_id': object_id('designation', i),
+                'designation_name': f'{LEVELS[i % len(LEVELS)]} {DEPARTMENTS[i // len(LEVELS)][0]}',
+                'department_name': object_id('department', i // len(LEVELS)),
+            }
+            for i in range(self.designations)
+        ]
+
+    def employee(self, number):
+        """``(employee row, attendance rows)`` for employee ``number``."""
+        rng = random.Random(f'{self.seed}:{number}')
+        branch = rng.randrange(self.branches)
+        department = rng.randrange(self.departments)
+        level = rng.choices(range(len(LEVELS)), LEVEL_WEIGHTS)[0]
+        active = rng.random() >= INACTIVE_RATE
+        emp_id = f'E{number:07d}'
+        row = {
+            '_id': object_id('employee', number),
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'emp_id': emp_id,
+            'email': f'{emp_id.lower()}@example.com',
+            'designation': object_id('designation', department * len(LEVELS) + level),
+            'department': object_id('department', department),
+            'location': object_id('location', branch // BRANCHES_PER_LOCATION),
+            'branch': object_id('branch', branch),
+            'emp_status': active,
+            'basic_salary': float(rng.randrange(*SALARIES[level], 500)),
+        }
+        if not active:
+            return row, []
+
+        # Habits in seconds: arrival around 09:15, shift around 9h.
+        arrival = rng.gauss(9.25 * 3600, 20 * 60)
+        shift = rng.gauss(9 * 3600, 25 * 60)
+        attendance = []
+        for index, day in enumerate(self._dates):
+            roll = rng.random()
+            if roll < ABSENT_RATE:
+                continue
+            check_in = arrival + rng.gauss(0, 8 * 60)
+            if rng.random() < 0.05:
+                # Late tail: traffic, appointments.
+                check_in += rng.expovariate(1 / (40 * 60))
+            halfday = roll < ABSENT_RATE + HALFDAY_RATE
+            worked = rng.gauss(4.5 * 3600, 20 * 60) if halfday else shift + rng.gauss(0, 15 * 60)
+            attendance.append({
+                '_id': object_id('attendance', number * DAYS_PER_EMPLOYEE + index),
+                'emp_id': emp_id,
+                'date': day,
+                'status': 'Halfday' if halfday else 'Present',
+                'records': {'check_in': clock(check_in), 'check_out': clock(check_in + worked)},
+            })
+        return row, attendance
+
+
+def clock(seconds):
+    seconds = int(min(max(seconds, 0), 86399))
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+def insert_chunk(org, first, last, batch_size):
+    """Generate and insert employees ``first`` to ``last`` (exclusive) with their attendance."""
+    employees, attendance = [], []
+    inserted = [0, 0]
+    employee_collection = Employee._get_collection()
+    attendance_collection = EmployeeAttendanceDaily._get_collection()
+    for number in range(first, last):
+        row, days = org.employee(number)
+        employees.append(row)
+        attendance.extend(days)
+        if len(attendance) >= batch_size:
+            attendance_collection.insert_many(attendance, ordered=False)
+            inserted[1] += len(attendance)
+            attendance = []
+        if len(employees) >= batch_size:
+            employee_collection.insert_many(employees, ordered=False)
+            inserted[0] += len(employees)
+            employees = []
+    if employees:
+        employee_collection.insert_many(employees, ordered=False)
+        inserted[0] += len(employees)
+    if attendance:
+        attendance_collection.insert_many(attendance, ordered=False)
+        inserted[1] += len(attendance)
+    return inserted
+
+
+def _worker_init():
+    import django
+    django.setup()
+
+
+def _insert_chunk(args):
+    return insert_chunk(*args)
+
+
+def seed_org(org, processes=1, chunk=10000, batch_size=5000, progress=None):
+    """
+    Insert ``org`` into empty collections and build the indexes. Returns
+    ``(employees, attendance days)`` inserted. With ``processes`` > 1 the
+    employee chunks are generated and inserted by worker processes.
+    """
+    for model, rows in org.reference_rows():
+        model._get_collection().insert_many(rows, ordered=False)
+    tasks = [(org, first, min(first + chunk, org.employees), batch_size) for first in range(0, org.employees, chunk)]
+    totals = [0, 0]
+    if processes <= 1:
+        results = map(_insert_chunk, tasks)
+    else:
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_worker_init)
+        results = pool.map(_insert_chunk, tasks)
+    try:
+        for employees, days in results:
+            totals[0] += employees
+            totals[1] += days
+            if progress:
+                progress(*totals)
+    finally:
+        if processes > 1:
+            pool.shutdown()
+    for model in MODELS:
+        ensure_indexes(model)
+    return tuple(totals)
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic organisation, employees and attendance, in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=scale, default='10k', help='1k, 100k, 1M, ...')
+        parser.add_argument('--months', type=int, default=1, help='Months of attendance.')
+        parser.add_argument('--start', default='2025-01', help='First attendance month, YYYY-MM.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--locations', type=int, help=f'Default: scales with employees, up to {len(CITIES)}.')
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--chunk', type=int, default=10000, help='Employees per worker task.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Documents per insert_many.')
+        parser.add_argument('--drop', action='store_true', help='Drop the seeded collections first.')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('--start must be YYYY-MM.')
+        if options['locations'] is not None and not 1 <= options['locations'] <= len(CITIES):
+            raise CommandError(f'--locations must be between 1 and {len(CITIES)}.')
+        if options['drop']:
+            for model in SEEDED:
+                model.drop_collection()
+        elif any(model._get_collection().estimated_document_count() for model in SEEDED):
+            raise CommandError('The collections are not empty; pass --drop to replace their contents.')
+
+        org = Org(options['employees'], options['seed'], options['months'], start, options['locations'])
+        started = time.perf_counter()
+        last_report = [started]
+
+        def progress(employees, days):
+            now = time.perf_counter()
+            if now - last_report[0] >= 5 or employees == org.employees:
+                last_report[0] = now
+                self.stdout.write(f'{employees}/{org.employees} employees, {days} attendance days, {now - started:.0f} s')
+
+        employees, days = seed_org(org, options['processes'], options['chunk'], options['batch_size'], progress)
+        call_command('rebuild_dashboard_counters', stdout=io.StringIO())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {org.locations} locations, {org.branches} branches, {org.departments} departments, '
+            f'{org.designations} designations, {employees} employees and {days} attendance days '
+            f'in {elapsed:.1f} s ({(employees + days) / elapsed:.0f} documents/s).'
+        ))
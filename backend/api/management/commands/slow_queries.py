@@ -0,0 +1,110 @@
+"""
+Print the worst query shapes in the slow Mongo command log (api/slow_queries.py).
+
+Run with: python manage.py slow_queries [--top 20] [--sort total|count|max|avg] [--view <url name>] [--hours 24]
+
+Entries from every worker's files in SLOW_QUERY_LOG_DIR are grouped by query
+shape; each group shows its slowest commands' totals, the views that issued
+it and the latest explain() summary.
+"""
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from api.slow_queries import log_dir, log_files, read_entries
+
+SORT_KEYS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['max_ms'],
+    'avg': lambda group: group['total_ms'] / group['count'],
+}
+
+
+def group_entries(entries, view=None, since=None):
+    """``{shape_id: group}`` with counts, total/max ms, views and the latest explain."""
+    groups = {}
+    for entry in entries:
+        if view and entry.get('view') != view:
+            continue
+        if since and datetime.fromisoformat(entry['at']) < since:
+            continue
+        group = groups.get(entry['shape_id'])
+        if group is None:
+            group = groups[entry['shape_id']] = {
+                'collection': entry.get('collection'),
+                'command': entry['command'],
+                'shape': entry.get('shape'),
+                'count': 0,
+                'failed': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'views': Counter(),
+                'explain': None,
+                'explained_at': '',
+                'last_at': '',
+            }
+        group['count'] += 1
+        group['failed'] += not entry.get('ok', True)
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        group['views'][entry.get('view') or '(no request)'] += 1
+        group['last_at'] = max(group['last_at'], entry['at'])
+        if entry.get('explain') and entry['at'] >= group['explained_at']:
+            group['explain'], group['explained_at'] = entry['explain'], entry['at']
+    return groups
+
+
+def plan_line(explain):
+    if not explain:
+        return 'not explained'
+    if 'error' in explain:
+        return f'explain failed: {explain["error"]}'
+    line = ' > '.join(reversed(explain['stages'])) or '?'
+    if explain['indexes']:
+        line += f' ({", ".join(explain["indexes"])})'
+    if explain['collscan']:
+        line += '  COLLECTION SCAN'
+    if explain.get('docs_examined') is not None:
+        line += (
+            f'  keys {explain["keys_examined"]}, docs {explain["docs_examined"]}, '
+            f'returned {explain["returned"]}'
+        )
+    return line
+
+
+class Command(BaseCommand):
+    help = 'Print the slowest Mongo query shapes recorded by the slow-query log.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total')
+        parser.add_argument('--view', help='Only commands issued by this URL name.')
+        parser.add_argument('--hours', type=float, help='Only commands from the last N hours.')
+        parser.add_argument('--dir', help='Log directory (default SLOW_QUERY_LOG_DIR).')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or log_dir()
+        if not log_files(directory):
+            self.stdout.write(f'No slow-query logs in {directory}.')
+            return
+        since = None
+        if options['hours']:
+            since = datetime.now(timezone.utc) - timedelta(hours=options['hours'])
+        groups = group_entries(read_entries(directory), options['view'], since)
+        ranked = sorted(groups.values(), key=SORT_KEYS[options['sort']], reverse=True)[:options['top']]
+        total = sum(group['count'] for group in groups.values())
+        self.stdout.write(f'{total} slow commands in {len(groups)} shapes; top {len(ranked)} by {options["sort"]}:')
+        for rank, group in enumerate(ranked, 1):
+            failed = f', {group["failed"]} failed' if group['failed'] else ''
+            self.stdout.write(
+                f'\n{rank:>3}. {group["collection"]}.{group["command"]}  {group["count"]} x, '
+                f'total {group["total_ms"]:.0f} ms, avg {group["total_ms"] / group["count"]:.1f} ms, '
+                f'max {group["max_ms"]:.1f} ms{failed}, last {group["last_at"]}'
+            )
+            self.stdout.write(f'     shape: {json.dumps(group["shape"], sort_keys=True)}')
+            views = ', '.join(f'{name} ({count})' for name, count in group['views'].most_common(5))
+            self.stdout.write(f'     views: {views}')
+            self.stdout.write(f'     plan:  {plan_line(group["explain"])}')
@@ -0,0 +1,245 @@
+"""
+Per-request timings: Mongo commands, database time and JSON serialisation.
+
+``RequestMetricsMiddleware`` (first in ``MIDDLEWARE``) opens a
+``RequestTimings`` for each request in a context variable. ``CommandTimer``,
+a pymongo ``CommandListener`` registered on every client (both mongoengine
+aliases and the async clients of ``api/aio.py``), adds each command's
+``duration_micros`` to it, and ``api.renderers.dumps`` adds the time spent
+encoding JSON. The middleware then
+
+* sets a ``Server-Timing`` header
+  (``mongo;dur=..;desc="N commands", serialize;dur=.., app;dur=.., total;dur=..``,
+  milliseconds), and
+* observes the request in histograms labelled by URL name (the ``name=`` of
+  ``api/urls.py``) and method, which ``/api/metrics`` serves in the
+  Prometheus text format.
+
+Work done while a streaming response is being sent happens after the
+middleware has returned, so it is neither in the header nor the histograms.
+
+The hot path is a context variable lookup and two additions per Mongo
+command, and a few ``perf_counter`` calls and one locked histogram update
+per request (see ``manage.py benchmark_request_metrics``).
+
+This module is imported by ``settings.py``, so it must not import models.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from pymongo import monitoring
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED = 'unmatched'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Mongo commands, database microseconds and serialisation seconds of one
+    request, and the request itself (for ``api/slow_queries.py``).
+    """
+
+    __slots__ = ('request', 'commands', 'db_micros', 'serialize')
+
+    def __init__(self, request=None):
+        self.request = request
+        self.commands = 0
+        self.db_micros = 0
+        self.serialize = 0.0
+
+
+def current():
+    """The timings of the request being handled, or None outside one."""
+    return _current.get()
+
+
+def add_serialize_time(seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.serialize += seconds
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Adds each Mongo command of a request to its ``RequestTimings``."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        timings = _current.get()
+        if timings is not None:
+            timings.commands += 1
+            timings.db_micros += event.duration_micros
+
+    failed = succeeded
+
+
+command_timer = CommandTimer()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a sum and a count, as Prometheus exposes it."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """``[(le, count)]`` including ``+Inf``."""
+        total, result = 0, []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+# name: (help, bucket bounds)
+HISTOGRAMS = {
+    'hrms_request_duration_seconds': ('Time from the first middleware to the response.', SECONDS_BUCKETS),
+    'hrms_request_mongo_seconds': ('Time spent in Mongo commands per request.', SECONDS_BUCKETS),
+    'hrms_request_mongo_commands': ('Mongo commands sent per request.', COMMAND_BUCKETS),
+    'hrms_request_serialize_seconds': ('Time spent encoding JSON per request.', SECONDS_BUCKETS),
+}
+
+
+class RequestMetrics:
+    """Histograms per (URL name, method) and response counts per status."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.series = {}
+            self.responses = {}
+
+    def observe(self, view, method, status, total, timings):
+        values = (total, timings.db_micros / 1e6, timings.commands, timings.serialize)
+        with self._lock:
+            histograms = self.series.get((view, method))
+            if histograms is None:
+                histograms = self.series[(view, method)] = [Histogram(bounds) for _, bounds in HISTOGRAMS.values()]
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+            key = (view, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def exposition(self):
+        """All series in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            series = {key: [(h.cumulative(), h.sum, h.count) for h in histograms] for key, histograms in self.series.items()}
+            responses = dict(self.responses)
+        lines = [
+            '# HELP hrms_http_responses_total Responses by URL name, method and status code.',
+            '# TYPE hrms_http_responses_total counter',
+        ]
+        for (view, method, status), count in sorted(responses.items()):
+            lines.append(f'hrms_http_responses_total{{{_labels(view, method)},status="{status}"}} {count}')
+        for index, (name, (help_text, _)) in enumerate(HISTOGRAMS.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (view, method), values in sorted(series.items()):
+                buckets, total, count = values[index]
+                labels = _labels(view, method)
+                for bound, cumulative in buckets:
+                    lines.append(f'{name}_bucket{{{labels},le="{_number(bound)}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {_number(total)}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(view, method):
+    view = view.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'view="{view}",method="{method}"'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(round(value, 6))
+
+
+request_metrics = RequestMetrics()
+
+
+def server_timing(total, timings):
+    """The ``Server-Timing`` header value for a finished request."""
+    db = timings.db_micros / 1000
+    serialize = timings.serialize * 1000
+    total *= 1000
+    return (
+        f'mongo;dur={db:.3f};desc="{timings.commands} commands", '
+        f'serialize;dur={serialize:.3f}, '
+        f'app;dur={max(total - db - serialize, 0.0):.3f}, '
+        f'total;dur={total:.3f}'
+    )
+
+
+class RequestMetricsMiddleware:
+    """
+    Time each request, set ``Server-Timing`` and feed ``request_metrics``.
+    Off when ``REQUEST_METRICS`` is False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_METRICS', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        started = time.perf_counter()
+        timings = RequestTimings(request)
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        started = time.perf_counter()
+        timings = RequestTimings(request)
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    def finish(self, request, response, total, timings):
+        match = request.resolver_match
+        view = (match.url_name if match else None) or UNMATCHED
+        request_metrics.observe(view, request.method, response.status_code, total, timings)
+        response['Server-Timing'] = server_timing(total, timings)
+        return response
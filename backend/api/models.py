@@ -1,4 +1,7 @@
-from mongoengine import Document, StringField, EmailField,ReferenceField, ObjectIdField,BooleanField,DateField,FloatField,DictField,ListField
+from mongoengine import Document, StringField, EmailField,ReferenceField, ObjectIdField,BooleanField,DateField,FloatField,DictField,ListField,IntField,DateTimeField
+
+# Indexes are declared in each meta but built by `python manage.py ensure_indexes`
+# (auto_create_index is off), so index builds never run inside a request.
 
 class Employee(Document):
     name = StringField(required=True, max_length=200)
@@ -9,13 +12,20 @@ class Employee(Document):
     location = ObjectIdField(required=True)
     branch = ObjectIdField(required=True)
     emp_status = BooleanField(default=True)
+    basic_salary = FloatField(default=0.0)
 
     meta = {
         'collection': 'employees',
         'indexes': [
             'email',
-            'name'
-        ]
+            'name',
+            {'fields': ['emp_id'], 'unique': True},
+            'department',
+            'designation',
+            'location',
+            'branch',
+        ],
+        'auto_create_index': False,
     }
 
     def to_dict(self):
@@ -28,7 +38,8 @@ class Employee(Document):
             'department': str(self.department) if self.department else None,
             'location': str(self.location) if self.location else None,
             'branch': str(self.branch) if self.branch else None,
-            'emp_status': self.emp_status
+            'emp_status': self.emp_status,
+            'basic_salary': self.basic_salary,
         }
 class Department(Document):
     name = StringField(required=True, max_length=200)
@@ -39,6 +50,7 @@ class Department(Document):
     meta = {
         'collection': 'departments',
         'indexes': ['name'],
+        'auto_create_index': False,
     }
 
     def to_dict(self):
@@ -57,6 +69,7 @@ class Designation(Document):
     meta = {
         'collection': 'designations',
         'indexes': ['designation_name'],
+        'auto_create_index': False,
     }
 
     def to_dict(self):
@@ -76,6 +89,7 @@ class Location(Document):
     meta = {
         'collection': 'locations',
         'indexes': ['location_name'],
+        'auto_create_index': False,
     }
 
     def to_dict(self):
@@ -87,7 +101,12 @@ class Location(Document):
 class Branch(Document):
     branch_name = StringField(required=True)
     location_name = ReferenceField('Location', required=True)
-    
+
+    meta = {
+        'indexes': ['location_name'],
+        'auto_create_index': False,
+    }
+
     def to_dict(self):
         return {
             'id': str(self.id),
@@ -104,7 +123,16 @@ class EmployeeAttendanceDaily(Document):
     date = DateField(required=True)
     status = StringField(choices=["Present", "Absent", "Halfday"])
     records = DictField(default=dict)
-    
+
+    meta = {
+        'indexes': [
+            # One document per employee per day; punches upsert on this key.
+            # ensure_indexes merges duplicates left by the old check-in first.
+            {'fields': ['emp_id', 'date'], 'unique': True},
+        ],
+        'auto_create_index': False,
+    }
+
     def to_dict(self):
         return {
             'id': str(self.id),
@@ -113,3 +141,144 @@ class EmployeeAttendanceDaily(Document):
             'status': self.status,
             'records': self.records  # Now matches the model's structure
         }
+
+
+class EmployeeAttendanceMonth(Document):
+    # One document per employee per month (see api/buckets.py). days[n] is
+    # day n + 1: {} when there is no attendance, otherwise
+    # {'a': daily _id, 'i': check_in, 'o': check_out, 's': status if not Present}
+    emp_id = StringField(required=True)
+    month = DateField(required=True)
+    days = ListField(DictField())
+
+    meta = {
+        'collection': 'attendance_months',
+        'indexes': [
+            {'fields': ['emp_id', 'month'], 'unique': True},
+        ],
+        'auto_create_index': False,
+    }
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'emp_id': self.emp_id,
+            'month': self.month,
+            'days': self.days,
+        }
+
+
+class DashboardCounter(Document):
+    # Key such as 'employees:active', 'department:<id>' or 'attendance:<date>:Present'
+    key = StringField(primary_key=True)
+    value = IntField(default=0)
+
+    meta = {
+        'collection': 'dashboard_counters',
+        'auto_create_index': False,
+    }
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'value': self.value,
+        }
+
+
+class CollectionVersion(Document):
+    # One stamp per collection name, bumped by every write view; see api/versions.py
+    name = StringField(primary_key=True)
+    epoch = ObjectIdField()
+    version = IntField(default=0)
+
+    meta = {
+        'collection': 'collection_versions',
+        'auto_create_index': False,
+    }
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'epoch': str(self.epoch) if self.epoch else None,
+            'version': self.version,
+        }
+
+
+class RevokedToken(Document):
+    # A logged-out token's jti; the TTL index drops it once the token expires. See api/revocation.py
+    jti = StringField(primary_key=True)
+    expires_at = DateTimeField(required=True)
+    revoked_at = DateTimeField(required=True)
+
+    meta = {
+        'collection': 'revoked_tokens',
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0},
+            # Workers poll for revocations newer than their last refresh.
+            'revoked_at',
+        ],
+        'auto_create_index': False,
+    }
+
+    def to_dict(self):
+        return {
+            'jti': self.jti,
+            'expires_at': self.expires_at,
+            'revoked_at': self.revoked_at,
+        }
+
+
+class Payroll(Document):
+    emp_id = StringField(required=True)
+    employee = ObjectIdField(required=True)
+    employee_name = StringField()
+    department = ObjectIdField()
+    department_name = StringField()
+    year = IntField(required=True)
+    month = IntField(required=True, min_value=1, max_value=12)
+    working_days = IntField()
+    present_days = IntField()
+    half_days = IntField()
+    absent_days = FloatField()
+    payable_days = FloatField()
+    basic_salary = FloatField()
+    total_allowances = FloatField()
+    total_deductions = FloatField()
+    gross_salary = FloatField()
+    net_salary = FloatField()
+    status = StringField(choices=["generated", "paid"], default="generated")
+    payment_date = DateField()
+    generated_at = DateTimeField()
+
+    meta = {
+        'collection': 'payroll',
+        'indexes': [
+            {'fields': ['year', 'month', 'emp_id'], 'unique': True},
+            ('year', 'month', 'department'),
+        ],
+        'auto_create_index': False,
+    }
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'employee_id': self.emp_id,
+            'employee': str(self.employee) if self.employee else None,
+            'employee_name': self.employee_name,
+            'department': self.department_name,
+            'department_id': str(self.department) if self.department else None,
+            'year': self.year,
+            'month': self.month,
+            'working_days': self.working_days,
+            'present_days': self.present_days,
+            'half_days': self.half_days,
+            'absent_days': self.absent_days,
+            'payable_days': self.payable_days,
+            'basic_salary': self.basic_salary,
+            'total_allowances': self.total_allowances,
+            'total_deductions': self.total_deductions,
+            'gross_salary': self.gross_salary,
+            'net_salary': self.net_salary,
+            'status': self.status,
+            'payment_date': self.payment_date,
+        }
@@ -0,0 +1,139 @@
+"""
+Mongo connection pools and read routing.
+
+``settings.py`` opens two mongoengine connections: the default alias for
+writes and the hot path, and ``MONGO_READ_ALIAS`` with its own (smaller)
+pool and a ``secondaryPreferred`` read preference, which report endpoints
+(payroll lists, attendance ranges, exports) route to with ``reads()`` /
+``read_collection()`` so they do not queue behind attendance writes. Reads
+routed there may lag the primary by the replication delay, so lists served
+with ETags stay on the primary (``api/versions.py``).
+
+Each pool gets a ``PoolMonitor`` (a pymongo ``ConnectionPoolListener``)
+whose counters are served by ``/api/db/pool``.
+
+This module is imported by ``settings.py``, so it must not import models.
+"""
+import threading
+
+from django.conf import settings
+from mongoengine.connection import DEFAULT_CONNECTION_NAME, get_db
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool utilisation counters for one client."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools = {}
+
+    def _pool(self, address):
+        address = '%s:%s' % address
+        if address not in self.pools:
+            self.pools[address] = {
+                'max_pool_size': None,
+                'open': 0,
+                'checked_out': 0,
+                'waiting': 0,
+                'checkouts': 0,
+                'checkout_failures': 0,
+                'wait_ms_total': 0.0,
+                'wait_ms_max': 0.0,
+                'cleared': 0,
+            }
+        return self.pools[address]
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)['max_pool_size'] = event.options.get('maxPoolSize')
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)['cleared'] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools.pop('%s:%s' % event.address, None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)['open'] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event.address)['open'] -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._pool(event.address)['waiting'] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool['waiting'] -= 1
+            pool['checkout_failures'] += 1
+
+    def connection_checked_out(self, event):
+        waited_ms = (getattr(event, 'duration', None) or 0.0) * 1000
+        with self._lock:
+            pool = self._pool(event.address)
+            pool['waiting'] -= 1
+            pool['checked_out'] += 1
+            pool['checkouts'] += 1
+            pool['wait_ms_total'] += waited_ms
+            pool['wait_ms_max'] = max(pool['wait_ms_max'], waited_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address)['checked_out'] -= 1
+
+    def stats(self):
+        with self._lock:
+            pools = {}
+            for address, pool in self.pools.items():
+                pool = dict(pool)
+                pool['wait_ms_avg'] = round(pool['wait_ms_total'] / pool['checkouts'], 3) if pool['checkouts'] else 0.0
+                pool['wait_ms_total'] = round(pool['wait_ms_total'], 3)
+                pool['wait_ms_max'] = round(pool['wait_ms_max'], 3)
+                pools[address] = pool
+            return pools
+
+
+pool_monitors = {}
+
+
+def pool_monitor(alias):
+    """The ``PoolMonitor`` for a connection alias, created on first use."""
+    if alias not in pool_monitors:
+        pool_monitors[alias] = PoolMonitor(alias)
+    return pool_monitors[alias]
+
+
+def pool_stats():
+    return {alias: monitor.stats() for alias, monitor in pool_monitors.items()}
+
+
+def read_alias():
+    return getattr(settings, 'MONGO_READ_ALIAS', None) or DEFAULT_CONNECTION_NAME
+
+
+def reads(queryset):
+    """Route a list/report queryset to the read-only alias."""
+    return queryset.using(read_alias())
+
+
+def read_collection(model):
+    """The raw pymongo collection of ``model`` on the read-only alias."""
+    return get_db(read_alias())[model._get_collection_name()]
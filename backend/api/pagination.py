@@ -0,0 +1,118 @@
+"""
+Keyset (cursor) pagination and streaming for the list endpoints.
+
+Pages are keyed on ``_id``: ``?limit=&after=`` returns one page plus a
+``next`` cursor, and each page is an indexed range scan on ``_id`` no matter
+how deep the client has paged. ``?stream=ndjson`` / ``?stream=json`` streams
+the whole collection for exports, fetching one batch at a time so the worker
+never holds more than a batch in memory (gzipped when the client accepts it,
+see ``api/renderers.py``).
+
+Requests without any of these parameters keep the original plain-list
+response so existing clients continue to work.
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+from rest_framework import status
+from rest_framework.response import Response
+
+from .renderers import STREAM_CONTENT_TYPES, streaming_response
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+STREAM_BATCH_SIZE = 1000
+
+
+def to_dicts(documents):
+    """Default page serializer: call ``to_dict()`` on every document."""
+    return [document.to_dict() for document in documents]
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer.')
+    if limit < 1:
+        raise ValueError('limit must be a positive integer.')
+    return min(limit, MAX_PAGE_LIMIT)
+
+
+def parse_cursor(value):
+    if value in (None, ''):
+        return None
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError('after must be a cursor returned in "next".')
+
+
+def cursor_of(item):
+    """The ``_id`` of a raw row (``as_pymongo()``) or of a document."""
+    return item['_id'] if isinstance(item, dict) else item.id
+
+
+def fetch_page(queryset, after, limit):
+    """Return up to ``limit`` documents with ``_id`` greater than ``after``."""
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return list(queryset.order_by('id').limit(limit))
+
+
+def iter_batches(queryset, batch_size=STREAM_BATCH_SIZE, after=None):
+    """Yield the queryset in ``_id`` order, one batch at a time."""
+    while True:
+        batch = fetch_page(queryset, after, batch_size)
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after = cursor_of(batch[-1])
+
+
+def _stream_pages(queryset, serialize_page, after):
+    for batch in iter_batches(queryset, after=after):
+        yield serialize_page(batch)
+
+
+def list_response(request, queryset, serialize_page=to_dicts):
+    """
+    Build the GET response for a list endpoint.
+
+    ``serialize_page`` receives one page (a list of documents, or raw rows for
+    ``as_pymongo()`` querysets) and returns the list of dicts to send, so
+    per-page work such as resolving references can be batched.
+    """
+    params = request.query_params
+    fmt = params.get('stream')
+    try:
+        limit = parse_limit(params.get('limit'))
+        after = parse_cursor(params.get('after'))
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if fmt:
+        if fmt not in STREAM_CONTENT_TYPES:
+            return Response(
+                {'detail': 'stream must be one of: ' + ', '.join(STREAM_CONTENT_TYPES)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return streaming_response(request, _stream_pages(queryset, serialize_page, after), fmt)
+
+    if limit is None and after is None:
+        return Response(serialize_page(queryset), status=status.HTTP_200_OK)
+
+    limit = limit or DEFAULT_PAGE_LIMIT
+    page = fetch_page(queryset, after, limit + 1)
+    has_more = len(page) > limit
+    page = page[:limit]
+    return Response(
+        {
+            'results': serialize_page(page),
+            'next': str(cursor_of(page[-1])) if has_more else None,
+        },
+        status=status.HTTP_200_OK,
+    )
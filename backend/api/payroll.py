@@ -0,0 +1,207 @@
+"""
+Payroll generation.
+
+A run loads the month's attendance totals for the employees in scope with
+one aggregation per ``ATTENDANCE_CHUNK_SIZE`` of them (``emp_id $in`` on
+the ``(emp_id, date)`` index, never a scan of the whole history), computes pay for all of them at once as NumPy column
+operations and upserts the results with chunked ``bulk_write``s. Company-wide
+runs can be split across worker processes, one department per task plus one
+for employees without a department. ``manage.py generate_payroll`` runs them
+outside the web workers; the API caps processes at ``PAYROLL_MAX_PROCESSES``.
+
+Pay rules, per employee and month:
+
+* working days are the weekdays of the month;
+* payable days = Present days + 0.5 * Halfday days, capped at working days;
+* allowances = basic * ``PAYROLL_ALLOWANCE_RATE``;
+* loss of pay = (basic + allowances) * unpaid share of working days;
+* statutory deduction = earned basic * ``PAYROLL_DEDUCTION_RATE``;
+* net = basic + allowances - loss of pay - statutory deduction.
+"""
+import calendar
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from pymongo import UpdateOne
+
+from . import buckets
+from .attendance import bucket_reads_enabled, day_key, month_range
+from .cache import reference_cache
+from .models import Department, Employee, EmployeeAttendanceDaily, Payroll
+
+DEFAULT_ALLOWANCE_RATE = 0.2
+DEFAULT_DEDUCTION_RATE = 0.12
+WRITE_CHUNK_SIZE = 5000
+ATTENDANCE_CHUNK_SIZE = 1000
+# ``department`` of generate_payroll() for employees without one.
+UNASSIGNED = 'unassigned'
+
+
+def working_days(year, month):
+    """Number of Monday-Friday days in the month."""
+    return sum(1 for week in calendar.monthcalendar(year, month) for day in week[:5] if day)
+
+
+def compute_pay(basic, present, half, working, allowance_rate, deduction_rate):
+    """
+    Vectorised pay computation over equally sized arrays.
+
+    ``basic``, ``present`` and ``half`` are per-employee columns; ``working``
+    is the month's working-day count. Returns a dict of result columns.
+    """
+    basic = np.asarray(basic, dtype=np.float64)
+    present = np.asarray(present, dtype=np.float64)
+    half = np.asarray(half, dtype=np.float64)
+
+    payable = np.minimum(present + 0.5 * half, working)
+    absent = np.maximum(working - present - half, 0.0)
+    earned = payable / working if working else np.zeros_like(payable)
+
+    allowances = basic * allowance_rate
+    gross = basic + allowances
+    loss_of_pay = gross * (1.0 - earned)
+    statutory = basic * earned * deduction_rate
+    deductions = loss_of_pay + statutory
+
+    return {
+        'payable_days': payable,
+        'absent_days': absent,
+        'total_allowances': np.round(allowances, 2),
+        'gross_salary': np.round(gross, 2),
+        'total_deductions': np.round(deductions, 2),
+        'net_salary': np.round(gross - deductions, 2),
+    }
+
+
+def _attendance_totals(emp_ids, year, month):
+    start, end = month_range(year, month)
+    if bucket_reads_enabled():
+        return buckets.attendance_totals(emp_ids, start, end)
+    collection = EmployeeAttendanceDaily._get_collection()
+    totals = {}
+    for offset in range(0, len(emp_ids), ATTENDANCE_CHUNK_SIZE):
+        pipeline = [
+            {'$match': {
+                'emp_id': {'$in': emp_ids[offset:offset + ATTENDANCE_CHUNK_SIZE]},
+                'date': {'$gte': day_key(start), '$lte': day_key(end)},
+            }},
+            {'$group': {
+                '_id': '$emp_id',
+                'present': {'$sum': {'$cond': [{'$eq': ['$status', 'Present']}, 1, 0]}},
+                'half': {'$sum': {'$cond': [{'$eq': ['$status', 'Halfday']}, 1, 0]}},
+            }},
+        ]
+        totals.update((row['_id'], (row['present'], row['half'])) for row in collection.aggregate(pipeline))
+    return totals
+
+
+def generate_payroll(year, month, department=None):
+    """
+    Generate (or regenerate) the month's payroll for one department, for
+    employees without one when ``department`` is ``UNASSIGNED``, or for every
+    active employee when it is None. Records already marked paid are left
+    untouched. Returns a summary dict.
+    """
+    started = time.perf_counter()
+    query = {'emp_status': {'$ne': False}}
+    paid_query = {'year': year, 'month': month, 'status': 'paid'}
+    if department is not None:
+        # {'department': None} matches a null or a missing field.
+        query['department'] = paid_query['department'] = None if department == UNASSIGNED else department
+    employees = list(
+        Employee._get_collection().find(query, {'name': 1, 'emp_id': 1, 'department': 1, 'basic_salary': 1})
+    )
+    paid = {row['emp_id'] for row in Payroll._get_collection().find(paid_query, {'emp_id': 1})}
+    employees = [row for row in employees if row.get('emp_id') and row['emp_id'] not in paid]
+    if not employees:
+        return {'generated': 0, 'skipped_paid': len(paid), 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    emp_ids = [row['emp_id'] for row in employees]
+    totals = _attendance_totals(emp_ids, year, month)
+    present = np.fromiter((totals.get(emp_id, (0, 0))[0] for emp_id in emp_ids), dtype=np.float64, count=len(emp_ids))
+    half = np.fromiter((totals.get(emp_id, (0, 0))[1] for emp_id in emp_ids), dtype=np.float64, count=len(emp_ids))
+    basic = np.fromiter((row.get('basic_salary') or 0.0 for row in employees), dtype=np.float64, count=len(emp_ids))
+
+    working = working_days(year, month)
+    pay = compute_pay(
+        basic,
+        present,
+        half,
+        working,
+        getattr(settings, 'PAYROLL_ALLOWANCE_RATE', DEFAULT_ALLOWANCE_RATE),
+        getattr(settings, 'PAYROLL_DEDUCTION_RATE', DEFAULT_DEDUCTION_RATE),
+    )
+    columns = {name: values.tolist() for name, values in pay.items()}
+    present_list, half_list, basic_list = present.astype(int).tolist(), half.astype(int).tolist(), basic.tolist()
+
+    departments = reference_cache(Department)
+    department_names = {dept: departments.name_of(dept) for dept in {row.get('department') for row in employees}}
+    generated_at = timezone.now()
+    operations = []
+    for i, row in enumerate(employees):
+        fields = {
+            'employee': row['_id'],
+            'employee_name': row.get('name'),
+            'department': row.get('department'),
+            'department_name': department_names[row.get('department')],
+            'working_days': working,
+            'present_days': present_list[i],
+            'half_days': half_list[i],
+            'basic_salary': basic_list[i],
+            'generated_at': generated_at,
+        }
+        for name, values in columns.items():
+            fields[name] = values[i]
+        operations.append(UpdateOne(
+            {'year': year, 'month': month, 'emp_id': row['emp_id']},
+            {'$set': fields, '$setOnInsert': {'status': 'generated'}},
+            upsert=True,
+        ))
+
+    collection = Payroll._get_collection()
+    for offset in range(0, len(operations), WRITE_CHUNK_SIZE):
+        collection.bulk_write(operations[offset:offset + WRITE_CHUNK_SIZE], ordered=False)
+
+    return {
+        'generated': len(operations),
+        'skipped_paid': len(paid),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _worker_init():
+    import django
+    django.setup()
+
+
+def _generate_department(args):
+    year, month, department = args
+    return generate_payroll(year, month, department)
+
+
+def generate_company_payroll(year, month, processes=1):
+    """
+    Company-wide run. With ``processes`` > 1 (at most the CPU count) each
+    department, and the employees without one, is generated in a separate
+    worker process; otherwise everything runs in one pass.
+    """
+    processes = min(processes, os.cpu_count() or 1)
+    if processes <= 1:
+        return generate_payroll(year, month)
+    started = time.perf_counter()
+    departments = Employee._get_collection().distinct('department')
+    tasks = [(year, month, department) for department in departments if department]
+    tasks.append((year, month, UNASSIGNED))
+    summary = {'generated': 0, 'skipped_paid': 0}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_worker_init) as pool:
+        for result in pool.map(_generate_department, tasks):
+            summary['generated'] += result['generated']
+            summary['skipped_paid'] += result['skipped_paid']
+    summary['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return summary
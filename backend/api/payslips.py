@@ -0,0 +1,141 @@
+"""
+Payslip rendering with a content-addressed disk cache.
+
+A payslip's cache key is a hash of the payroll record it is rendered from
+(plus the template version), so re-downloads are a file read and a payslip
+is only rendered again once its payroll data changes. Stale entries are
+never invalidated explicitly; they simply stop being requested and age out
+of the size-bounded LRU.
+
+Files live under ``PAYSLIP_CACHE_DIR`` and the directory is shared by every
+worker process; recency is tracked with file mtimes, which are refreshed on
+every hit.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from calendar import month_name
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+# Bump when api/templates/api/payslip.html changes so old renders are not reused.
+TEMPLATE_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def payslip_key(payroll):
+    """Hash of a serialized payroll record (``Payroll.to_dict`` shape)."""
+    inputs = {key: value for key, value in payroll.items() if key != 'id'}
+    encoded = json.dumps([TEMPLATE_VERSION, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def render_payslip(payroll):
+    period = f'{month_name[payroll["month"]]} {payroll["year"]}'
+    return render_to_string('api/payslip.html', {'payroll': payroll, 'period': period}).encode()
+
+
+class PayslipCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Running estimate of the directory size; a full scan only happens
+        # when it says the cache may be over budget.
+        self._bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.html'
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return content
+
+    def put(self, key, content):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += len(content)
+            over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def get_or_render(self, payroll):
+        key = payslip_key(payroll)
+        content = self.get(key)
+        if content is None:
+            content = render_payslip(payroll)
+            self.put(key, content)
+        return key, content
+
+    def _entries(self):
+        for path in self.directory.glob('*/*.html'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        """Delete least recently used files until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+            self._bytes = total
+
+    def stats(self):
+        entries = list(self._entries())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'files': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
+
+
+_payslip_cache = None
+
+
+def payslip_cache():
+    global _payslip_cache
+    if _payslip_cache is None:
+        _payslip_cache = PayslipCache(
+            getattr(settings, 'PAYSLIP_CACHE_DIR', Path(settings.BASE_DIR) / 'var' / 'payslips'),
+            getattr(settings, 'PAYSLIP_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+        )
+    return _payslip_cache
@@ -0,0 +1,385 @@
+"""
+Write-behind buffer for attendance punches (``ATTENDANCE_WRITE_BEHIND``).
+
+With the mode on, the check-in/check-out views do not wait for Mongo. Each
+punch is appended to a local append-only log and acknowledged once the log
+has been fsync'd; a background thread then writes the buffered punches to
+``EmployeeAttendanceDaily`` in batched ``bulk_write`` upserts.
+
+Durability. Appends are fsync'd in groups: a sync thread waits
+``ATTENDANCE_LOG_GROUP_COMMIT_MS`` after the first unsynced append, then one
+``fsync`` covers every punch appended meanwhile, and their requests return.
+A punch that got its response is therefore on disk. If the fsync fails, or
+does not finish within ``SYNC_TIMEOUT_SECONDS``, ``append`` raises
+``PunchLogUnavailable`` and the views answer 503: the punch may still reach
+Mongo from memory, and retrying it is harmless (see Idempotency).
+
+Segments. The log is a series of segment files in ``ATTENDANCE_LOG_DIR``,
+one line per punch. A worker holds an exclusive ``flock`` on the segment it
+appends to, rolls to a new one past ``SEGMENT_BYTES`` and deletes a rolled
+segment once everything in it has been written to Mongo. On start,
+``PunchBuffer.start()`` replays every segment no live worker holds a lock
+on, i.e. the logs of workers that crashed or were killed, and deletes them.
+
+Processes. ``punch_buffer()`` starts the buffer on the first write-behind
+punch a process handles, never at import or for management commands. A
+forked child (e.g. gunicorn ``--preload`` workers) drops the buffer it
+inherited, without touching the parent's segment, and starts its own.
+
+Idempotency. Punches are applied with the same ``$min`` / ``$max`` upserts
+as the direct path (``api/attendance.py``), so a punch applied twice, e.g.
+flushed to Mongo and then replayed because the worker died before deleting
+its segment, leaves the day document, and the dashboard counters, as they
+were.
+
+Reads of a day may lag a write-behind punch by up to
+``ATTENDANCE_FLUSH_INTERVAL_MS``. Segment locking uses ``fcntl``, so the mode
+needs a POSIX host.
+"""
+import atexit
+import fcntl
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from django.conf import settings
+
+from .attendance import merge_punch, write_days
+
+SEGMENT_BYTES = 4 * 1024 * 1024
+SEGMENT_SUFFIX = '.log'
+DEFAULT_GROUP_COMMIT_MS = 2
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_FLUSH_BATCH = 5000
+# Pause before retrying a flush that failed (Mongo unreachable, ...).
+RETRY_SECONDS = 1.0
+# Longest a request waits for its punch to be fsync'd.
+SYNC_TIMEOUT_SECONDS = 5.0
+
+
+class PunchLogUnavailable(Exception):
+    """The punch could not be made durable in the local log."""
+
+
+def encode_punch(seq, emp_id, day, check_in=None, check_out=None):
+    return orjson.dumps([seq, emp_id, day.strftime('%Y-%m-%d'), check_in, check_out]) + b'\n'
+
+
+def decode_punches(data):
+    """
+    Parse a segment's contents into ``(emp_id, day, check_in, check_out)``
+    tuples. A torn last line, left by a crash mid-append, ends the segment.
+    """
+    punches = []
+    for line in data.split(b'\n'):
+        try:
+            _, emp_id, day, check_in, check_out = orjson.loads(line)
+            punches.append((emp_id, datetime.strptime(day, '%Y-%m-%d'), check_in, check_out))
+        except (orjson.JSONDecodeError, ValueError, TypeError):
+            break
+    return punches
+
+
+def write_punches(punches, batch_size=DEFAULT_FLUSH_BATCH):
+    """Apply ``(emp_id, day, check_in, check_out)`` tuples, ``batch_size`` days per ``bulk_write``."""
+    days = {}
+    for emp_id, day, check_in, check_out in punches:
+        merge_punch(days, emp_id, day, check_in, check_out)
+    keys = list(days)
+    for start in range(0, len(keys), batch_size):
+        write_days({key: days[key] for key in keys[start:start + batch_size]})
+    return len(keys)
+
+
+class Segment:
+    """One locked, append-only log file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab', buffering=0)
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.size = self.file.tell()
+
+    def append(self, data):
+        self.file.write(data)
+        self.size += len(data)
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def delete(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class PunchBuffer:
+    def __init__(self, directory, group_commit_ms=DEFAULT_GROUP_COMMIT_MS,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS, flush_batch=DEFAULT_FLUSH_BATCH):
+        self.directory = Path(directory)
+        self.group_commit = group_commit_ms / 1000
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_batch = flush_batch
+        self._lock = threading.Lock()
+        # Sync thread waits on _appended, appending requests on _durable.
+        self._appended = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        # Held while a segment is fsync'd or rolled, never while appending.
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._segment = None
+        self._retired = []
+        self._pending = []
+        self._written = 0
+        self._synced = 0
+        # Punches up to this sequence number were in an fsync that failed.
+        self._sync_failed = 0
+        self._running = False
+        self._stopping = threading.Event()
+        self._threads = []
+        self.flushed = 0
+        self.replayed = 0
+        self.flush_errors = 0
+        self.sync_errors = 0
+        self.last_sync_error = None
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def start(self):
+        """Replay orphaned segments, open a fresh one and start the background threads."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.replay()
+        with self._lock:
+            self._segment = self._new_segment()
+            self._running = True
+        self._threads = [
+            threading.Thread(target=self._sync_loop, name='punch-log-sync', daemon=True),
+            threading.Thread(target=self._flush_loop, name='punch-log-flush', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop the threads and flush whatever is buffered; the log is kept if that fails."""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._appended.notify_all()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self._sync()
+        if self.flush() and self._segment is not None:
+            self._segment.delete()
+        elif self._segment is not None:
+            self._segment.close()
+
+    def _new_segment(self):
+        name = f'punches-{os.getpid()}-{time.time_ns()}{SEGMENT_SUFFIX}'
+        return Segment(self.directory / name)
+
+    def replay(self):
+        """Apply and delete every segment not locked by a live worker. Returns the punches replayed."""
+        replayed = 0
+        for path in sorted(self.directory.glob('*' + SEGMENT_SUFFIX)):
+            try:
+                segment = Segment(path)
+            except BlockingIOError:
+                continue
+            try:
+                # Replayed and deleted by another worker since the glob.
+                if not path.exists():
+                    continue
+                punches = decode_punches(path.read_bytes())
+                write_punches(punches, self.flush_batch)
+                replayed += len(punches)
+                segment.delete()
+            finally:
+                segment.close()
+        self.replayed += replayed
+        return replayed
+
+    # -- appending ------------------------------------------------------------
+
+    def append(self, emp_id, day, check_in=None, check_out=None):
+        """
+        Log one punch and return once it is on disk. Raises
+        ``PunchLogUnavailable`` if the log could not be written or fsync'd.
+        """
+        with self._lock:
+            if not self._running:
+                raise RuntimeError('The punch buffer is not running.')
+            self._written += 1
+            seq = self._written
+            try:
+                self._segment.append(encode_punch(seq, emp_id, day, check_in, check_out))
+            except OSError as e:
+                self._record_sync_error(seq, e)
+                raise PunchLogUnavailable(f'Punch log write failed: {e}') from e
+            self._pending.append((emp_id, day, check_in, check_out))
+            self._appended.notify()
+            self._durable.wait_for(
+                lambda: self._synced >= seq or self._sync_failed >= seq, timeout=SYNC_TIMEOUT_SECONDS,
+            )
+            # A later fsync succeeding does not bring back data an earlier one lost.
+            if self._sync_failed >= seq:
+                raise PunchLogUnavailable(f'Punch log fsync failed: {self.last_sync_error}')
+            if self._synced < seq:
+                raise PunchLogUnavailable(f'Punch log fsync took over {SYNC_TIMEOUT_SECONDS:g} s.')
+
+    def _record_sync_error(self, target, error):
+        # Called with _lock held.
+        self._sync_failed = max(self._sync_failed, target)
+        self.sync_errors += 1
+        self.last_sync_error = repr(error)
+        self._durable.notify_all()
+
+    def _sync(self):
+        with self._sync_lock:
+            with self._lock:
+                target, segment = self._written, self._segment
+            try:
+                if segment is not None and target > self._synced:
+                    segment.sync()
+            except Exception as e:
+                with self._lock:
+                    self._record_sync_error(target, e)
+                return False
+            with self._lock:
+                self._synced = max(self._synced, target)
+                self._durable.notify_all()
+            return True
+
+    def _sync_loop(self):
+        while True:
+            with self._lock:
+                self._appended.wait_for(
+                    lambda: self._written > max(self._synced, self._sync_failed) or not self._running
+                )
+                if not self._running:
+                    return
+            # Let concurrent requests join this fsync.
+            time.sleep(self.group_commit)
+            self._sync()
+
+    # -- flushing to Mongo --------------------------------------------------
+
+    def _roll(self):
+        """Start a new segment; the old one is deleted after its punches are flushed."""
+        with self._sync_lock:
+            with self._lock:
+                old, target = self._segment, self._written
+                old.sync()
+                self._synced = max(self._synced, target)
+                self._durable.notify_all()
+                self._segment = self._new_segment()
+                self._retired.append(old)
+        old.close()
+
+    def flush(self):
+        """Write the buffered punches to Mongo. Returns False if that, or rolling the segment, failed."""
+        with self._flush_lock:
+            rolled = True
+            try:
+                if self._segment is not None and self._segment.size >= SEGMENT_BYTES:
+                    self._roll()
+            except Exception as e:
+                # The punches are still written below; the roll is retried next flush.
+                with self._lock:
+                    self.sync_errors += 1
+                    self.last_sync_error = repr(e)
+                rolled = False
+            with self._lock:
+                punches, self._pending = self._pending, []
+                retired, self._retired = self._retired, []
+            try:
+                write_punches(punches, self.flush_batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = punches
+                    self._retired[:0] = retired
+                self.flush_errors += 1
+                return False
+            self.flushed += len(punches)
+            for segment in retired:
+                segment.delete()
+            return rolled
+
+    def _flush_loop(self):
+        while not self._stopping.wait(self.flush_interval):
+            if not self.flush():
+                self._stopping.wait(RETRY_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'appended': self._written,
+                'flushed': self.flushed,
+                'replayed': self.replayed,
+                'flush_errors': self.flush_errors,
+                'sync_errors': self.sync_errors,
+                'last_sync_error': self.last_sync_error,
+                'segment_bytes': self._segment.size if self._segment else 0,
+            }
+
+    def abandon(self):
+        """
+        Forget a buffer inherited across ``fork()``: its threads did not
+        survive, and its segment and pending punches belong to the parent.
+        Only the child's copy of the segment file is closed; the parent keeps
+        its lock.
+        """
+        self._running = False
+        self._threads = []
+        self._pending = []
+        for segment in [self._segment, *self._retired]:
+            if segment is not None:
+                segment.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return getattr(settings, 'ATTENDANCE_WRITE_BEHIND', False)
+
+
+def _reset_after_fork():
+    global _buffer, _buffer_lock
+    _buffer_lock = threading.Lock()
+    if _buffer is not None:
+        _buffer.abandon()
+        _buffer = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def punch_buffer():
+    """
+    This process's running ``PunchBuffer``, started (and orphaned segments
+    replayed) on first use.
+    """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = PunchBuffer(
+                    settings.ATTENDANCE_LOG_DIR,
+                    group_commit_ms=settings.ATTENDANCE_LOG_GROUP_COMMIT_MS,
+                    flush_interval_ms=settings.ATTENDANCE_FLUSH_INTERVAL_MS,
+                    flush_batch=settings.ATTENDANCE_FLUSH_BATCH,
+                ).start()
+                atexit.register(buffer.stop)
+                _buffer = buffer
+    return _buffer
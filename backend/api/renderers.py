@@ -0,0 +1,150 @@
+"""
+JSON rendering for the API, built on orjson.
+
+``ORJSONRenderer`` is the project's default DRF renderer. It produces the same
+bytes as DRF's ``JSONRenderer`` (compact separators, UTF-8, ISO 8601 dates
+with ``Z`` for UTC) but encodes dicts, lists, strings, numbers and the raw
+``date`` / ``datetime`` values that ``to_dict()`` returns in C, and
+``ObjectId``s render as their hex string. Anything else goes through DRF's
+own ``JSONEncoder.default``.
+
+``dumps`` reports its time to the request's ``Server-Timing`` serialize entry
+(``api/metrics.py``).
+
+``streaming_response`` writes a large list as a JSON array or NDJSON a batch
+at a time, gzip-compressing the stream on the fly when the client accepts it
+and ``STREAM_GZIP`` is on.
+"""
+import time
+import zlib
+
+import orjson
+from bson import ObjectId
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import add_serialize_time
+
+DEFAULT_GZIP_LEVEL = 6
+# Compressed output is flushed once at least this much has been buffered.
+GZIP_FLUSH_BYTES = 64 * 1024
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    # DRF's rules for datetimes, decimals, lazy strings, querysets, ...
+    return _encoder.default(obj)
+
+
+def dumps(data, indent=False):
+    """Encode ``data`` the way ``JSONRenderer`` would, as bytes."""
+    started = time.perf_counter()
+    try:
+        return _dumps(data, indent)
+    finally:
+        add_serialize_time(time.perf_counter() - started)
+
+
+def _dumps(data, indent):
+    options = _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+    try:
+        encoded = orjson.dumps(data, default=_default, option=options)
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bits, which only the stdlib encoder handles.
+        return JSONRenderer().render(data, 'application/json; indent=2' if indent else None)
+    # Same escaping as JSONRenderer, so the output stays a JavaScript subset.
+    if b'\xe2\x80\xa8' in encoded or b'\xe2\x80\xa9' in encoded:
+        encoded = encoded.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return encoded
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, indent=bool(indent))
+
+
+def encode_stream(items, fmt):
+    """
+    Encode ``items`` (an iterable of lists of dicts, one list per batch) as a
+    JSON array or NDJSON, yielding one bytes chunk per batch.
+    """
+    if fmt == 'json':
+        yield b'['
+    first = True
+    for batch in items:
+        if not batch:
+            continue
+        if fmt == 'ndjson':
+            yield b''.join([dumps(item) + b'\n' for item in batch])
+        else:
+            # One call per batch; only the brackets of the batch array are dropped.
+            yield (b'' if first else b',') + dumps(batch)[1:-1]
+        first = False
+    if fmt == 'json':
+        yield b']'
+
+
+def gzip_stream(chunks, level=DEFAULT_GZIP_LEVEL):
+    """Gzip a stream of bytes chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = 0
+    for chunk in chunks:
+        pending += len(chunk)
+        compressed = compressor.compress(chunk)
+        if pending >= GZIP_FLUSH_BYTES:
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _qvalue(params):
+    for param in params:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepts_gzip(request):
+    """True if ``Accept-Encoding`` allows gzip: listed (or ``*``) with a q-value above 0."""
+    qvalues = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = coding.split(';')
+        qvalues[name.strip().lower()] = _qvalue(params)
+    for name in ('gzip', 'x-gzip', '*'):
+        if name in qvalues:
+            return qvalues[name] > 0
+    return False
+
+
+def streaming_response(request, batches, fmt):
+    """A ``StreamingHttpResponse`` writing ``batches`` as ``fmt`` (see STREAM_CONTENT_TYPES)."""
+    body = encode_stream(batches, fmt)
+    gzip = getattr(settings, 'STREAM_GZIP', True) and accepts_gzip(request)
+    if gzip:
+        body = gzip_stream(body, getattr(settings, 'STREAM_GZIP_LEVEL', DEFAULT_GZIP_LEVEL))
+    response = StreamingHttpResponse(body, content_type=STREAM_CONTENT_TYPES[fmt])
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,185 @@
+"""
+Revocation of logged-out JWTs.
+
+``LogoutView`` records the ``jti`` and expiry of the tokens it is given in
+the ``revoked_tokens`` collection, where a TTL index on ``expires_at`` drops
+each entry once the token could no longer be used anyway.
+
+Checking every request against Mongo would add a round trip to the hot
+path, so each worker mirrors the collection in memory: a Bloom filter that
+answers "not revoked" for almost every token without touching anything
+else, backed by an exact ``jti -> expiry`` map that rules out the filter's
+false positives. At most every ``TOKEN_REVOCATION_REFRESH`` seconds a check
+first fetches the revocations made since the previous refresh (an indexed
+range on ``revoked_at``, overlapped by ``CLOCK_SKEW`` to tolerate clock
+differences between workers), so a token revoked by another worker is
+rejected here within that interval; the worker that handled the logout
+rejects it at once. Expired entries are pruned from the map, and the filter
+rebuilt, as they expire.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from .models import RevokedToken
+
+DEFAULT_REFRESH = 5
+CLOCK_SKEW = timedelta(seconds=30)
+MIN_CAPACITY = 1024
+FALSE_POSITIVE_RATE = 0.01
+
+
+# Datetimes are stored naive in UTC, as Mongo returns them.
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _utcnow():
+    return _utc(time.time())
+
+
+def _timestamp(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings, sized for ``capacity`` keys."""
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.capacity = max(capacity, MIN_CAPACITY)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing over one 128-bit digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._expiry = {}
+            self._bloom = BloomFilter(MIN_CAPACITY)
+            self._next_expiry = math.inf
+            self._since = None
+            self._refreshed_at = None
+            self.refreshes = 0
+            self.bloom_hits = 0
+
+    @property
+    def refresh_seconds(self):
+        return getattr(settings, 'TOKEN_REVOCATION_REFRESH', DEFAULT_REFRESH)
+
+    # -- in-memory mirror -------------------------------------------------
+
+    def _add(self, jti, expires):
+        if jti in self._expiry:
+            return
+        if self._bloom.count >= self._bloom.capacity:
+            self._rebuild(len(self._expiry) * 2)
+        self._expiry[jti] = expires
+        self._bloom.add(jti)
+        self._next_expiry = min(self._next_expiry, expires)
+
+    def _rebuild(self, capacity):
+        self._bloom = BloomFilter(capacity)
+        for jti in self._expiry:
+            self._bloom.add(jti)
+
+    def _prune(self, now):
+        self._expiry = {jti: expires for jti, expires in self._expiry.items() if expires > now}
+        self._next_expiry = min(self._expiry.values(), default=math.inf)
+        self._rebuild(len(self._expiry) * 2)
+
+    # -- syncing with Mongo -------------------------------------------------
+
+    def refresh(self):
+        """Pull revocations made since the last refresh (everything unexpired the first time)."""
+        started = _utcnow()
+        if self._since is None:
+            query = {'expires_at': {'$gt': started}}
+        else:
+            query = {'revoked_at': {'$gte': self._since - CLOCK_SKEW}}
+        rows = list(RevokedToken._get_collection().find(query, {'expires_at': 1}))
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                self._add(row['_id'], _timestamp(row['expires_at']))
+            if self._next_expiry <= now:
+                self._prune(now)
+            self._since = started
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+
+    def _maybe_refresh(self):
+        refreshed_at = self._refreshed_at
+        if refreshed_at is not None and time.monotonic() - refreshed_at < self.refresh_seconds:
+            return
+        # Only one thread refreshes; the others carry on with what is loaded,
+        # unless nothing has been loaded yet.
+        if self._refresh_lock.acquire(blocking=refreshed_at is None):
+            try:
+                if self._refreshed_at is refreshed_at:
+                    self.refresh()
+            finally:
+                self._refresh_lock.release()
+
+    def revoke(self, jti, expires):
+        """Revoke ``jti`` until ``expires`` (a UNIX timestamp, the token's ``exp``)."""
+        if expires <= time.time():
+            return
+        RevokedToken._get_collection().update_one(
+            {'_id': jti},
+            {'$setOnInsert': {'expires_at': _utc(expires), 'revoked_at': _utcnow()}},
+            upsert=True,
+        )
+        with self._lock:
+            self._add(jti, expires)
+
+    def is_revoked(self, jti):
+        self._maybe_refresh()
+        if jti not in self._bloom:
+            return False
+        self.bloom_hits += 1
+        expires = self._expiry.get(jti)
+        return expires is not None and expires > time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revoked': len(self._expiry),
+                'bloom_bits': self._bloom.size,
+                'bloom_hashes': self._bloom.hashes,
+                'bloom_hits': self.bloom_hits,
+                'refreshes': self.refreshes,
+            }
+
+
+_revocations = RevocationList()
+
+
+def revocation_list():
+    return _revocations
@@ -0,0 +1,568 @@
+"""
+In-memory prefix index for the employee typeahead (``/api/employees/search``).
+
+Each employee is split into lowercase tokens (name words, emp_id and its
+parts, the email address and the words of its local part). The index is an
+inverted index in packed arrays: the distinct tokens, sorted, in one UTF-8
+buffer with an int32 offset per token, and the int32 slots of the employees
+having each token (the postings), grouped by token in the same order, with
+an int32 start per token. Every token starting with a prefix is one
+contiguous range of the sorted tokens, found with two bisections, and so are
+its postings. A query matches an employee when every query term is a prefix
+of one of the employee's tokens. A one-term query walks its postings in
+token order and stops at ``limit`` matches; a multi-term query intersects
+the terms' postings with ``np.isin`` first. Every candidate is finally
+checked with a substring test on its joined tokens. A query that is exactly
+an emp_id lists that employee first, found in a sorted array of emp_ids.
+
+Writes through the API never touch the packed arrays. New tokens go into a
+small sorted delta that queries merge in, removed employees are dropped from
+the slot table, and stale postings are filtered out by the same token check.
+Once the delta outgrows ``DELTA_LIMIT`` the arrays are repacked in a
+background thread from the entries already in memory.
+
+Writes made by other worker processes are picked up through the employees
+version stamp (``api/versions.py``). At most every ``EMPLOYEE_SEARCH_REFRESH``
+seconds a search has a background thread read the stamp; if it moved, the
+thread streams the employees from Mongo and applies only those that differ
+from the index, as upserts and removals. Writes that land while it runs are
+replayed on top of it. Writes that bypass the views (e.g. a mongo shell) are
+not seen until a view write bumps the stamp.
+
+Memory, at 500k synthetic employees (2.5M tokens, 2M distinct; ``manage.py
+benchmark_employee_search --memory``), in Python allocations: about 220 MiB
+per worker, of which the packed arrays are 57 MiB and the rest is the
+per-employee entries and the id -> slot table. Building at start-up peaks
+about 85 MiB above that. Repacking the delta peaks about 175 MiB above it,
+because the old arrays serve queries until the new ones are ready. A
+refresh holds one employee at a time plus the changed entries.
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+
+from .models import Employee
+from .versions import current_versions
+
+DEFAULT_REFRESH = 60
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+DELTA_LIMIT = 50000
+SEARCH_FIELDS = ('name', 'emp_id', 'email', 'emp_status')
+# Sorts after every token that starts with a given one: UTF-8 never contains 0xff.
+_PREFIX_END = b'\xff'
+# Bytes of each token compared by NumPy when packing; longer ties are sorted in Python.
+KEY_BYTES = 16
+
+_WORD = re.compile(r'[0-9a-z]+')
+
+
+def employee_tokens(name, emp_id, email):
+    tokens = set(_WORD.findall((name or '').lower()))
+    emp_id = (emp_id or '').lower()
+    if emp_id:
+        tokens.add(emp_id)
+        tokens.update(_WORD.findall(emp_id))
+    email = (email or '').lower()
+    if email:
+        tokens.add(email)
+        tokens.update(_WORD.findall(email.split('@')[0]))
+    return sorted(tokens)
+
+
+def query_terms(q):
+    """Lowercase prefix terms of a query; a query containing '@' is one email prefix."""
+    q = (q or '').strip().lower()
+    if '@' in q:
+        return [q]
+    return _WORD.findall(q)
+
+
+def row_of(employee):
+    """The indexed fields of an Employee document, as a raw row."""
+    return {'_id': employee.id, **{field: getattr(employee, field) for field in SEARCH_FIELDS}}
+
+
+def _entry(row):
+    # (id, name, emp_id, email, emp_status, ' token token ...')
+    tokens = employee_tokens(row.get('name'), row.get('emp_id'), row.get('email'))
+    return (
+        str(row['_id']),
+        row.get('name'),
+        row.get('emp_id'),
+        row.get('email'),
+        row.get('emp_status', True) is not False,
+        ' ' + ' '.join(tokens),
+    )
+
+
+def _tokens_of(doc):
+    return doc[5].split()
+
+
+def _employee_stamp():
+    name = Employee._get_collection_name()
+    return current_versions([name])[name]
+
+
+class PackedTokens:
+    """Sorted distinct tokens in one UTF-8 buffer, with the int32 offset of each and of the end."""
+
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, data=b'', offsets=None):
+        self.data = data
+        self.offsets = np.zeros(1, dtype=np.int32) if offsets is None else offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def bisect(self, key):
+        """Position of the first token >= ``key`` (bytes)."""
+        data, offsets = self.data, self.offsets
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[offsets[mid]:offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.offsets.nbytes
+
+
+def _sort_keys(buf, starts, lengths):
+    """The first ``KEY_BYTES`` of each token, zero-padded, as big-endian uint64 words."""
+    last = len(buf) - 1
+    words = []
+    for word in range(KEY_BYTES // 8):
+        key = np.zeros(len(starts), dtype=np.uint64)
+        for i in range(word * 8, word * 8 + 8):
+            byte = np.where(lengths > i, buf[np.minimum(starts + i, last)], 0).astype(np.uint64)
+            key = (key << np.uint64(8)) | byte
+        words.append(key)
+    return words
+
+
+def _pack(docs):
+    """
+    The packed arrays of ``docs`` (removed slots are None), built with NumPy
+    from one buffer of all their tokens rather than a Python object per
+    token: ``(tokens, starts, postings, emp_ids, emp_slots)``. The postings
+    of ``tokens[i]`` are ``postings[starts[i]:starts[i + 1]]``, in slot
+    order; ``emp_ids`` are the sorted lowercase emp_ids of ``emp_slots``.
+    Offsets are int32: the index stays far below 2 GiB.
+    """
+    texts = [doc[5] if doc is not None else '' for doc in docs]
+    sizes = np.fromiter((len(text.encode()) for text in texts), dtype=np.int64, count=len(texts))
+    # Every entry's tokens start with a space; a final one ends the last token.
+    raw = (''.join(texts) + ' ').encode()
+    del texts
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    spaces = np.flatnonzero(buf == ord(' ')).astype(np.int32)
+    starts = spaces[:-1] + 1
+    lengths = spaces[1:] - starts
+    del spaces
+    starts, lengths = starts[lengths > 0], lengths[lengths > 0]
+    slots = np.searchsorted(np.cumsum(sizes), starts, side='right').astype(np.int32)
+    del sizes
+
+    # lexsort is stable, so equal tokens keep their slot order.
+    keys = _sort_keys(buf, starts, lengths)
+    order = np.lexsort(keys[::-1])
+    same_key = np.ones(max(len(order) - 1, 0), dtype=bool)
+    for key in keys:
+        key = key[order]
+        same_key &= key[1:] == key[:-1]
+    del keys, key
+    starts, lengths, slots = starts[order], lengths[order], slots[order]
+    del order
+
+    def token(i):
+        return raw[starts[i]:starts[i] + lengths[i]]
+
+    # Longer tokens sharing their first KEY_BYTES are ordered by their full bytes.
+    long = lengths >= KEY_BYTES
+    ties = np.flatnonzero(same_key & long[1:] & long[:-1])
+    for run in np.split(ties, np.flatnonzero(np.diff(ties) != 1) + 1) if len(ties) else ():
+        positions = np.arange(run[0], run[-1] + 2)
+        block = positions[sorted(range(len(positions)), key=lambda i: token(positions[i]))]
+        starts[positions], lengths[positions], slots[positions] = starts[block], lengths[block], slots[block]
+
+    same = same_key & (lengths[1:] == lengths[:-1])
+    for position in np.flatnonzero(same & long[1:]).tolist():
+        same[position] = token(position) == token(position + 1)
+    firsts = np.flatnonzero(np.concatenate(([True], ~same))) if len(starts) else np.empty(0, dtype=np.int64)
+    del same_key, same, long
+
+    first_starts, first_lengths = starts[firsts], lengths[firsts]
+    parts = []
+    for offset in range(0, len(firsts), 65536):
+        chunk = zip(first_starts[offset:offset + 65536].tolist(), first_lengths[offset:offset + 65536].tolist())
+        parts.append(b''.join([raw[start:start + length] for start, length in chunk]))
+    offsets = np.zeros(len(firsts) + 1, dtype=np.int32)
+    np.cumsum(first_lengths, out=offsets[1:])
+    posting_starts = np.append(firsts, len(slots)).astype(np.int32)
+
+    emp_ids = np.array([(doc[2] or '').lower().encode() if doc is not None else b'' for doc in docs], dtype=np.bytes_)
+    emp_slots = np.argsort(emp_ids, kind='stable').astype(np.int32)
+    return PackedTokens(b''.join(parts), offsets), posting_starts, slots, emp_ids[emp_slots], emp_slots
+
+
+class EmployeeSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._clear()
+        self._loaded_at = None
+        self._checked_at = None
+        self._stamp = None
+        self._refreshing = False
+        self._pending = []
+        self.rebuilds = 0
+        self.refreshes = 0
+
+    def _clear(self):
+        self._tokens = PackedTokens()
+        self._starts = np.zeros(1, dtype=np.int32)
+        self._postings = np.empty(0, dtype=np.int32)
+        self._emp_ids = np.empty(0, dtype=np.bytes_)
+        self._emp_slots = np.empty(0, dtype=np.int32)
+        # Sorted UTF-8 tokens and their slots, and lowercase emp_id -> slot,
+        # added since the arrays were packed.
+        self._delta_tokens = []
+        self._delta_slots = []
+        self._delta_emp_ids = {}
+        # slot -> entry tuple; None once the employee is removed
+        self._docs = []
+        self._slot_of = {}
+
+    @property
+    def refresh_seconds(self):
+        return getattr(settings, 'EMPLOYEE_SEARCH_REFRESH', DEFAULT_REFRESH)
+
+    # -- building -------------------------------------------------------
+
+    def _install(self, docs, stamp):
+        packed = _pack(docs)
+        slot_of = {doc[0]: slot for slot, doc in enumerate(docs)}
+        with self._lock:
+            self._clear()
+            self._docs, self._slot_of = docs, slot_of
+            self._tokens, self._starts, self._postings, self._emp_ids, self._emp_slots = packed
+            self._stamp = stamp
+            self._loaded_at = self._checked_at = time.monotonic()
+            self.rebuilds += 1
+            for changes in self._pending:
+                self._apply(changes)
+
+    def build(self, rows):
+        """Replace the index with ``rows`` (raw employee dicts)."""
+        self._install([_entry(row) for row in rows], None)
+
+    def _load_rows(self):
+        return Employee._get_collection().find({}, {field: 1 for field in SEARCH_FIELDS})
+
+    def _finish(self):
+        with self._lock:
+            self._refreshing = False
+            self._pending = []
+
+    def _load(self):
+        try:
+            # Read before the documents, so a write racing the load moves it on.
+            stamp = _employee_stamp()
+            self._install([_entry(row) for row in self._load_rows()], stamp)
+        finally:
+            self._finish()
+
+    def _diff(self, rows):
+        """Upserts and removals turning the index into ``rows``."""
+        docs, slot_of = self._docs, self._slot_of
+        seen = np.zeros(len(docs), dtype=bool)
+        changes = []
+        for row in rows:
+            entry = _entry(row)
+            slot = slot_of.get(entry[0])
+            if slot is None or docs[slot] != entry:
+                changes.append(('upsert', entry))
+            if slot is not None and slot < len(seen):
+                seen[slot] = True
+        # Employees added while streaming have slots past ``seen`` and are kept.
+        for slot in np.flatnonzero(~seen).tolist():
+            doc = docs[slot]
+            if doc is not None:
+                changes.append(('remove', doc[0]))
+        return changes
+
+    def _refresh(self):
+        """Apply the employees that changed in Mongo since the stamp the index last saw."""
+        try:
+            stamp = _employee_stamp()
+            if stamp != self._stamp:
+                changes = self._diff(self._load_rows())
+                with self._lock:
+                    self._apply(changes)
+                    for pending in self._pending:
+                        self._apply(pending)
+                    self._stamp = stamp
+                    self.refreshes += 1
+            self._checked_at = time.monotonic()
+        finally:
+            self._finish()
+
+    def _repack(self):
+        """Rebuild the packed arrays from the entries in memory, emptying the delta."""
+        try:
+            with self._lock:
+                docs = list(self._docs)
+            packed = _pack(docs)
+            with self._lock:
+                self._tokens, self._starts, self._postings, self._emp_ids, self._emp_slots = packed
+                self._delta_tokens, self._delta_slots, self._delta_emp_ids = [], [], {}
+                # Entries written while packing go back into the delta whole.
+                added = []
+                for changes in self._pending:
+                    for action, value in changes:
+                        slot = self._slot_of.get(value[0]) if action == 'upsert' else None
+                        if slot is not None:
+                            doc = self._docs[slot]
+                            added.extend((token, slot) for token in _tokens_of(doc))
+                            self._delta_emp_ids[(doc[2] or '').lower()] = slot
+                self._add_to_delta(added)
+                self.rebuilds += 1
+        finally:
+            self._finish()
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            # The first search builds the index itself; concurrent first
+            # searches wait for it.
+            with self._load_lock:
+                if self._loaded_at is None and self._start_refresh():
+                    self._load()
+            return
+        if len(self._delta_tokens) > DELTA_LIMIT:
+            if self._start_refresh():
+                threading.Thread(target=self._repack, daemon=True).start()
+        elif time.monotonic() - self._checked_at >= self.refresh_seconds and self._start_refresh():
+            threading.Thread(target=self._refresh, daemon=True).start()
+
+    # -- incremental updates --------------------------------------------
+
+    def _upsert(self, doc):
+        slot = self._slot_of.get(doc[0])
+        old_tokens = set()
+        if slot is None:
+            slot = len(self._docs)
+            self._docs.append(doc)
+            self._slot_of[doc[0]] = slot
+        else:
+            old_tokens = set(_tokens_of(self._docs[slot]))
+            self._docs[slot] = doc
+        self._delta_emp_ids[(doc[2] or '').lower()] = slot
+        return [(token, slot) for token in _tokens_of(doc) if token not in old_tokens]
+
+    def _remove(self, employee_id):
+        slot = self._slot_of.pop(employee_id, None)
+        if slot is not None:
+            self._docs[slot] = None
+
+    def _add_to_delta(self, added):
+        added = [(token.encode(), slot) for token, slot in added]
+        if len(added) < 64:
+            for token, slot in added:
+                position = bisect_left(self._delta_tokens, token)
+                self._delta_tokens.insert(position, token)
+                self._delta_slots.insert(position, slot)
+        else:
+            pairs = sorted(zip(self._delta_tokens + [t for t, _ in added], self._delta_slots + [s for _, s in added]))
+            self._delta_tokens = [token for token, _ in pairs]
+            self._delta_slots = [slot for _, slot in pairs]
+
+    def _apply(self, changes):
+        added = []
+        for action, value in changes:
+            if action == 'upsert':
+                added.extend(self._upsert(value))
+            else:
+                self._remove(value)
+        self._add_to_delta(added)
+
+    def _change(self, changes):
+        with self._lock:
+            if self._refreshing:
+                self._pending.append(changes)
+            if self._loaded_at is not None:
+                self._apply(changes)
+
+    def upsert(self, row):
+        """Add or replace one employee (a raw row or ``row_of(document)``)."""
+        self._change([('upsert', _entry(row))])
+
+    def upsert_many(self, rows):
+        self._change([('upsert', _entry(row)) for row in rows])
+
+    def remove(self, employee_id):
+        self._change([('remove', str(employee_id))])
+
+    # -- queries ----------------------------------------------------------
+
+    def _ranges(self, term):
+        """Postings ``start, end`` and delta ``start, end`` of the tokens starting with ``term``."""
+        key = term.encode()
+        first, last = self._tokens.bisect(key), self._tokens.bisect(key + _PREFIX_END)
+        return (
+            int(self._starts[first]),
+            int(self._starts[last]),
+            bisect_left(self._delta_tokens, key),
+            bisect_left(self._delta_tokens, key + _PREFIX_END),
+        )
+
+    def _main_slots(self, start, end):
+        # Converted a chunk at a time: a walk usually stops after a few entries.
+        for offset in range(start, end, 256):
+            yield from self._postings[offset:min(offset + 256, end)].tolist()
+
+    def _main_pairs(self, term):
+        """``(token, slot)`` of the packed postings of ``term``, in token order."""
+        key = term.encode()
+        tokens, starts = self._tokens, self._starts
+        for position in range(tokens.bisect(key), tokens.bisect(key + _PREFIX_END)):
+            token = tokens[position]
+            for slot in self._main_slots(int(starts[position]), int(starts[position + 1])):
+                yield token, slot
+
+    def _candidates(self, term, ranges):
+        """Slots whose tokens start with ``term``, in token order."""
+        start, end, delta_start, delta_end = ranges
+        if delta_start == delta_end:
+            return self._main_slots(start, end)
+        delta = zip(self._delta_tokens[delta_start:delta_end], self._delta_slots[delta_start:delta_end])
+        return (slot for _, slot in heapq.merge(self._main_pairs(term), delta))
+
+    def _term_slots(self, ranges):
+        start, end, delta_start, delta_end = ranges
+        if delta_start == delta_end:
+            return self._postings[start:end]
+        delta = np.asarray(self._delta_slots[delta_start:delta_end], dtype=np.int32)
+        return np.concatenate([self._postings[start:end], delta])
+
+    def _intersection(self, narrowest, others):
+        """
+        Candidate slots for a multi-term query: the narrowest term's slots
+        that also appear under every other term, found with vectorised
+        membership tests instead of checking candidates one by one.
+        """
+        candidates = self._term_slots(narrowest)
+        for ranges in others:
+            other = self._term_slots(ranges)
+            if not len(candidates) or not len(other):
+                return []
+            candidates = candidates[np.isin(candidates, other, kind='table')]
+        return candidates.tolist()
+
+    @staticmethod
+    def _size(ranges):
+        start, end, delta_start, delta_end = ranges
+        return end - start + delta_end - delta_start
+
+    def _exact(self, emp_id):
+        """Slot of the employee whose lowercased emp_id is ``emp_id``."""
+        slots = [self._delta_emp_ids[emp_id]] if emp_id in self._delta_emp_ids else []
+        key = emp_id.encode()
+        if len(key) <= self._emp_ids.itemsize:
+            start, end = np.searchsorted(self._emp_ids, key), np.searchsorted(self._emp_ids, key, side='right')
+            slots += self._emp_slots[start:end].tolist()
+        for slot in slots:
+            doc = self._docs[slot]
+            if doc is not None and (doc[2] or '').lower() == emp_id:
+                return slot
+        return None
+
+    def search(self, q, limit=DEFAULT_LIMIT):
+        """Employees matching every term of ``q`` as a token prefix."""
+        terms = query_terms(q)
+        if not terms:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            ranges = {term: self._ranges(term) for term in terms}
+            narrowest = min(terms, key=lambda term: self._size(ranges[term]))
+            # Also re-checks the narrowest term, which drops stale entries
+            # left behind by updates.
+            needles = [' ' + term for term in terms]
+            docs = self._docs
+
+            results, seen = [], set()
+            exact = self._exact(q.strip().lower()) if len(terms) == 1 else None
+            if exact is not None:
+                seen.add(exact)
+                results.append(docs[exact])
+            others = [ranges[term] for term in terms if term != narrowest]
+            if others:
+                candidates = self._intersection(ranges[narrowest], others)
+            else:
+                candidates = self._candidates(narrowest, ranges[narrowest])
+            for slot in candidates:
+                if len(results) >= limit:
+                    break
+                if slot in seen:
+                    continue
+                seen.add(slot)
+                doc = docs[slot]
+                if doc is not None and all(needle in doc[5] for needle in needles):
+                    results.append(doc)
+        return [
+            {'id': doc[0], 'name': doc[1], 'emp_id': doc[2], 'email': doc[3], 'emp_status': doc[4]}
+            for doc in results
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._loaded_at = self._checked_at = None
+            self._stamp = None
+            self._pending = []
+            self.rebuilds = 0
+            self.refreshes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'employees': len(self._slot_of),
+                'tokens': len(self._postings),
+                'distinct_tokens': len(self._tokens),
+                'packed_bytes': sum(
+                    array.nbytes for array in (self._tokens, self._starts, self._postings, self._emp_ids, self._emp_slots)
+                ),
+                'delta_tokens': len(self._delta_tokens),
+                'rebuilds': self.rebuilds,
+                'refreshes': self.refreshes,
+                'age_seconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+            }
+
+
+_index = EmployeeSearchIndex()
+
+
+def employee_search_index():
+    return _index
@@ -0,0 +1,165 @@
+"""
+Raw-document serializers for the list endpoints.
+
+List views read projected raw BSON (``as_pymongo()``) and convert each row
+straight to the shape of the matching model's ``to_dict()``, skipping the
+mongoengine ``Document`` construction that otherwise dominates large GETs.
+Any change to a ``to_dict()`` must be mirrored here; the tests compare both
+paths byte for byte.
+
+Designations and branches reference a Department / Location. Instead of one
+dereference per row, each page resolves every referenced document with a
+single ``$in`` query.
+"""
+from .models import Branch, Department, Designation, Employee, Location, Payroll
+
+EMPLOYEE_FIELDS = (
+    'name', 'emp_id', 'email', 'designation', 'department', 'location', 'branch', 'emp_status', 'basic_salary',
+)
+DEPARTMENT_FIELDS = ('name', 'description', 'manager', 'location')
+LOCATION_FIELDS = ('location_name',)
+DESIGNATION_FIELDS = ('designation_name', 'department_name')
+BRANCH_FIELDS = ('branch_name', 'location_name')
+PAYROLL_NUMBER_FIELDS = (
+    'working_days', 'present_days', 'half_days', 'absent_days', 'payable_days',
+    'basic_salary', 'total_allowances', 'total_deductions', 'gross_salary', 'net_salary',
+)
+
+
+def employee_rows():
+    return Employee.objects.only(*EMPLOYEE_FIELDS).as_pymongo()
+
+
+def department_rows():
+    return Department.objects.only(*DEPARTMENT_FIELDS).as_pymongo()
+
+
+def location_rows():
+    return Location.objects.only(*LOCATION_FIELDS).as_pymongo()
+
+
+def designation_rows():
+    return Designation.objects.only(*DESIGNATION_FIELDS).as_pymongo()
+
+
+def branch_rows():
+    return Branch.objects.only(*BRANCH_FIELDS).as_pymongo()
+
+
+def resolve_names(model, ids, field):
+    """Map ``_id`` -> ``field`` for all ``ids`` with one ``$in`` query."""
+    ids = {ref for ref in ids if ref}
+    if not ids:
+        return {}
+    return {row['_id']: row.get(field) for row in model.objects(id__in=list(ids)).only(field).as_pymongo()}
+
+
+def serialize_employees(rows):
+    """Same output as ``Employee.to_dict`` for every raw row."""
+    return [
+        {
+            'id': str(row['_id']),
+            'name': row.get('name'),
+            'emp_id': row.get('emp_id'),
+            'email': row.get('email'),
+            'designation': str(row['designation']) if row.get('designation') else None,
+            'department': str(row['department']) if row.get('department') else None,
+            'location': str(row['location']) if row.get('location') else None,
+            'branch': str(row['branch']) if row.get('branch') else None,
+            # BooleanField default applies when the field was never stored.
+            'emp_status': row.get('emp_status', True),
+            'basic_salary': float(row.get('basic_salary') or 0.0),
+        }
+        for row in rows
+    ]
+
+
+def serialize_departments(rows):
+    """Same output as ``Department.to_dict`` for every raw row."""
+    return [
+        {
+            'id': str(row['_id']),
+            'name': row.get('name'),
+            'description': row.get('description') or '',
+            'manager': row.get('manager') or '',
+            'location': row.get('location') or '',
+        }
+        for row in rows
+    ]
+
+
+def serialize_locations(rows):
+    """Same output as ``Location.to_dict`` for every raw row."""
+    return [
+        {
+            'id': str(row['_id']),
+            'location_name': row.get('location_name'),
+        }
+        for row in rows
+    ]
+
+
+def _referenced(rows, field, model, name_field):
+    rows = list(rows)
+    names = resolve_names(model, (row.get(field) for row in rows), name_field)
+    for row in rows:
+        ref = row.get(field)
+        if not ref:
+            yield row, None, None
+        elif ref in names:
+            yield row, str(ref), {'id': str(ref), 'name': names[ref]}
+        else:
+            # Dangling reference: keep the id, there is nothing to embed.
+            yield row, str(ref), None
+
+
+def serialize_designations(rows):
+    """Same output as ``Designation.to_dict``, resolving departments per page."""
+    return [
+        {
+            'id': str(row['_id']),
+            'designation_name': row.get('designation_name'),
+            'department_name': ref,
+            'department_data': data,
+        }
+        for row, ref, data in _referenced(rows, 'department_name', Department, 'name')
+    ]
+
+
+def serialize_branches(rows):
+    """Same output as ``Branch.to_dict``, resolving locations per page."""
+    return [
+        {
+            'id': str(row['_id']),
+            'branch_name': row.get('branch_name'),
+            'location_name': ref,
+            'location_data': data,
+        }
+        for row, ref, data in _referenced(rows, 'location_name', Location, 'location_name')
+    ]
+
+
+def payroll_rows(**filters):
+    return Payroll.objects(**filters).exclude('generated_at').as_pymongo()
+
+
+def serialize_payrolls(rows):
+    """Same output as ``Payroll.to_dict`` for every raw row."""
+    serialized = []
+    for row in rows:
+        item = {
+            'id': str(row['_id']),
+            'employee_id': row.get('emp_id'),
+            'employee': str(row['employee']) if row.get('employee') else None,
+            'employee_name': row.get('employee_name'),
+            'department': row.get('department_name'),
+            'department_id': str(row['department']) if row.get('department') else None,
+            'year': row.get('year'),
+            'month': row.get('month'),
+        }
+        for field in PAYROLL_NUMBER_FIELDS:
+            item[field] = row.get(field)
+        item['status'] = row.get('status', 'generated')
+        item['payment_date'] = row['payment_date'].date() if row.get('payment_date') else None
+        serialized.append(item)
+    return serialized
@@ -0,0 +1,376 @@
+"""
+Slow Mongo command log.
+
+``SlowCommandLog`` is a pymongo ``CommandListener`` registered next to
+``api.metrics.command_timer`` on every client. Each command slower than
+``SLOW_QUERY_MS`` is recorded with
+
+* its query shape: the filter, pipeline, update, sort and projection with
+  every value replaced by a type placeholder (``"?string"``, ``"?objectId"``,
+  ``"?array<?string>"``, ...), so no employee data reaches the log;
+* the view it ran for: the URL name and view function of the request
+  ``RequestMetricsMiddleware`` is timing, if any;
+* its duration, and whether it failed;
+* an ``explain()`` summary (winning plan stages, indexes used and, with
+  ``SLOW_QUERY_EXPLAIN=executionStats``, keys/documents examined), at most
+  once per shape every ``EXPLAIN_EVERY`` seconds.
+
+The listener only keeps a reference to each command until it finishes and
+queues the slow ones. A background thread computes the shape, runs the
+explain and appends a JSON line to ``slow-queries.<pid>.jsonl`` in
+``SLOW_QUERY_LOG_DIR``, rotated past ``SLOW_QUERY_LOG_MAX_BYTES`` with
+``BACKUPS`` old files kept. One file per process, so workers never rotate a
+file under each other. ``manage.py slow_queries`` reads them all and prints
+the worst shapes.
+
+This module is imported by ``settings.py``, so it must not import models.
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+from bson import Binary, Decimal128, ObjectId, Regex
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from mongoengine.connection import get_connection
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from . import metrics
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+BACKUPS = 3
+FILE_PREFIX = 'slow-queries.'
+# Seconds before the same shape is explained again.
+EXPLAIN_EVERY = 300
+# Slow commands waiting for the writer thread; more are counted in ``dropped``.
+QUEUE_SIZE = 1000
+
+# Connection handshakes and the log's own explain() calls.
+IGNORED_COMMANDS = {
+    'explain', 'hello', 'isMaster', 'ismaster', 'ping', 'saslStart', 'saslContinue', 'endSessions',
+    'killCursors', 'buildInfo', 'getLastError',
+}
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+# Fields of each command that make up its shape. Sort, projection and the
+# distinct key hold field names and directions only, so they are kept as sent.
+SHAPE_FIELDS = {
+    'find': ('filter', 'sort', 'projection', 'hint'),
+    'aggregate': ('pipeline', 'hint'),
+    'count': ('query', 'hint'),
+    'distinct': ('key', 'query'),
+    'findAndModify': ('query', 'sort', 'fields', 'update'),
+    'update': ('updates',),
+    'delete': ('deletes',),
+}
+LITERAL_FIELDS = {'sort', 'projection', 'fields', 'hint', 'key'}
+# Added by the driver; dropped before the command is explained.
+DRIVER_FIELDS = {
+    'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'startTransaction', 'autocommit',
+    'readConcern', 'writeConcern', 'apiVersion', 'apiStrict', 'apiDeprecationErrors',
+}
+
+
+def _type_name(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float, Decimal, Decimal128)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, ObjectId):
+        return 'objectId'
+    if isinstance(value, datetime):
+        return 'date'
+    if isinstance(value, (Regex, re.Pattern)):
+        return 'regex'
+    if isinstance(value, (bytes, Binary)):
+        return 'binary'
+    return type(value).__name__
+
+
+def value_shape(value):
+    """``value`` with its keys kept and every scalar replaced by ``"?<type>"``."""
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = {}
+        for item in value:
+            shape = value_shape(item)
+            shapes.setdefault(json.dumps(shape, sort_keys=True), shape)
+        if all(isinstance(shape, str) for shape in shapes.values()):
+            return f'?array<{"|".join(sorted(shapes.values()))}>'
+        return list(shapes.values())
+    return f'?{_type_name(value)}'
+
+
+def command_shape(name, command):
+    """The redacted shape of a command, as logged and grouped by."""
+    shape = {}
+    for field in SHAPE_FIELDS.get(name, ()):
+        if field in command:
+            shape[field] = command[field] if field in LITERAL_FIELDS else value_shape(command[field])
+    return shape
+
+
+def shape_id(collection, name, shape):
+    key = json.dumps([collection, name, shape], sort_keys=True, default=str)
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def _find(explanation, key):
+    """The first value under ``key`` anywhere in an explain() document."""
+    if isinstance(explanation, dict):
+        if key in explanation:
+            return explanation[key]
+        values = explanation.values()
+    elif isinstance(explanation, list):
+        values = explanation
+    else:
+        return None
+    for value in values:
+        found = _find(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_nodes(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan
+        for value in plan.values():
+            yield from _plan_nodes(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_nodes(item)
+
+
+def explain_summary(explanation):
+    """Winning plan stages and indexes, and execution counts when present."""
+    nodes = list(_plan_nodes(_find(explanation, 'winningPlan') or {}))
+    stages = [node['stage'] for node in nodes]
+    summary = {
+        'stages': stages,
+        'indexes': sorted({node['indexName'] for node in nodes if node.get('indexName')}),
+        'collscan': 'COLLSCAN' in stages,
+    }
+    stats = _find(explanation, 'executionStats')
+    if isinstance(stats, dict):
+        summary['keys_examined'] = stats.get('totalKeysExamined')
+        summary['docs_examined'] = stats.get('totalDocsExamined')
+        summary['returned'] = stats.get('nReturned')
+        summary['execution_ms'] = stats.get('executionTimeMillis')
+    return summary
+
+
+def explain_command(database, command, verbosity):
+    body = {key: value for key, value in command.items() if key not in DRIVER_FIELDS}
+    return get_connection()[database].command({'explain': body, 'verbosity': verbosity})
+
+
+def log_dir():
+    return Path(getattr(settings, 'SLOW_QUERY_LOG_DIR', None) or settings.BASE_DIR / 'var' / 'slow-queries')
+
+
+def log_files(directory=None):
+    """Every process's slow-query files in ``directory``, current and rotated."""
+    directory = Path(directory or log_dir())
+    if not directory.is_dir():
+        return []
+    return sorted(path for path in directory.iterdir() if path.name.startswith(FILE_PREFIX))
+
+
+def read_entries(directory=None):
+    for path in log_files(directory):
+        with open(path, 'rb') as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line torn by a crash mid-write.
+                    continue
+
+
+class RotatingLog:
+    """Appends lines to ``path``, moving it to ``path.1`` .. ``path.<backups>`` past ``max_bytes``."""
+
+    def __init__(self, path, max_bytes, backups=BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def write(self, line):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        self._file.write(line)
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.close()
+        for number in range(self.backups, 0, -1):
+            source = self.path.with_name(f'{self.path.name}.{number - 1}') if number > 1 else self.path
+            if source.exists():
+                os.replace(source, self.path.with_name(f'{self.path.name}.{number}'))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SlowCommandLog(monitoring.CommandListener):
+    """Queues commands slower than ``SLOW_QUERY_MS`` for the log writer thread."""
+
+    def __init__(self):
+        self._commands = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._thread = None
+        self._pid = None
+        self._log = None
+        self._explained = {}
+        # SLOW_QUERY_MS in microseconds, read on first use: settings are not
+        # configured yet when settings.py builds the listener.
+        self._threshold = None
+        self.dropped = 0
+
+    def threshold_micros(self):
+        if self._threshold is None:
+            self._threshold = getattr(settings, 'SLOW_QUERY_MS', DEFAULT_THRESHOLD_MS) * 1000
+        return self._threshold
+
+    def started(self, event):
+        if self.threshold_micros() > 0 and event.command_name not in IGNORED_COMMANDS:
+            self._commands[(event.connection_id, event.request_id)] = (event.command, event.database_name)
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def _finish(self, event, ok):
+        started = self._commands.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < self.threshold_micros():
+            return
+        view = function = method = None
+        timings = metrics.current()
+        request = timings.request if timings is not None else None
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            view, method = match.url_name, request.method
+            # Class-based and @api_view views resolve to as_view()'s wrapper.
+            func = getattr(match.func, 'view_class', match.func)
+            function = f'{func.__module__}.{func.__name__}'
+        command, database = started
+        entry = (event.command_name, command, database, event.duration_micros, ok, view, function, method)
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((datetime.now(timezone.utc), entry))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # First slow command in this process (or in a forked worker).
+            self._log = self._open_log()
+            self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _open_log():
+        return RotatingLog(
+            log_dir() / f'{FILE_PREFIX}{os.getpid()}.jsonl',
+            getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', DEFAULT_MAX_BYTES),
+        )
+
+    def _run(self):
+        while True:
+            at, entry = self._queue.get()
+            try:
+                self._log.write(json.dumps(self.record(at, *entry), default=str).encode() + b'\n')
+            except Exception:
+                # The log must never take a worker down; the entry is lost.
+                pass
+            finally:
+                self._queue.task_done()
+
+    def record(self, at, name, command, database, duration_micros, ok, view, function, method):
+        collection = command.get(name) if isinstance(command.get(name), str) else None
+        shape = command_shape(name, command)
+        key = shape_id(collection, name, shape)
+        return {
+            'at': at.isoformat(timespec='milliseconds'),
+            'ms': round(duration_micros / 1000, 3),
+            'ok': ok,
+            'database': database,
+            'collection': collection,
+            'command': name,
+            'shape_id': key,
+            'shape': shape,
+            'view': view,
+            'function': function,
+            'method': method,
+            'explain': self.explain(key, name, command, database),
+        }
+
+    def explain(self, key, name, command, database):
+        verbosity = getattr(settings, 'SLOW_QUERY_EXPLAIN', 'queryPlanner')
+        if not verbosity or name not in EXPLAINABLE_COMMANDS:
+            return None
+        now = time.monotonic()
+        last = self._explained.get(key)
+        if last is not None and now - last < EXPLAIN_EVERY:
+            return None
+        self._explained[key] = now
+        try:
+            return explain_summary(explain_command(database, command, verbosity))
+        except (PyMongoError, NotImplementedError, TypeError) as e:
+            return {'error': str(e)}
+
+    def drain(self):
+        """Wait until every queued command has been written (tests, shutdown)."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def reset(self):
+        self.drain()
+        with self._lock:
+            self._commands.clear()
+            self._explained.clear()
+            self._threshold = None
+            self.dropped = 0
+            if self._log is not None:
+                self._log.close()
+                # Picks up a changed SLOW_QUERY_LOG_DIR.
+                self._log = self._open_log()
+
+
+slow_command_log = SlowCommandLog()
+
+
+@receiver(setting_changed)
+def _reload_threshold(setting, **kwargs):
+    if setting == 'SLOW_QUERY_MS':
+        slow_command_log._threshold = None
@@ -1,3 +1,1760 @@
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+import mongoengine
+import mongomock
+from asgiref.sync import sync_to_async
+from bson import ObjectId
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from pymongo import monitoring
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .attendance import attendance_by_day
+from .authentication import ClaimsUser, StatelessJWTAuthentication, UserRefreshToken, user_cache
+from .cache import reference_cache, reset_reference_caches
+from .indexes import winning_stages
+from .payroll import _attendance_totals, generate_company_payroll
+from .payslips import PayslipCache
+from . import punch_log
+from .punch_log import PunchBuffer, PunchLogUnavailable
+from .search import employee_search_index
+from .slow_queries import RotatingLog, read_entries, slow_command_log
+from .versions import bump_version
+from .counters import counter_drift
+from .metrics import RequestMetricsMiddleware, command_timer, request_metrics
+from .mongo import PoolMonitor
+from .renderers import ORJSONRenderer, accepts_gzip, dumps
+from .revocation import BloomFilter, RevocationList, revocation_list
+from .models import (
+    Branch,
+    CollectionVersion,
+    DashboardCounter,
+    Department,
+    Designation,
+    Employee,
+    EmployeeAttendanceDaily,
+    EmployeeAttendanceMonth,
+    Location,
+    Payroll,
+    RevokedToken,
+)
+from .serializers import (
+    branch_rows,
+    department_rows,
+    designation_rows,
+    employee_rows,
+    location_rows,
+    payroll_rows,
+    serialize_branches,
+    serialize_departments,
+    serialize_designations,
+    serialize_employees,
+    serialize_locations,
+    serialize_payrolls,
+)
+
+MODELS = (
+    Employee,
+    Department,
+    Designation,
+    Location,
+    Branch,
+    EmployeeAttendanceDaily,
+    EmployeeAttendanceMonth,
+    Payroll,
+    DashboardCounter,
+    CollectionVersion,
+    RevokedToken,
+)
+
+
+def _ignore_sort(method):
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# mongomock's bulk builder predates the ``sort`` argument pymongo 4.11+ passes.
+_bulk_patches = [
+    mock.patch.object(mongomock.collection.BulkOperationBuilder, name, _ignore_sort(
+        getattr(mongomock.collection.BulkOperationBuilder, name)
+    ))
+    for name in ('add_update', 'add_replace')
+]
+
+
+def setUpModule():
+    # Run every test against an in-memory mongomock client instead of mongod.
+    mongoengine.disconnect()
+    mongoengine.disconnect(alias=settings.MONGO_READ_ALIAS)
+    mongoengine.connect('hrms_test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    # The report alias shares the default client, as a replica set's members share data.
+    mongoengine.connect(
+        'hrms_test',
+        alias=settings.MONGO_READ_ALIAS,
+        host='mongodb://localhost',
+        mongo_client_class=lambda **kwargs: mongoengine.get_connection(),
+    )
+    for patch in _bulk_patches:
+        patch.start()
+
+
+def tearDownModule():
+    for patch in _bulk_patches:
+        patch.stop()
+
+
+@contextmanager
+def count_finds():
+    """Count find() calls per collection name while the block runs."""
+    counts = Counter()
+    original = mongomock.collection.Collection.find
+
+    def find(collection, *args, **kwargs):
+        counts[collection.name] += 1
+        return original(collection, *args, **kwargs)
+
+    with mock.patch.object(mongomock.collection.Collection, 'find', find):
+        yield counts
+
+
+class MongoTestCase(TestCase):
+    def setUp(self):
+        for model in MODELS:
+            model.drop_collection()
+        reset_reference_caches()
+        employee_search_index().reset()
+        user_cache().invalidate()
+        revocation_list().reset()
+        self.user = User.objects.create_user('tester', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_org(self):
+        location = Location(location_name='Chennai').save()
+        branch = Branch(branch_name='T Nagar', location_name=location).save()
+        department = Department(name='Engineering', description='R&D').save()
+        designation = Designation(designation_name='Engineer', department_name=department).save()
+        return designation, department, location, branch
+
+    def make_employees(self, count):
+        designation, department, location, branch = self.make_org()
+        return [
+            Employee(
+                name=f'Employee {i}',
+                emp_id=f'E{i:05d}',
+                email=f'employee{i}@example.com',
+                designation=designation.id,
+                department=department.id,
+                location=location.id,
+                branch=branch.id,
+            ).save()
+            for i in range(count)
+        ]
+
+
+class ListPaginationTests(MongoTestCase):
+    def test_plain_list_is_unchanged(self):
+        employees = self.make_employees(3)
+        response = self.client.get('/api/employees/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [emp.to_dict() for emp in employees])
+
+    def test_cursor_walks_every_row_once(self):
+        employees = self.make_employees(7)
+        seen, after = [], None
+        while True:
+            params = {'limit': 3}
+            if after:
+                params['after'] = after
+            body = self.client.get('/api/employees/', params).json()
+            self.assertLessEqual(len(body['results']), 3)
+            seen.extend(row['id'] for row in body['results'])
+            after = body['next']
+            if after is None:
+                break
+        self.assertEqual(seen, sorted(str(emp.id) for emp in employees))
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/employees/', {'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/employees/', {'after': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/employees/', {'stream': 'xml'}).status_code, 400)
+
+    def test_ndjson_stream(self):
+        employees = self.make_employees(4)
+        response = self.client.get('/api/employees/', {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [emp.to_dict() for emp in employees])
+
+    def test_json_array_stream_for_other_collections(self):
+        designation, department, location, branch = self.make_org()
+        for url, document in (
+            ('/api/departments/', department),
+            ('/api/designations/', designation),
+            ('/api/locations/', location),
+            ('/api/branches/', branch),
+        ):
+            response = self.client.get(url, {'stream': 'json'})
+            body = json.loads(b''.join(response.streaming_content))
+            self.assertEqual(body, [document.to_dict()])
+            self.assertEqual(self.client.get(url, {'limit': 10}).json(), {'results': [document.to_dict()], 'next': None})
+
+    def test_gzip_stream(self):
+        employees = self.make_employees(5)
+        response = self.client.get('/api/employees/', {'stream': 'json'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(body), [emp.to_dict() for emp in employees])
+
+        with self.settings(STREAM_GZIP=False):
+            response = self.client.get('/api/employees/', {'stream': 'json'}, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+        refused = self.client.get('/api/employees/', {'stream': 'json'}, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(b''.join(refused.streaming_content)), [emp.to_dict() for emp in employees])
+
+    def test_accept_encoding_q_values(self):
+        from django.test import RequestFactory
+
+        cases = {
+            'gzip': True,
+            'deflate, gzip;q=0.5': True,
+            'GZIP ; Q=1': True,
+            '*': True,
+            'gzip;q=0': False,
+            'gzip; q=0.0, *': False,
+            'br, *;q=0': False,
+            'identity': False,
+            '': False,
+        }
+        for header, expected in cases.items():
+            request = RequestFactory().get('/api/employees/', HTTP_ACCEPT_ENCODING=header)
+            self.assertIs(accepts_gzip(request), expected, header)
+
+
+class RendererTests(TestCase):
+    def test_same_bytes_as_drf_json_renderer(self):
+        data = {
+            'name': 'Tamil \u00e9 \u2028',
+            'created': datetime.datetime(2025, 1, 6, 9, 30, 15, 123456),
+            'utc': datetime.datetime(2025, 1, 6, 9, 30, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2025, 1, 6),
+            'salary': decimal.Decimal('1234.50'),
+            'rows': [1, 2.5, None, True, (3, 4)],
+            'nested': {'ok': False},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_object_ids_and_big_integers(self):
+        oid = ObjectId()
+        self.assertEqual(dumps({'id': oid}), b'{"id":"%s"}' % str(oid).encode())
+        self.assertEqual(dumps([2 ** 70]), b'[1180591620717411303424]')
+
+
+class RawSerializerTests(MongoTestCase):
+    def assertSameBytes(self, model, rows, serialize):
+        expected = [doc.to_dict() for doc in model.objects.order_by('id')]
+        actual = serialize(rows.order_by('id'))
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_employees(self):
+        employees = self.make_employees(3)
+        employees[1].emp_status = False
+        employees[1].save()
+        # Rows written outside mongoengine may lack defaulted fields.
+        Employee._get_collection().insert_one({'name': 'Raw', 'emp_id': 'R1', 'email': 'raw@example.com'})
+        Employee._get_collection().insert_one(
+            {'name': 'Null', 'emp_id': 'R2', 'email': 'null@example.com', 'basic_salary': None}
+        )
+        self.assertSameBytes(Employee, employee_rows(), serialize_employees)
+        self.assertEqual(self.client.get('/api/employees/').json()[-1]['basic_salary'], 0.0)
+
+    def test_departments(self):
+        Department(name='Sales').save()
+        Department(name='Ops', description='Operations', manager='Asha', location='Pune').save()
+        self.assertSameBytes(Department, department_rows(), serialize_departments)
+
+    def test_locations(self):
+        Location(location_name='Chennai').save()
+        Location(location_name='Madurai').save()
+        self.assertSameBytes(Location, location_rows(), serialize_locations)
+
+    def test_designations_and_branches(self):
+        self.make_org()
+        other = Department(name='Finance').save()
+        Designation(designation_name='Analyst', department_name=other).save()
+        self.assertSameBytes(Designation, designation_rows(), serialize_designations)
+        self.assertSameBytes(Branch, branch_rows(), serialize_branches)
+
+
+class ReferenceBatchingTests(MongoTestCase):
+    def test_designation_list_resolves_departments_in_one_query(self):
+        departments = [Department(name=f'Dept {i}').save() for i in range(5)]
+        for i in range(20):
+            Designation(designation_name=f'Role {i}', department_name=departments[i % 5]).save()
+        expected = [d.to_dict() for d in Designation.objects.order_by('id')]
+
+        with count_finds() as finds:
+            response = self.client.get('/api/designations/')
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(finds['departments'], 1)
+
+        with count_finds() as finds:
+            self.client.get('/api/designations/', {'limit': 8})
+        self.assertEqual(finds['departments'], 1)
+
+    def test_branch_list_resolves_locations_in_one_query(self):
+        locations = [Location(location_name=f'City {i}').save() for i in range(4)]
+        for i in range(12):
+            Branch(branch_name=f'Branch {i}', location_name=locations[i % 4]).save()
+        expected = [b.to_dict() for b in Branch.objects.order_by('id')]
+
+        with count_finds() as finds:
+            response = self.client.get('/api/branches/')
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(finds['locations'], 1)
+
+
+class ReferenceCacheTests(MongoTestCase):
+    def employee_payload(self, i, designation, department, location, branch):
+        return {
+            'name': f'New {i}',
+            'emp_id': f'N{i}',
+            'email': f'new{i}@example.com',
+            'designation': str(designation.id),
+            'department': str(department.id),
+            'location': str(location.id),
+            'branch': str(branch.id),
+            'status': True,
+        }
+
+    def test_employee_writes_validate_references_without_queries(self):
+        org = self.make_org()
+        self.assertEqual(self.client.post('/api/employees/', self.employee_payload(0, *org), format='json').status_code, 201)
+
+        with count_finds() as finds:
+            response = self.client.post('/api/employees/', self.employee_payload(1, *org), format='json')
+            employee_id = response.json()['id']
+            update = self.client.put(
+                f'/api/employees/update/{employee_id}', self.employee_payload(1, *org), format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(update.status_code, 200)
+        for collection in ('designations', 'departments', 'locations', 'branch'):
+            self.assertEqual(finds[collection], 0, collection)
+
+        stats = self.client.get('/api/cache/stats').json()
+        self.assertEqual(stats['departments']['hits'], 3)
+        self.assertEqual(stats['departments']['loads'], 1)
+
+    def test_invalid_and_new_references(self):
+        designation, department, location, branch = self.make_org()
+        bad = self.employee_payload(0, designation, department, location, branch)
+        bad['branch'] = str(designation.id)
+        response = self.client.post('/api/employees/', bad, format='json')
+        self.assertEqual(response.json(), {'detail': 'Invalid branch ID.'})
+
+        # A department created through the API invalidates the cached snapshot.
+        new_department = self.client.post('/api/departments/', {'name': 'Legal'}, format='json').json()
+        payload = self.employee_payload(1, designation, department, location, branch)
+        payload['department'] = new_department['id']
+        self.assertEqual(self.client.post('/api/employees/', payload, format='json').status_code, 201)
+        self.assertEqual(self.client.get('/api/cache/stats').json()['departments']['loads'], 2)
+
+        self.client.delete(f'/api/departments/delete/{new_department["id"]}/')
+        payload = self.employee_payload(2, designation, department, location, branch)
+        payload['department'] = new_department['id']
+        self.assertEqual(self.client.post('/api/employees/', payload, format='json').status_code, 400)
+
+    def test_writes_by_other_workers_are_seen_through_the_stamp(self):
+        designation, department, location, branch = self.make_org()
+        departments = reference_cache(Department)
+        self.assertEqual(departments.name_of(department.id), department.name)
+
+        # Another worker renames the department: its view bumps the stamp but
+        # cannot drop this process's snapshot.
+        Department.objects(id=department.id).update(set__name='Platform')
+        bump_version(Department)
+        with self.settings(REFERENCE_CACHE_VERSION_CHECK=60):
+            self.assertEqual(departments.name_of(department.id), department.name)
+        with self.settings(REFERENCE_CACHE_VERSION_CHECK=0):
+            self.assertEqual(departments.name_of(department.id), 'Platform')
+            self.assertEqual(departments.stats()['loads'], 2)
+            with count_finds() as finds:
+                departments.name_of(department.id)
+            self.assertEqual(finds['departments'], 0)
+            self.assertEqual(departments.stats()['loads'], 2)
+
+
+class BulkImportTests(MongoTestCase):
+    def refs(self):
+        designation, department, location, branch = self.make_org()
+        return {
+            'designation': str(designation.id),
+            'department': str(department.id),
+            'location': str(location.id),
+            'branch': str(branch.id),
+        }
+
+    def test_csv_import_reports_per_row_errors(self):
+        refs = self.refs()
+        Employee(name='Old', emp_id='E1', email='old@example.com', **refs).save()
+        header = 'name,emp_id,email,designation,department,location,branch,status\n'
+        line = '{},{},{},' + ','.join(refs[f] for f in ('designation', 'department', 'location', 'branch')) + ',{}\n'
+        body = header + ''.join([
+            line.format('Asha', 'E2', 'asha@example.com', 'true'),
+            line.format('Ravi', 'E3', 'asha@example.com', 'true'),  # duplicate email in upload
+            line.format('Mani', 'E1', 'mani@example.com', 'false'),  # emp_id already stored
+            line.format('', 'E4', 'blank@example.com', 'true'),
+            line.format('Bad', 'E5', 'not-an-email', 'true'),
+            line.format('Devi', 'E6', 'devi@example.com', 'inactive'),
+        ])
+        response = self.client.post('/api/employees/bulk/', body.encode(), content_type='text/csv')
+        report = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((report['received'], report['inserted'], report['failed']), (6, 2, 4))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3, 4, 5])
+        self.assertEqual(report['errors'][0]['detail'], 'Employee with this email already exists.')
+        self.assertEqual(report['errors'][1]['detail'], 'Employee with this Emp ID already exists.')
+        self.assertFalse(Employee.objects.get(emp_id='E6').emp_status)
+
+    def test_ndjson_import_in_chunks(self):
+        refs = self.refs()
+        rows = [dict(refs, name=f'P{i}', emp_id=f'P{i}', email=f'p{i}@example.com') for i in range(25)]
+        rows[7]['branch'] = refs['location']
+        body = ''.join(json.dumps(row) + '\n' for row in rows) + 'not json\n'
+        with self.settings(EMPLOYEE_IMPORT_CHUNK_SIZE=10):
+            report = self.client.post('/api/employees/bulk/', body.encode(), content_type='application/x-ndjson').json()
+        self.assertEqual(report['inserted'], 24)
+        self.assertEqual(report['errors'], [
+            {'row': 8, 'detail': 'Invalid branch ID.'},
+            {'row': 26, 'detail': 'Row is not a JSON object.'},
+        ])
+        self.assertEqual(Employee.objects.count(), 24)
+        self.assertEqual(self.client.get('/api/employees/').json()[0], Employee.objects.order_by('id').first().to_dict())
+
+    def test_content_type_parameters_are_ignored(self):
+        refs = self.refs()
+        body = 'name,emp_id,email,designation,department,location,branch\n' + ','.join(
+            ['Asha', 'E2', 'asha@example.com'] + [refs[f] for f in ('designation', 'department', 'location', 'branch')]
+        ) + '\n'
+        response = self.client.post('/api/employees/bulk/', body.encode(), content_type='Text/CSV; charset=utf-8')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inserted'], 1)
+
+    def test_unsupported_content_type(self):
+        response = self.client.post('/api/employees/bulk/', b'<xml/>', content_type='application/xml')
+        self.assertEqual(response.status_code, 415)
+
+
+class AttendancePunchTests(MongoTestCase):
+    PUNCHES = [
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T09:12:00', 'direction': 'in'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T18:05:30', 'direction': 'out'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T09:02:10', 'direction': 'in'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T13:00:00', 'direction': 'out'},
+        {'employee_id': 'E2', 'timestamp': '2025-01-06T10:00:00', 'direction': 'in'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-07T08:59:59', 'direction': 'in'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T09:12:00', 'direction': 'in'},
+    ]
+
+    def daily_state(self):
+        return sorted(
+            (row['emp_id'], row['date'], row['status'], row['records'])
+            for row in EmployeeAttendanceDaily.objects.exclude('id').as_pymongo()
+        )
+
+    def replay_one_by_one(self, punches):
+        for punch in punches:
+            day, time = punch['timestamp'].split('T')
+            if punch['direction'] == 'in':
+                url, body = '/api/employee_attendance-check_in/', {'check_in': time}
+            else:
+                url, body = '/api/employee_attendance-check_out/', {'check_out': time}
+            body.update(employee_id=punch['employee_id'], date=day)
+            self.assertIn(self.client.post(url, body, format='json').status_code, (200, 201))
+
+    def test_bulk_matches_one_by_one_replay(self):
+        self.replay_one_by_one(self.PUNCHES)
+        expected = self.daily_state()
+        self.assertEqual(len(expected), 3)
+
+        EmployeeAttendanceDaily.drop_collection()
+        response = self.client.post('/api/employee_attendance-punches/', self.PUNCHES, format='json')
+        self.assertEqual(response.json()['accepted'], 7)
+        self.assertEqual(response.json()['days_created'], 3)
+        self.assertEqual(self.daily_state(), expected)
+
+        # Re-sending the batch is idempotent.
+        self.client.post('/api/employee_attendance-punches/', {'punches': self.PUNCHES[::-1]}, format='json')
+        self.assertEqual(self.daily_state(), expected)
+
+    def test_rejected_punches_are_reported(self):
+        punches = [
+            {'employee_id': 'E1', 'timestamp': '2025-01-06T09:00:00', 'direction': 'in'},
+            {'employee_id': 'E1', 'timestamp': 'yesterday', 'direction': 'in'},
+            {'employee_id': 'E1', 'timestamp': '2025-01-06T09:00:00', 'direction': 'sideways'},
+            {'timestamp': '2025-01-06T09:00:00', 'direction': 'in'},
+        ]
+        body = self.client.post('/api/employee_attendance-punches/', punches, format='json').json()
+        self.assertEqual((body['accepted'], body['rejected']), (1, 3))
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2, 3])
+
+    def test_check_out_by_attendance_id(self):
+        created = self.client.post(
+            '/api/employee_attendance-check_in/',
+            {'employee_id': 'E1', 'date': '2025-01-06', 'check_in': '09:00'},
+            format='json',
+        ).json()
+        self.assertEqual(created['records'], {'check_in': '09:00', 'check_out': ''})
+        updated = self.client.post(
+            '/api/employee_attendance-check_out/', {'attendance_id': created['id'], 'check_out': '18:00'}, format='json'
+        ).json()
+        self.assertEqual(updated['id'], created['id'])
+        self.assertEqual(updated['records'], {'check_in': '09:00', 'check_out': '18:00'})
+
+
+class PunchBufferTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_dir = Path(directory.name)
+
+    def start_buffer(self, **options):
+        # Flushed by hand in these tests, never by the background thread.
+        buffer = PunchBuffer(self.log_dir, flush_interval_ms=3600 * 1000, **options).start()
+        self.addCleanup(buffer.stop)
+        return buffer
+
+    def crash(self, buffer):
+        """Stop the threads and drop the lock without flushing, as if the worker died."""
+        with buffer._lock:
+            buffer._running = False
+            buffer._appended.notify_all()
+        buffer._stopping.set()
+        for thread in buffer._threads:
+            thread.join()
+        buffer._segment.close()
+
+    def daily_state(self):
+        return sorted(
+            (row['emp_id'], row['date'], row['status'], row['records'])
+            for row in EmployeeAttendanceDaily.objects.exclude('id').as_pymongo()
+        )
+
+    def append_shift(self, buffer):
+        day = datetime.datetime(2025, 1, 6)
+        buffer.append('E1', day, check_in='09:12:00')
+        buffer.append('E1', day, check_in='09:02:10')
+        buffer.append('E1', day, check_out='18:05:30')
+        buffer.append('E2', day, check_in='10:00:00')
+
+    def expected_shift(self):
+        day = datetime.datetime(2025, 1, 6)
+        return [
+            ('E1', day, 'Present', {'check_in': '09:02:10', 'check_out': '18:05:30'}),
+            ('E2', day, 'Present', {'check_in': '10:00:00', 'check_out': ''}),
+        ]
+
+    def test_views_acknowledge_then_flush(self):
+        buffer = self.start_buffer()
+        with self.settings(ATTENDANCE_WRITE_BEHIND=True), mock.patch('api.views.punch_buffer', return_value=buffer):
+            response = self.client.post(
+                '/api/employee_attendance-check_in/',
+                {'employee_id': 'E1', 'date': '2025-01-06', 'check_in': '09:00:00'},
+                format='json',
+            )
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()['records'], {'check_in': '09:00:00', 'check_out': None})
+            self.client.post(
+                '/api/employee_attendance-check_out/',
+                {'employee_id': 'E1', 'date': '2025-01-06', 'check_out': '18:00:00'},
+                format='json',
+            )
+        self.assertEqual(EmployeeAttendanceDaily.objects.count(), 0)
+        self.assertTrue(buffer.flush())
+        self.assertEqual(self.daily_state(), [
+            ('E1', datetime.datetime(2025, 1, 6), 'Present', {'check_in': '09:00:00', 'check_out': '18:00:00'}),
+        ])
+
+    def test_crashed_log_is_replayed_on_restart(self):
+        buffer = self.start_buffer()
+        self.append_shift(buffer)
+        self.crash(buffer)
+        segment = buffer._segment.path
+        with open(segment, 'ab') as log:
+            log.write(b'[5,"E3","2025-01')  # torn append
+        self.assertEqual(EmployeeAttendanceDaily.objects.count(), 0)
+
+        restarted = self.start_buffer()
+        self.assertEqual(restarted.replayed, 4)
+        self.assertEqual(self.daily_state(), self.expected_shift())
+        self.assertFalse(segment.exists())
+        self.assertEqual(counter_drift(), {})
+
+    def test_replaying_flushed_punches_is_idempotent(self):
+        buffer = self.start_buffer()
+        self.append_shift(buffer)
+        # Flushed, then the worker dies before deleting its segment.
+        self.assertTrue(buffer.flush())
+        self.crash(buffer)
+        copy = self.log_dir / 'copy.log'
+        copy.write_bytes(buffer._segment.path.read_bytes())
+
+        restarted = self.start_buffer()
+        self.assertEqual(restarted.replayed, 8)
+        self.assertEqual(self.daily_state(), self.expected_shift())
+        self.assertEqual(DashboardCounter.objects.get(key='attendance:2025-01-06:Present').value, 2)
+
+    def test_live_segments_are_not_replayed(self):
+        buffer = self.start_buffer()
+        self.append_shift(buffer)
+        other_worker = self.start_buffer()
+        self.assertEqual(other_worker.replayed, 0)
+        self.assertEqual(EmployeeAttendanceDaily.objects.count(), 0)
+
+    def test_fsyncs_are_grouped(self):
+        buffer = self.start_buffer(group_commit_ms=20)
+        day = datetime.datetime(2025, 1, 6)
+        with mock.patch('api.punch_log.os.fsync', wraps=os.fsync) as fsync:
+            threads = [
+                threading.Thread(target=buffer.append, args=(f'E{i}', day), kwargs={'check_in': '09:00:00'})
+                for i in range(40)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertLess(fsync.call_count, 20)
+        self.assertEqual(buffer.stats()['appended'], 40)
+
+    def test_failed_fsync_answers_503_and_the_sync_thread_survives(self):
+        buffer = self.start_buffer()
+        with self.settings(ATTENDANCE_WRITE_BEHIND=True), mock.patch('api.views.punch_buffer', return_value=buffer):
+            with mock.patch('api.punch_log.os.fsync', side_effect=OSError(5, 'Input/output error')):
+                response = self.client.post(
+                    '/api/employee_attendance-check_in/',
+                    {'employee_id': 'E1', 'date': '2025-01-06', 'check_in': '09:00:00'},
+                    format='json',
+                )
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(buffer.stats()['sync_errors'], 1)
+            response = self.client.post(
+                '/api/employee_attendance-check_in/',
+                {'employee_id': 'E2', 'date': '2025-01-06', 'check_in': '09:30:00'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(all(thread.is_alive() for thread in buffer._threads))
+
+    def test_append_times_out_when_fsync_hangs(self):
+        buffer = self.start_buffer()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch('api.punch_log.SYNC_TIMEOUT_SECONDS', 0.05), \
+                mock.patch('api.punch_log.os.fsync', side_effect=lambda fd: release.wait()):
+            with self.assertRaises(PunchLogUnavailable):
+                buffer.append('E1', datetime.datetime(2025, 1, 6), check_in='09:00:00')
+            release.set()
+
+    def test_failed_roll_does_not_stop_flushing(self):
+        buffer = self.start_buffer()
+        self.append_shift(buffer)
+        with mock.patch('api.punch_log.SEGMENT_BYTES', 1), \
+                mock.patch.object(buffer, '_new_segment', side_effect=OSError(28, 'No space left on device')):
+            self.assertFalse(buffer.flush())
+        self.assertEqual(self.daily_state(), self.expected_shift())
+        with mock.patch('api.punch_log.SEGMENT_BYTES', 1):
+            self.assertTrue(buffer.flush())
+        self.assertEqual(len(list(self.log_dir.glob('*.log'))), 1)
+
+    def test_forked_child_drops_the_inherited_buffer(self):
+        buffer = self.start_buffer()
+        # After a real fork the threads are gone; here they are stopped by hand.
+        self.addCleanup(self.crash, buffer)
+        with mock.patch('api.punch_log._buffer', buffer):
+            punch_log._reset_after_fork()
+            self.assertIsNone(punch_log._buffer)
+        self.assertTrue(buffer._segment.file.closed)
+        self.assertTrue(buffer._segment.path.exists())
+        with self.assertRaises(RuntimeError):
+            buffer.append('E1', datetime.datetime(2025, 1, 6), check_in='09:00:00')
+
+
+class IndexCommandTests(MongoTestCase):
+    def test_builds_declared_indexes(self):
+        call_command('ensure_indexes', '--no-explain', stdout=io.StringIO())
+        call_command('ensure_indexes', '--no-explain', stdout=io.StringIO())  # idempotent
+        attendance = EmployeeAttendanceDaily._get_collection().index_information()
+        self.assertTrue(attendance['emp_id_1_date_1']['unique'])
+        employees = Employee._get_collection().index_information()
+        self.assertTrue(employees['emp_id_1']['unique'])
+        self.assertIn('department_1', employees)
+
+    def test_merges_duplicate_days_before_the_unique_index(self):
+        day = datetime.datetime(2025, 1, 6)
+        collection = EmployeeAttendanceDaily._get_collection()
+        collection.insert_many([
+            {'emp_id': 'E1', 'date': day, 'status': 'Present', 'records': {'check_in': '09:30:00', 'check_out': ''}},
+            {'emp_id': 'E1', 'date': day, 'status': 'Present', 'records': {'check_in': '09:00:00', 'check_out': '17:00:00'}},
+            {'emp_id': 'E1', 'date': day, 'status': 'Present', 'records': {'check_in': '10:00:00', 'check_out': '18:30:00'}},
+            {'emp_id': 'E2', 'date': day, 'status': 'Present', 'records': {'check_in': '09:15:00', 'check_out': ''}},
+        ])
+        first = collection.find_one({'emp_id': 'E1'}, sort=[('_id', 1)])
+        call_command('rebuild_dashboard_counters', stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('ensure_indexes', '--no-explain', stdout=out)
+        self.assertIn('merged away 2 duplicate daily documents', out.getvalue())
+        self.assertTrue(collection.index_information()['emp_id_1_date_1']['unique'])
+        merged = collection.find_one({'emp_id': 'E1'})
+        self.assertEqual(merged['_id'], first['_id'])
+        self.assertEqual(merged['records'], {'check_in': '09:00:00', 'check_out': '18:30:00'})
+        self.assertEqual(collection.count_documents({}), 2)
+        self.assertEqual(counter_drift(), {})
+
+    def test_collscan_detection_walks_nested_plans(self):
+        explanation = {'queryPlanner': {'winningPlan': {
+            'stage': 'SUBPLAN',
+            'inputStage': {'stage': 'OR', 'inputStages': [
+                {'stage': 'IXSCAN', 'indexName': 'email_1'},
+                {'stage': 'COLLSCAN'},
+            ]},
+        }}}
+        self.assertEqual(winning_stages(explanation), ['SUBPLAN', 'OR', 'IXSCAN', 'COLLSCAN'])
+
+
+class AttendanceRangeTests(MongoTestCase):
+    def test_month_for_employee_and_department(self):
+        employees = self.make_employees(3)
+        other_department = Department(name='Other').save()
+        Employee.objects(id=employees[2].id).update(set__department=other_department.id)
+        punches = [
+            {'employee_id': 'E00000', 'timestamp': '2025-01-31T09:00:00', 'direction': 'in'},
+            {'employee_id': 'E00000', 'timestamp': '2025-02-01T09:00:00', 'direction': 'in'},
+            {'employee_id': 'E00001', 'timestamp': '2025-01-02T09:30:00', 'direction': 'in'},
+            {'employee_id': 'E00001', 'timestamp': '2025-01-02T17:30:00', 'direction': 'out'},
+            {'employee_id': 'E00002', 'timestamp': '2025-01-02T09:30:00', 'direction': 'in'},
+        ]
+        self.client.post('/api/employee_attendance-punches/', punches, format='json')
+
+        body = self.client.get('/api/attendance/', {'emp_id': 'E00000', 'month': 1, 'year': 2025}).json()
+        self.assertEqual((body['start'], body['end']), ('2025-01-01', '2025-01-31'))
+        self.assertEqual(list(body['employees']['E00000']), ['2025-01-31'])
+
+        body = self.client.get(
+            '/api/attendance/', {'department': str(employees[0].department), 'start': '2025-01-01', 'end': '2025-01-31'}
+        ).json()
+        self.assertEqual(set(body['employees']), {'E00000', 'E00001'})
+        day = body['employees']['E00001']['2025-01-02']
+        self.assertEqual((day['status'], day['check_in'], day['check_out']), ('Present', '09:30:00', '17:30:00'))
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/attendance/', {'month': 1, 'year': 2025}).status_code, 400)
+        self.assertEqual(self.client.get('/api/attendance/', {'emp_id': 'E1', 'month': 13, 'year': 2025}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/attendance/', {'emp_id': 'E1', 'start': '2024-01-01', 'end': '2025-06-01'}).status_code,
+            400,
+        )
+
+
+class AttendanceBucketTests(MongoTestCase):
+    PUNCHES = [
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T09:12:00', 'direction': 'in'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-06T18:05:30', 'direction': 'out'},
+        {'employee_id': 'E1', 'timestamp': '2025-01-31T08:00:00', 'direction': 'in'},
+        {'employee_id': 'E1', 'timestamp': '2025-02-01T09:00:00', 'direction': 'in'},
+        {'employee_id': 'E2', 'timestamp': '2025-01-06T17:00:00', 'direction': 'out'},
+    ]
+
+    def punch(self):
+        self.client.post('/api/employee_attendance-punches/', self.PUNCHES, format='json')
+        self.client.post(
+            '/api/employee_attendance-check_in/',
+            {'employee_id': 'E2', 'date': '2025-01-07', 'check_in': '10:00:00'},
+            format='json',
+        )
+        self.client.post(
+            '/api/employee_attendance-check_out/',
+            {'employee_id': 'E1', 'date': '2025-01-06', 'check_out': '19:00:00'},
+            format='json',
+        )
+
+    def both_reads(self, emp_ids, start, end):
+        daily = attendance_by_day(emp_ids, start, end)
+        with self.settings(ATTENDANCE_MONTH_READS='buckets'):
+            return daily, attendance_by_day(emp_ids, start, end)
+
+    def test_dual_write_matches_daily_reads(self):
+        with self.settings(ATTENDANCE_DUAL_WRITE=True):
+            self.punch()
+        self.assertEqual(EmployeeAttendanceMonth.objects.count(), 3)
+        bucket = EmployeeAttendanceMonth.objects.get(emp_id='E1', month=datetime.date(2025, 1, 1))
+        self.assertEqual(len(bucket.days), 31)
+        self.assertEqual(bucket.days[5]['i'], '09:12:00')
+
+        daily, monthly = self.both_reads(['E1', 'E2', 'E3'], datetime.date(2025, 1, 1), datetime.date(2025, 2, 28))
+        self.assertEqual(monthly, daily)
+        self.assertEqual(monthly['E1']['2025-01-06']['check_out'], '19:00:00')
+
+    def test_migration_backfills_and_is_idempotent(self):
+        self.punch()
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('migrate_attendance_buckets', '--check', stdout=out)
+        call_command('migrate_attendance_buckets', '--batch-size', '2', stdout=out)
+        call_command('migrate_attendance_buckets', stdout=out)
+        call_command('migrate_attendance_buckets', '--check', stdout=out)
+
+        daily, monthly = self.both_reads(['E1', 'E2'], datetime.date(2025, 1, 1), datetime.date(2025, 2, 28))
+        self.assertEqual(monthly, daily)
+        self.assertEqual(_attendance_totals(['E1', 'E2'], 2025, 1), {'E1': (2, 0), 'E2': (2, 0)})
+        with self.settings(ATTENDANCE_MONTH_READS='buckets'):
+            self.assertEqual(_attendance_totals(['E1', 'E2'], 2025, 1), {'E1': (2, 0), 'E2': (2, 0)})
+
+    def test_partial_ranges_within_a_month(self):
+        with self.settings(ATTENDANCE_DUAL_WRITE=True):
+            self.punch()
+        daily, monthly = self.both_reads(['E1'], datetime.date(2025, 1, 7), datetime.date(2025, 2, 1))
+        self.assertEqual(monthly, daily)
+        self.assertEqual(list(monthly['E1']), ['2025-01-31', '2025-02-01'])
+
+
+class PayrollMonthMixin:
+    def setUp(self):
+        super().setUp()
+        self.employees = self.make_employees(3)
+        for employee, salary in zip(self.employees, (23000.0, 46000.0, 0.0)):
+            employee.basic_salary = salary
+            employee.save()
+        # January 2025 has 23 weekdays.
+        punches = [
+            {'employee_id': 'E00000', 'timestamp': f'2025-01-{day:02d}T09:00:00', 'direction': 'in'}
+            for day in range(1, 24)
+        ] + [{'employee_id': 'E00001', 'timestamp': '2025-01-02T09:00:00', 'direction': 'in'}]
+        self.client.post('/api/employee_attendance-punches/', punches, format='json')
+        EmployeeAttendanceDaily.objects(emp_id='E00001').update(set__status='Halfday')
+
+
+class PayrollTests(PayrollMonthMixin, MongoTestCase):
+
+    def test_generate_and_list(self):
+        summary = self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025}, format='json').json()
+        self.assertEqual(summary['generated'], 3)
+
+        rows = {row['employee_id']: row for row in self.client.get('/api/payroll/', {'month': 1, 'year': 2025}).json()}
+        full, half = rows['E00000'], rows['E00001']
+        self.assertEqual((full['working_days'], full['payable_days']), (23, 23.0))
+        self.assertEqual(full['total_allowances'], 4600.0)
+        self.assertEqual(full['total_deductions'], 2760.0)
+        self.assertEqual(full['net_salary'], 24840.0)
+        self.assertEqual(full['department'], 'Engineering')
+        self.assertEqual((half['half_days'], half['payable_days'], half['absent_days']), (1, 0.5, 22.0))
+        self.assertEqual(half['net_salary'], round(55200 * 0.5 / 23 - 46000 * 0.5 / 23 * 0.12, 2))
+        self.assertEqual(rows['E00002']['net_salary'], 0.0)
+
+        expected = [p.to_dict() for p in Payroll.objects.order_by('id')]
+        self.assertEqual(
+            json.dumps(serialize_payrolls(payroll_rows(year=2025, month=1).order_by('id')), default=str),
+            json.dumps(expected, default=str),
+        )
+
+    def test_paid_records_are_not_regenerated(self):
+        department = str(self.employees[0].department)
+        self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025, 'department': department}, format='json')
+        Payroll.objects(emp_id='E00000').update(set__status='paid', set__net_salary=1.0)
+        summary = self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025}, format='json').json()
+        self.assertEqual((summary['generated'], summary['skipped_paid']), (2, 1))
+        self.assertEqual(Payroll.objects.get(emp_id='E00000').net_salary, 1.0)
+        paid = self.client.get('/api/payroll/', {'month': 1, 'year': 2025, 'status': 'paid'}).json()
+        self.assertEqual([row['employee_id'] for row in paid], ['E00000'])
+
+    def test_company_run_reads_attendance_by_emp_id_chunks(self):
+        expected = _attendance_totals(['E00000', 'E00001', 'E00002'], 2025, 1)
+        aggregate = mongomock.collection.Collection.aggregate
+        with mock.patch('api.payroll.ATTENDANCE_CHUNK_SIZE', 2), mock.patch.object(
+            mongomock.collection.Collection, 'aggregate', autospec=True, side_effect=aggregate,
+        ) as calls:
+            self.assertEqual(_attendance_totals(['E00000', 'E00001', 'E00002'], 2025, 1), expected)
+            self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025}, format='json')
+        matches = [call.args[1][0]['$match'] for call in calls.call_args_list]
+        self.assertEqual([match['emp_id']['$in'] for match in matches[:2]], [['E00000', 'E00001'], ['E00002']])
+        self.assertTrue(all('emp_id' in match for match in matches))
+        self.assertEqual(Payroll.objects(emp_id='E00001').first().half_days, 1)
+
+    def test_requires_period(self):
+        self.assertEqual(self.client.get('/api/payroll/').status_code, 400)
+        self.assertEqual(self.client.post('/api/payroll/generate/', {'month': 13, 'year': 2025}, format='json').status_code, 400)
+
+    def test_processes_must_be_a_positive_integer(self):
+        for processes in ('abc', [], 0, -2):
+            response = self.client.post(
+                '/api/payroll/generate/', {'month': 1, 'year': 2025, 'processes': processes}, format='json',
+            )
+            self.assertEqual(response.status_code, 400, processes)
+        self.assertEqual(Payroll.objects.count(), 0)
+
+    def test_processes_are_capped(self):
+        with mock.patch('api.views.generate_company_payroll', return_value={}) as generate:
+            with self.settings(PAYROLL_MAX_PROCESSES=2):
+                self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025, 'processes': 64}, format='json')
+        self.assertEqual(generate.call_args.kwargs['processes'], 2)
+
+    def test_split_run_includes_employees_without_a_department(self):
+        collection = Employee._get_collection()
+        collection.update_one({'emp_id': 'E00001'}, {'$unset': {'department': ''}})
+        collection.update_one({'emp_id': 'E00002'}, {'$set': {'department': None}})
+        single = generate_company_payroll(2025, 1, processes=1)
+        Payroll.drop_collection()
+
+        def threads(max_workers, mp_context, initializer):
+            # Worker processes would not see the in-memory database.
+            return ThreadPoolExecutor(max_workers)
+
+        with mock.patch('api.payroll.ProcessPoolExecutor', threads), mock.patch('api.payroll.os.cpu_count', return_value=4):
+            split = generate_company_payroll(2025, 1, processes=4)
+        self.assertEqual(single['generated'], 3)
+        self.assertEqual(split['generated'], single['generated'])
+        self.assertEqual(sorted(Payroll.objects.distinct('emp_id')), ['E00000', 'E00001', 'E00002'])
+
+    def test_generate_payroll_command(self):
+        out = io.StringIO()
+        call_command('generate_payroll', year=2025, month=1, processes=1, stdout=out)
+        self.assertIn('Generated 3 payslips for 2025-01', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_payroll', year=2025, month=1, department='Nowhere', stdout=out)
+
+
+class PayslipTests(PayrollMonthMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = PayslipCache(directory.name, max_bytes=10 * 1024 * 1024)
+        patcher = mock.patch('api.payslips._payslip_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025}, format='json')
+
+    def test_payslip_is_cached_until_payroll_changes(self):
+        url = '/api/payroll/E00000/payslip/'
+        first = self.client.get(url, {'month': 1, 'year': 2025})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b'24840.00', first.content)
+        second = self.client.get(url, {'month': 1, 'year': 2025})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        Payroll.objects(emp_id='E00000').update(set__status='paid')
+        third = self.client.get(url, {'month': 1, 'year': 2025})
+        self.assertNotEqual(third['X-Payslip-Key'], first['X-Payslip-Key'])
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(self.client.get(url, {'month': 2, 'year': 2025}).status_code, 404)
+
+    def test_lru_eviction(self):
+        cache = PayslipCache(self.cache.directory / 'small', max_bytes=2500)
+        for i in range(3):
+            cache.put(f'{i:064x}', b'x' * 1000)
+            os.utime(cache._path(f'{i:064x}'), (i, i))
+        cache.put(f'{9:064x}', b'x' * 1000)
+        self.assertIsNone(cache.get(f'{0:064x}'))
+        self.assertIsNotNone(cache.get(f'{9:064x}'))
+        self.assertEqual(cache.stats()['evictions'], 2)
+        self.assertLessEqual(cache.stats()['bytes'], 2500)
+
+
+class DashboardCounterTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.designation, self.department, self.location, self.branch = self.make_org()
+
+    def payload(self, i, **overrides):
+        return dict({
+            'name': f'Dash {i}',
+            'emp_id': f'D{i}',
+            'email': f'dash{i}@example.com',
+            'designation': str(self.designation.id),
+            'department': str(self.department.id),
+            'location': str(self.location.id),
+            'branch': str(self.branch.id),
+            'status': True,
+        }, **overrides)
+
+    def summary(self, **params):
+        return self.client.get('/api/dashboard/summary', params).json()
+
+    def test_counters_follow_employee_and_attendance_writes(self):
+        ids = [self.client.post('/api/employees/', self.payload(i), format='json').json()['id'] for i in range(3)]
+        other = Department(name='Sales').save()
+        self.client.put(
+            f'/api/employees/update/{ids[0]}',
+            self.payload(0, department=str(other.id), status=False),
+            format='json',
+        )
+        self.client.delete(f'/api/employees/delete/{ids[1]}')
+        body = '\n'.join(json.dumps(self.payload(i)) for i in (3, 4, 4))
+        self.client.post('/api/employees/bulk/', body.encode(), content_type='application/x-ndjson')
+
+        self.client.post(
+            '/api/employee_attendance-check_in/',
+            {'employee_id': 'D2', 'date': '2025-01-06', 'check_in': '09:00'},
+            format='json',
+        )
+        self.client.post(
+            '/api/employee_attendance-check_out/',
+            {'employee_id': 'D2', 'date': '2025-01-06', 'check_out': '18:00'},
+            format='json',
+        )
+        self.client.post('/api/employee_attendance-punches/', [
+            {'employee_id': 'D3', 'timestamp': '2025-01-06T09:00:00', 'direction': 'in'},
+            {'employee_id': 'D2', 'timestamp': '2025-01-06T08:00:00', 'direction': 'in'},
+        ], format='json')
+
+        with count_finds() as finds:
+            summary = self.summary(date='2025-01-06')
+        self.assertEqual(finds['employees'], 0)
+        self.assertEqual(finds['employee_attendance_daily'], 0)
+        self.assertEqual(summary['employees'], {'total': 4, 'active': 3, 'inactive': 1})
+        self.assertEqual(summary['by_department'], sorted([
+            {'id': str(self.department.id), 'name': 'Engineering', 'count': 3},
+            {'id': str(other.id), 'name': 'Sales', 'count': 1},
+        ], key=lambda row: row['id']))
+        self.assertEqual(summary['attendance'], {'date': '2025-01-06', 'present': 2, 'halfday': 0, 'absent': 1})
+        self.assertEqual(counter_drift(), {})
+
+    def test_rebuild_repairs_drift(self):
+        self.make_employees(2)  # saved directly, bypassing the counters
+        self.assertEqual(self.summary()['employees']['total'], 0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_dashboard_counters', '--check', stdout=io.StringIO())
+
+        call_command('rebuild_dashboard_counters', stdout=io.StringIO())
+        self.assertEqual(counter_drift(), {})
+        self.assertEqual(self.summary()['employees'], {'total': 2, 'active': 2, 'inactive': 0})
+        call_command('rebuild_dashboard_counters', '--check', stdout=io.StringIO())
+
+    def test_invalid_date(self):
+        self.assertEqual(self.client.get('/api/dashboard/summary', {'date': 'soon'}).status_code, 400)
+
+
+class AsyncCollection:
+    """Awaitable facade over a mongomock collection, in place of pymongo's async driver."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+    def find(self, *args, **kwargs):
+        rows = list(self._collection.find(*args, **kwargs))
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return rows
+        return Cursor()
+
+
+class AsyncAttendanceTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('api.aio.collection', lambda model: AsyncCollection(model._get_collection()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    async def test_matches_sync_views(self):
+        check_in = await self.async_client.post(
+            '/api/async/employee_attendance-check_in/',
+            {'employee_id': 'E1', 'date': '2025-01-06', 'check_in': '09:00'},
+            content_type='application/json',
+            headers=self.auth,
+        )
+        self.assertEqual(check_in.status_code, 201)
+        created = check_in.json()
+        self.assertEqual(created['records'], {'check_in': '09:00', 'check_out': ''})
+
+        check_out = await self.async_client.post(
+            '/api/async/employee_attendance-check_out/',
+            {'attendance_id': created['id'], 'check_out': '18:00'},
+            content_type='application/json',
+            headers=self.auth,
+        )
+        self.assertEqual(check_out.json()['records'], {'check_in': '09:00', 'check_out': '18:00'})
+
+        fetched = await self.async_client.get(
+            '/api/async/get_employee_attendance/', {'emp_id': 'E1', 'date': '2025-01-06'}, headers=self.auth
+        )
+        sync = self.client.get('/api/get_employee_attendance/', {'emp_id': 'E1', 'date': '2025-01-06'})
+        self.assertEqual(fetched.content, sync.content)
+        self.assertEqual((await self.async_client.get(
+            '/api/async/get_employee_attendance/', {'emp_id': 'E1', 'date': '2025-01-07'}, headers=self.auth
+        )).status_code, 404)
+        self.assertEqual(DashboardCounter.objects.get(key='attendance:2025-01-06:Present').value, 1)
+
+    async def test_requires_valid_jwt(self):
+        url = '/api/async/employee_attendance-check_in/'
+        body = {'employee_id': 'E1', 'date': '2025-01-06', 'check_in': '09:00'}
+        missing = await self.async_client.post(url, body, content_type='application/json')
+        self.assertEqual(missing.status_code, 401)
+        self.assertEqual(missing['WWW-Authenticate'], 'Bearer realm="api"')
+        forged = await self.async_client.post(
+            url, body, content_type='application/json', headers={'Authorization': 'Bearer not.a.token'}
+        )
+        self.assertEqual(forged.json()['code'], 'token_not_valid')
+        self.assertEqual((await self.async_client.get(url, headers=self.auth)).status_code, 405)
+        self.assertEqual(EmployeeAttendanceDaily.objects.count(), 0)
+
+    async def test_revocation_refresh_runs_off_the_event_loop(self):
+        threads = []
+        refresh = revocation_list().refresh
+
+        def recording_refresh():
+            threads.append(threading.get_ident())
+            refresh()
+
+        revocation_list().reset()
+        with mock.patch.object(revocation_list(), 'refresh', side_effect=recording_refresh):
+            response = await self.async_client.get(
+                '/api/async/get_employee_attendance/', {'emp_id': 'E1', 'date': '2025-01-06'}, headers=self.auth
+            )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+    async def test_non_object_body(self):
+        for url in ('/api/async/employee_attendance-check_in/', '/api/async/employee_attendance-check_out/'):
+            response = await self.async_client.post(url, [1, 2], content_type='application/json', headers=self.auth)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Expected a JSON object'})
+
+    async def test_write_behind_matches_sync_views(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        buffer = PunchBuffer(directory.name, flush_interval_ms=3600 * 1000).start()
+        self.addCleanup(buffer.stop)
+        body = {'employee_id': 'E1', 'date': '2025-01-06', 'check_in': '09:00:00'}
+        with self.settings(ATTENDANCE_WRITE_BEHIND=True), \
+                mock.patch('api.views.punch_buffer', return_value=buffer), \
+                mock.patch('api.async_views.punch_buffer', return_value=buffer):
+            queued = await self.async_client.post(
+                '/api/async/employee_attendance-check_in/', body, content_type='application/json', headers=self.auth,
+            )
+            sync = await sync_to_async(self.client.post)('/api/employee_attendance-check_in/', body, format='json')
+            self.assertEqual(queued.status_code, 202)
+            self.assertEqual(queued.content, sync.content)
+            with mock.patch('api.punch_log.os.fsync', side_effect=OSError(5, 'Input/output error')):
+                failed = await self.async_client.post(
+                    '/api/async/employee_attendance-check_out/',
+                    {'employee_id': 'E1', 'date': '2025-01-06', 'check_out': '18:00:00'},
+                    content_type='application/json',
+                    headers=self.auth,
+                )
+            self.assertEqual(failed.status_code, 503)
+        self.assertEqual(EmployeeAttendanceDaily.objects.count(), 0)
+
+
+class StatelessAuthTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.first_name = 'Tamil'
+        self.user.save()
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {'username': 'tester', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_login_payload_and_claims_user(self):
+        body = self.login()
+        self.assertEqual(body['user'], {
+            'id': self.user.id,
+            'username': 'tester',
+            'first_name': 'Tamil',
+            'last_name': '',
+            'is_superuser': False,
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {body["access"]}')
+        self.make_employees(2)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get('/api/employees/').json()), 2)
+
+        refreshed = self.client.post('/api/auth/refresh/', {'refresh': body['refresh']}, format='json').json()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refreshed["access"]}')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/employees/').status_code, 200)
+
+        user = StatelessJWTAuthentication().get_user(AccessToken(refreshed['access']))
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.username, user.first_name, user.is_superuser), ('tester', 'Tamil', False))
+        self.assertEqual(user.db_user, self.user)
+
+    def test_tokens_without_claims_use_cached_db_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        with self.assertNumQueries(1):
+            self.client.get('/api/employees/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/employees/').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/employees/').status_code, 401)
+
+
+class TokenRevocationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        body = self.client.post('/api/auth/login/', {'username': 'tester', 'password': 'secret'}, format='json').json()
+        self.access, self.refresh = body['access'], body['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.assertEqual(self.client.get('/api/employees/').status_code, 200)
+        response = self.client.post('/api/auth/logout/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.json(), {'detail': 'Logged out.'})
+        self.assertEqual(RevokedToken.objects.count(), 2)
+
+        response = self.client.get('/api/employees/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': self.refresh}, format='json').status_code, 401)
+
+    def test_revocations_from_other_workers_are_picked_up(self):
+        other_worker = RevocationList()
+        other_worker.revoke(AccessToken(self.access)['jti'], AccessToken(self.access)['exp'])
+        with self.settings(TOKEN_REVOCATION_REFRESH=3600):
+            # Loaded on the first check, then served from memory.
+            self.assertEqual(self.client.get('/api/employees/').status_code, 401)
+            refreshes = revocation_list().refreshes
+            self.client.get('/api/employees/')
+            self.assertEqual(revocation_list().refreshes, refreshes)
+
+        fresh = UserRefreshToken.for_user(self.user)
+        self.assertFalse(revocation_list().is_revoked(fresh['jti']))
+        other_worker.revoke(fresh['jti'], fresh['exp'])
+        with self.settings(TOKEN_REVOCATION_REFRESH=0):
+            self.assertTrue(revocation_list().is_revoked(fresh['jti']))
+
+    def test_expired_entries_are_pruned(self):
+        revocations = revocation_list()
+        revocations.refresh()
+        expired = time.time() - 60
+        with mock.patch('api.revocation.time.time', return_value=expired - 60):
+            revocations.revoke('old', expired)
+        revocations.revoke('current', time.time() + 60)
+        self.assertTrue(revocations.is_revoked('current'))
+        revocations.refresh()
+        self.assertEqual(revocations.stats()['revoked'], 1)
+        self.assertFalse(revocations.is_revoked('old'))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(5000)
+        keys = [f'jti-{i}' for i in range(5000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f'other-{i}' in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.03)
+
+
+class MongoRoutingTests(MongoTestCase):
+    def test_report_endpoints_read_through_report_alias(self):
+        self.make_employees(2)
+        self.client.post('/api/payroll/generate/', {'month': 1, 'year': 2025}, format='json')
+        mongoengine.connect('hrms_test', alias='isolated', host='mongodb://isolated', mongo_client_class=mongomock.MongoClient)
+        self.addCleanup(mongoengine.disconnect, alias='isolated')
+        self.assertEqual(len(self.client.get('/api/payroll/', {'month': 1, 'year': 2025}).json()), 2)
+        with self.settings(MONGO_READ_ALIAS='isolated'):
+            self.assertEqual(self.client.get('/api/payroll/', {'month': 1, 'year': 2025}).json(), [])
+            # Lists served with ETags read their stamps and documents from the primary.
+            self.assertEqual(len(self.client.get('/api/employees/').json()), 2)
+            self.assertEqual(len(self.client.get('/api/departments/').json()), 1)
+            # Writes and single-document reads stay on the default alias.
+            employee = Employee.objects.first()
+            self.assertEqual(self.client.get(f'/api/employees/{employee.id}/').status_code, 200)
+
+    def test_pool_monitor_counts_checkouts(self):
+        monitor = PoolMonitor('default')
+        address = ('db1', 27017)
+        monitor.pool_created(monitoring.PoolCreatedEvent(address, {'maxPoolSize': 5}))
+        monitor.connection_created(monitoring.ConnectionCreatedEvent(address, 1))
+        for duration in (0.002, 0.004):
+            monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+            monitor.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, 1, duration))
+        monitor.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 1))
+        monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+
+        pool = monitor.stats()['db1:27017']
+        self.assertEqual(pool['max_pool_size'], 5)
+        self.assertEqual((pool['open'], pool['checked_out'], pool['waiting'], pool['checkouts']), (1, 1, 1, 2))
+        self.assertEqual((pool['wait_ms_avg'], pool['wait_ms_max']), (3.0, 4.0))
+        self.assertEqual(self.client.get('/api/db/pool').status_code, 200)
+
+
+class RequestMetricsTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        request_metrics.reset()
+
+    def test_middleware_times_commands_and_serialisation(self):
+        from types import SimpleNamespace
+
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        def view(request):
+            command_timer.succeeded(SimpleNamespace(duration_micros=1500))
+            command_timer.failed(SimpleNamespace(duration_micros=500))
+            return HttpResponse(dumps({'ok': True}))
+
+        request = RequestFactory().get('/api/health')
+        request.resolver_match = SimpleNamespace(url_name='health-check')
+        response = RequestMetricsMiddleware(view)(request)
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(timing['mongo'], 'dur=2.000;desc="2 commands"')
+        self.assertGreater(float(timing['serialize'].split('=')[1]), 0)
+        # Outside a request the listener has nowhere to record.
+        command_timer.succeeded(SimpleNamespace(duration_micros=1500))
+
+        exposition = request_metrics.exposition()
+        self.assertIn('hrms_request_mongo_commands_bucket{view="health-check",method="GET",le="2"} 1', exposition)
+        self.assertIn('hrms_request_mongo_seconds_sum{view="health-check",method="GET"} 0.002', exposition)
+        self.assertIn('hrms_http_responses_total{view="health-check",method="GET",status="200"} 1', exposition)
+
+    def test_metrics_endpoint_lists_routes_by_url_name(self):
+        self.make_employees(2)
+        response = self.client.get('/api/employees/')
+        self.assertIn('mongo;dur=', response['Server-Timing'])
+        self.client.get('/api/no-such-route')
+
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE hrms_request_duration_seconds histogram', body)
+        self.assertIn('hrms_request_duration_seconds_count{view="employee-list-create",method="GET"} 1', body)
+        self.assertIn('le="+Inf"', body)
+        self.assertIn('view="unmatched",method="GET",status="404"', body)
+
+    def test_metrics_token(self):
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/api/metrics').status_code, 401)
+        with self.settings(METRICS_TOKEN='scrape-me'):
+            self.assertEqual(anonymous.get('/api/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 200)
+            self.assertEqual(anonymous.get('/api/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            # Users' JWTs still work alongside the token.
+            token = str(UserRefreshToken.for_user(self.user).access_token)
+            self.assertEqual(anonymous.get('/api/metrics', HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 200)
+
+
+class SlowQueryLogTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_dir = Path(directory.name)
+        overrides = self.settings(SLOW_QUERY_MS=50, SLOW_QUERY_LOG_DIR=self.log_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        slow_command_log.reset()
+        self.addCleanup(slow_command_log.reset)
+
+    def command(self, request_id, micros, **command):
+        from types import SimpleNamespace
+
+        name = next(iter(command))
+        started = SimpleNamespace(
+            command_name=name, command=command, database_name='hrms_test', connection_id=('db1', 27017),
+            request_id=request_id,
+        )
+        slow_command_log.started(started)
+        slow_command_log.succeeded(SimpleNamespace(duration_micros=micros, **vars(started)))
+
+    def test_slow_commands_are_logged_redacted_with_view_and_plan(self):
+        from types import SimpleNamespace
+
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        from . import views
+
+        def view(request):
+            for request_id, micros in ((1, 120000), (2, 80000), (3, 3000)):
+                self.command(
+                    request_id, micros, find='employees',
+                    filter={'email': 'secret@example.com', 'department': {'$in': [ObjectId(), ObjectId()]}},
+                    sort={'_id': 1}, lsid={'id': 'session'},
+                )
+            return HttpResponse()
+
+        plan = {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}}
+        request = RequestFactory().get('/api/employees/')
+        request.resolver_match = SimpleNamespace(url_name='employee-list-create', func=views.employee_list_create)
+        with mock.patch('api.slow_queries.explain_command', return_value=plan) as explain:
+            RequestMetricsMiddleware(view)(request)
+            # Outside a request, and too fast: not logged.
+            self.command(4, 2000, count='employees', query={})
+            self.command(5, 60000, count='employees', query={'emp_status': True})
+            slow_command_log.drain()
+
+        # One explain per shape.
+        self.assertEqual(explain.call_count, 2)
+        entries = list(read_entries(self.log_dir))
+        self.assertEqual([entry['ms'] for entry in entries], [120.0, 80.0, 60.0])
+        first = entries[0]
+        self.assertEqual(first['shape'], {
+            'filter': {'email': '?string', 'department': {'$in': '?array<?objectId>'}},
+            'sort': {'_id': 1},
+        })
+        self.assertEqual((first['view'], first['function']), (
+            'employee-list-create', 'api.views.employee_list_create',
+        ))
+        self.assertEqual(first['explain'], {'stages': ['COLLSCAN'], 'indexes': [], 'collscan': True})
+        self.assertIsNone(entries[1]['explain'])
+        self.assertEqual(entries[0]['shape_id'], entries[1]['shape_id'])
+        self.assertIsNone(entries[2]['view'])
+        self.assertNotIn(b'secret@example.com', b''.join(path.read_bytes() for path in self.log_dir.iterdir()))
+
+        out = io.StringIO()
+        call_command('slow_queries', dir=str(self.log_dir), stdout=out)
+        report = out.getvalue()
+        self.assertIn('3 slow commands in 2 shapes', report)
+        self.assertIn('1. employees.find  2 x, total 200 ms', report)
+        self.assertIn('views: employee-list-create (2)', report)
+        self.assertIn('COLLECTION SCAN', report)
+
+    def test_log_rotates(self):
+        log = RotatingLog(self.log_dir / 'slow-queries.1.jsonl', max_bytes=100, backups=2)
+        # 80-byte lines: every second one fills a file.
+        for number in range(9):
+            log.write(json.dumps({'n': number, 'pad': 'x' * 60}).encode() + b'\n')
+        log.close()
+        names = sorted(path.name for path in self.log_dir.iterdir())
+        self.assertEqual(names, ['slow-queries.1.jsonl', 'slow-queries.1.jsonl.1', 'slow-queries.1.jsonl.2'])
+        self.assertEqual([entry['n'] for entry in read_entries(self.log_dir)], [8, 6, 7, 4, 5])
+
+
+class EmployeeSearchTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.org = self.make_org()
+        for i, (name, emp_id) in enumerate([('Priya Raman', 'E100'), ('Priyanka Sen', 'E1001'), ('Raman Kumar', 'E200')]):
+            self.client.post('/api/employees/', self.payload(i, name, emp_id), format='json')
+
+    def payload(self, i, name, emp_id):
+        designation, department, location, branch = self.org
+        return {
+            'name': name,
+            'emp_id': emp_id,
+            'email': f'{name.split()[0].lower()}.{i}@example.com',
+            'designation': str(designation.id),
+            'department': str(department.id),
+            'location': str(location.id),
+            'branch': str(branch.id),
+            'status': True,
+        }
+
+    def search(self, q, **params):
+        return [row['emp_id'] for row in self.client.get('/api/employees/search', {'q': q, **params}).json()]
+
+    def test_prefix_and_token_matching(self):
+        self.assertEqual(self.search('priya'), ['E100', 'E1001'])
+        self.assertEqual(self.search('RAM'), ['E100', 'E200'])
+        self.assertEqual(self.search('pri ram'), ['E100'])
+        self.assertEqual(self.search('e100'), ['E100', 'E1001'])
+        self.assertEqual(self.search('E1001'), ['E1001'])
+        self.assertEqual(self.search('priyanka.1@ex'), ['E1001'])
+        self.assertEqual(self.search('priya', limit=1), ['E100'])
+        self.assertEqual(self.search('zzz'), [])
+        self.assertEqual(self.client.get('/api/employees/search').status_code, 400)
+        self.assertEqual(self.client.get('/api/employees/search', {'q': 'a', 'limit': 500}).status_code, 400)
+
+    def test_writes_update_the_index_without_reloading(self):
+        self.assertEqual(self.search('raman'), ['E100', 'E200'])
+        employee = Employee.objects.get(emp_id='E200')
+        self.client.put(f'/api/employees/update/{employee.id}', self.payload(2, 'Kumar Vel', 'E200'), format='json')
+        self.assertEqual(self.search('raman'), ['E100'])
+        self.assertEqual(self.search('vel'), ['E200'])
+
+        self.client.delete(f'/api/employees/delete/{Employee.objects.get(emp_id="E100").id}')
+        self.assertEqual(self.search('raman'), [])
+
+        body = json.dumps(dict(self.payload(5, 'Ramesh Babu', 'E500'), status='true')) + '\n'
+        self.client.post('/api/employees/bulk/', body.encode(), content_type='application/x-ndjson')
+        self.assertEqual(self.search('ram'), ['E500'])
+        self.assertEqual(employee_search_index().stats()['rebuilds'], 1)
+
+    def test_other_workers_writes_are_picked_up_from_the_version_stamp(self):
+        index = employee_search_index()
+        self.assertEqual(self.search('raman'), ['E100', 'E200'])
+        with count_finds() as finds:
+            index._start_refresh()
+            index._refresh()
+        self.assertEqual(finds['employees'], 0)
+
+        # Another worker renames one employee, deletes one and bumps the stamp.
+        collection = Employee._get_collection()
+        collection.update_one({'emp_id': 'E200'}, {'$set': {'name': 'Kumar Vel'}})
+        collection.delete_one({'emp_id': 'E100'})
+        bump_version(Employee)
+        self.assertEqual(self.search('raman'), ['E100', 'E200'])
+        index._start_refresh()
+        index._refresh()
+        # E200 still has raman in its email address.
+        self.assertEqual(self.search('raman'), ['E200'])
+        self.assertEqual(self.search('vel'), ['E200'])
+        self.assertEqual(self.search('priya'), ['E1001'])
+        self.assertEqual(index.stats()['refreshes'], 1)
+
+    def test_repacking_empties_the_delta(self):
+        index = employee_search_index()
+        self.search('priya')
+        employee = Employee.objects.get(emp_id='E200')
+        self.client.put(f'/api/employees/update/{employee.id}', self.payload(2, 'Kumar Vel', 'E200'), format='json')
+        self.assertGreater(index.stats()['delta_tokens'], 0)
+        index._start_refresh()
+        index._repack()
+        stats = index.stats()
+        self.assertEqual((stats['delta_tokens'], stats['rebuilds']), (0, 2))
+        self.assertEqual(self.search('vel'), ['E200'])
+        self.assertEqual(self.search('raman'), ['E100'])
+        self.assertEqual(self.search('E200'), ['E200'])
+
+
+class ConditionalGetTests(MongoTestCase):
+    def test_list_and_detail_etags(self):
+        employees = self.make_employees(3)
+        first = self.client.get('/api/employees/')
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with count_finds() as finds:
+            unchanged = self.client.get('/api/employees/', HTTP_IF_NONE_MATCH=etag)
+            weak = self.client.get('/api/employees/', HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual((unchanged.status_code, weak.status_code), (304, 304))
+        self.assertEqual(unchanged.content, b'')
+        self.assertEqual(finds['employees'], 0)
+        self.assertNotEqual(self.client.get('/api/employees/', {'limit': 2})['ETag'], etag)
+
+        detail_url = f'/api/employees/{employees[0].id}/'
+        detail_etag = self.client.get(detail_url)['ETag']
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 304)
+
+        self.client.delete(f'/api/employees/delete/{employees[1].id}')
+        changed = self.client.get('/api/employees/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()), 2)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+
+    def test_embedded_names_invalidate_dependent_lists(self):
+        designation, department, location, branch = self.make_org()
+        designations = self.client.get('/api/designations/')['ETag']
+        branches = self.client.get('/api/branches/')['ETag']
+        self.client.put(f'/api/departments/update/{department.id}/', {'name': 'Platform'}, format='json')
+        self.assertEqual(self.client.get('/api/designations/', HTTP_IF_NONE_MATCH=designations).status_code, 200)
+        self.assertEqual(self.client.get('/api/branches/', HTTP_IF_NONE_MATCH=branches).status_code, 304)
+
+    def test_gzip_streams_have_their_own_etag(self):
+        self.make_employees(3)
+        plain = self.client.get('/api/employees/', {'stream': 'json'})
+        gzipped = self.client.get('/api/employees/', {'stream': 'json'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzipped['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        revalidated = self.client.get(
+            '/api/employees/', {'stream': 'json'}, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzipped['ETag'],
+        )
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], gzipped['ETag'])
+        self.assertIn('Accept-Encoding', revalidated['Vary'])
+        self.assertEqual(
+            self.client.get('/api/employees/', {'stream': 'json'}, HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 304,
+        )
+
+
+class EndpointBenchmarkTests(MongoTestCase):
+    def test_every_route_has_a_working_scenario(self):
+        from types import SimpleNamespace
+
+        from .management.commands import benchmark_endpoints as bench
+
+        patcher = mock.patch('api.aio.collection', lambda model: AsyncCollection(model._get_collection()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        org = bench.seed(40)
+        user = User.objects.create_user('bench', password=bench.PASSWORD)
+        token = str(UserRefreshToken.for_user(user).access_token)
+        defined = bench.scenarios(org, user)
+        self.assertEqual(bench.missing_routes(defined), [])
+        for scenario in defined:
+            result = bench.run(APIClient(), scenario, SimpleNamespace(count=0), 2, 0, token)
+            self.assertEqual(result['errors'], 0, (scenario.label, result['statuses']))
+
+
+class SeedHrmsTests(MongoTestCase):
+    def snapshot(self):
+        return {
+            model.__name__: list(model._get_collection().find().sort('_id', 1))
+            for model in (Location, Branch, Department, Designation, Employee, EmployeeAttendanceDaily)
+        }
+
+    def test_output_depends_only_on_seed_and_sizes(self):
+        from .management.commands.seed_hrms import Org, seed_org
+
+        self.assertEqual(seed_org(Org(60, seed=7), chunk=7, batch_size=13)[0], 60)
+        first = self.snapshot()
+        for model in MODELS:
+            model.drop_collection()
+        seed_org(Org(60, seed=7), chunk=100, batch_size=1000)
+        self.assertEqual(self.snapshot(), first)
+
+        for model in MODELS:
+            model.drop_collection()
+        seed_org(Org(60, seed=8))
+        self.assertNotEqual(self.snapshot()['Employee'], first['Employee'])
+
+    def test_references_and_punches_are_valid(self):
+        from .management.commands.seed_hrms import Org, seed_org
+
+        org = Org(80, months=2, start=datetime.date(2025, 3, 1))
+        employees, days = seed_org(org)
+        designations = {row['_id']: row for row in Designation._get_collection().find()}
+        branches = {row['_id']: row for row in Branch._get_collection().find()}
+        active = set()
+        for row in Employee._get_collection().find():
+            self.assertEqual(designations[row['designation']]['department_name'], row['department'])
+            self.assertEqual(branches[row['branch']]['location_name'], row['location'])
+            self.assertIsNotNone(Department.objects(id=row['department']).first())
+            if row['emp_status']:
+                active.add(row['emp_id'])
+
+        attendance = list(EmployeeAttendanceDaily._get_collection().find())
+        self.assertEqual(len(attendance), days)
+        self.assertLessEqual({row['emp_id'] for row in attendance}, active)
+        for row in attendance:
+            self.assertLess(row['date'].weekday(), 5)
+            self.assertIn(row['date'].month, (3, 4))
+            self.assertLess(row['records']['check_in'], row['records']['check_out'])
+        statuses = Counter(row['status'] for row in attendance)
+        self.assertGreater(statuses['Present'], 10 * statuses['Halfday'])
+
+    def test_command_refuses_to_mix_with_existing_data(self):
+        out = io.StringIO()
+        call_command('seed_hrms', '--employees', '30', '--processes', '1', stdout=out)
+        self.assertEqual(Employee.objects.count(), 30)
+        self.assertEqual(counter_drift(), {})
+        with self.assertRaises(CommandError):
+            call_command('seed_hrms', '--employees', '30', '--processes', '1', stdout=io.StringIO())
+        call_command('seed_hrms', '--employees', '20', '--processes', '1', '--drop', stdout=io.StringIO())
+        self.assertEqual(Employee.objects.count(), 20)
+
+
+class ExportEmployeesTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        employees = self.make_employees(3)
+        other = Department(name='Finance', description='Money').save()
+        Employee.objects(emp_id='E00002').update(set__department=other.id, set__emp_status=False)
+        for employee in employees:
+            for day in (6, 7, 20):
+                EmployeeAttendanceDaily(
+                    emp_id=employee.emp_id, date=datetime.date(2025, 1, day), status='Present',
+                    records={'check_in': '09:00:00', 'check_out': '18:00:00'},
+                ).save()
+
+    def export(self, *args):
+        call_command('export_employees', *args, '--batch-size', '2', stderr=io.StringIO())
+
+    def test_csv_with_resolved_names_and_filters(self):
+        import csv
+
+        output = self.dir / 'employees.csv'
+        self.export('--output', str(output))
+        rows = list(csv.DictReader(output.open(newline='')))
+        self.assertEqual(sorted(row['emp_id'] for row in rows), ['E00000', 'E00001', 'E00002'])
+        first = next(row for row in rows if row['emp_id'] == 'E00000')
+        self.assertEqual(
+            (first['designation'], first['department'], first['location'], first['branch'], first['emp_status']),
+            ('Engineer', 'Engineering', 'Chennai', 'T Nagar', 'True'),
+        )
+
+        self.export('--output', str(output), '--department', 'Engineering', '--status', 'active')
+        self.assertEqual(sorted(row['emp_id'] for row in csv.DictReader(output.open(newline=''))), ['E00000', 'E00001'])
+        self.export('--output', str(output), '--status', 'inactive', '--branch', 'T Nagar')
+        self.assertEqual([row['department'] for row in csv.DictReader(output.open(newline=''))], ['Finance'])
+        with self.assertRaises(CommandError):
+            self.export('--output', str(output), '--department', 'Nowhere')
+
+    def test_jsonl_with_attendance_of_exported_employees(self):
+        employees, attendance = self.dir / 'employees.jsonl', self.dir / 'attendance.jsonl'
+        self.export(
+            '--output', str(employees), '--attendance', str(attendance), '--status', 'active',
+            '--from', '2025-01-01', '--to', '2025-01-10',
+        )
+        self.assertEqual(len(employees.read_text().splitlines()), 2)
+        Employee._get_collection().update_one({'emp_id': 'E00000'}, {'$set': {'basic_salary': None}})
+        self.export('--output', str(employees))
+        salaries = {row['emp_id']: row['basic_salary'] for row in map(json.loads, employees.read_text().splitlines())}
+        self.assertEqual(salaries['E00000'], 0.0)
+        days = [json.loads(line) for line in attendance.read_text().splitlines()]
+        self.assertEqual(sorted((day['emp_id'], day['date']) for day in days), [
+            ('E00000', '2025-01-06'), ('E00000', '2025-01-07'), ('E00001', '2025-01-06'), ('E00001', '2025-01-07'),
+        ])
+        self.assertEqual(days[0]['check_in'], '09:00:00')
+
+    def test_parquet(self):
+        import importlib.util
+
+        output = self.dir / 'employees.parquet'
+        if importlib.util.find_spec('pyarrow') is None:
+            with self.assertRaisesMessage(CommandError, 'pyarrow'):
+                self.export('--output', str(output))
+            # Checked before anything is written, whichever file is Parquet.
+            with self.assertRaisesMessage(CommandError, 'pyarrow'):
+                self.export('--output', str(self.dir / 'employees.csv'), '--attendance', str(output))
+            self.assertFalse((self.dir / 'employees.csv').exists())
+            return
+        import pyarrow.parquet as pq
 
-# Create your tests here.
+        self.export('--output', str(output))
+        table = pq.read_table(output)
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(sorted(table.column('department').to_pylist()), ['Engineering', 'Engineering', 'Finance'])
@@ -1,17 +1,23 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from . import async_views
 from .auth_views import LoginView, LogoutView
-from .views import employee_list_create, health_check, get_employee_by_id, update_employee_by_id, delete_employee_by_id,department_list_create,get_department_by_id,update_department_by_id,delete_department_by_id,designation_list_create,get_designation_by_id,update_designation_by_id,delete_designation_by_id,location_list_create,get_location_by_id,update_location_by_id,delete_location_by_id,branch_list_create,get_branch_by_id,update_branch_by_id,delete_branch_by_id,get_employee_attendance,check_in_attendance,check_out_attendance
+from .views import employee_search, employee_list_create, bulk_import_employees, health_check, reference_cache_stats, mongo_pool_stats, metrics, get_employee_by_id, update_employee_by_id, delete_employee_by_id,department_list_create,get_department_by_id,update_department_by_id,delete_department_by_id,designation_list_create,get_designation_by_id,update_designation_by_id,delete_designation_by_id,location_list_create,get_location_by_id,update_location_by_id,delete_location_by_id,branch_list_create,get_branch_by_id,update_branch_by_id,delete_branch_by_id,get_employee_attendance,check_in_attendance,check_out_attendance,bulk_punch_attendance,attendance_range,payroll_list,payroll_generate,payroll_payslip,dashboard_summary
 
 urlpatterns = [
     path('health', health_check, name='health-check'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('cache/stats', reference_cache_stats, name='reference-cache-stats'),
+    path('db/pool', mongo_pool_stats, name='mongo-pool-stats'),
+    path('metrics', metrics, name='metrics'),
 
     #---------------------Employee Function START-----------------------#
     path('employees/', employee_list_create, name='employee-list-create'),
+    path('employees/bulk/', bulk_import_employees, name='employee-bulk-import'),
+    path('employees/search', employee_search, name='employee-search'),
     path('employees/<str:id>/', get_employee_by_id, name='get-employee-by-id'),
     path('employees/update/<str:id>', update_employee_by_id, name='update-employee-by-id'),
     path('employees/delete/<str:id>', delete_employee_by_id, name='delete-employee-by-id'),
@@ -48,8 +54,22 @@ urlpatterns = [
     #---------------------Employee Attendance Function START-----------------------#
     path('get_employee_attendance/',get_employee_attendance, name='get_employee_attendance'),
     path('employee_attendance-check_in/', check_in_attendance, name='employee_attendance-check_in'),
-    path('employee_attendance-check_out/', check_out_attendance, name='employee_attendance-check_out')
+    path('employee_attendance-check_out/', check_out_attendance, name='employee_attendance-check_out'),
+    path('employee_attendance-punches/', bulk_punch_attendance, name='employee_attendance-punches'),
+    path('attendance/', attendance_range, name='attendance-range'),
+    # Async variants of the punch hot path, for ASGI deployments (api/async_views.py)
+    path('async/get_employee_attendance/', async_views.get_employee_attendance, name='async-get_employee_attendance'),
+    path('async/employee_attendance-check_in/', async_views.check_in_attendance, name='async-employee_attendance-check_in'),
+    path('async/employee_attendance-check_out/', async_views.check_out_attendance, name='async-employee_attendance-check_out'),
    
     #---------------------Employee Attendance Function END-----------------------#
+
+    #---------------------Payroll Function START-----------------------#
+    path('payroll/', payroll_list, name='payroll-list'),
+    path('payroll/generate/', payroll_generate, name='payroll-generate'),
+    path('payroll/<str:emp_id>/payslip/', payroll_payslip, name='payroll-payslip'),
+    #---------------------Payroll Function END-----------------------#
+
+    path('dashboard/summary', dashboard_summary, name='dashboard-summary'),
 ]
 
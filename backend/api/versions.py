@@ -0,0 +1,103 @@
+"""
+Per-collection version stamps and conditional GETs.
+
+Every create/update/delete view bumps the stamp of the collection it wrote
+with ``bump_version``. List and detail GETs decorated with ``@conditional``
+derive a strong ETag from the stamps of the collections their body is built
+from (designations and branches embed department and location names), the
+query string and the document id. A request whose ``If-None-Match`` matches
+gets a 304 after reading only the stamps, never the documents.
+
+A stamp is ``<epoch>.<version>``: the epoch is chosen when the stamp
+document is first created, so ETags handed out before the stamps collection
+was dropped or reset can never match again. Stamps are read before the
+documents, and both from the primary, so a body is never labelled with a
+stamp newer than its data (at worst with an older one, which only costs the
+client one extra 200). Conditional list views therefore do not use the
+report alias: its ``secondaryPreferred`` reads may send the stamp and the
+documents to different secondaries, and a body from a lagging one would be
+served as 304s under a newer stamp until the next write. Writes that bypass
+the views (e.g. a mongo shell) are not seen until the next view write.
+
+Streamed (``?stream=``) responses may be gzipped. A gzipped body gets its
+own ETag, the plain one with a ``-gzip`` suffix, as the bytes differ;
+``Vary: Accept-Encoding`` is set on those responses by
+``api/renderers.py``. Either form matches ``If-None-Match``.
+"""
+import hashlib
+from functools import wraps
+
+from bson import ObjectId
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from mongoengine.connection import DEFAULT_CONNECTION_NAME, get_db
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CollectionVersion
+
+
+def _name(model):
+    return model if isinstance(model, str) else model._get_collection_name()
+
+
+def bump_version(model):
+    """Mark a collection (model or collection name) as changed."""
+    CollectionVersion._get_collection().update_one(
+        {'_id': _name(model)},
+        {'$inc': {'version': 1}, '$setOnInsert': {'epoch': ObjectId()}},
+        upsert=True,
+    )
+
+
+def current_versions(names, alias=DEFAULT_CONNECTION_NAME):
+    """``{name: stamp}`` for collection names, with one query."""
+    collection = get_db(alias)[CollectionVersion._get_collection_name()]
+    rows = {row['_id']: row for row in collection.find({'_id': {'$in': list(names)}})}
+    return {
+        name: f'{rows[name].get("epoch")}.{rows[name].get("version", 0)}' if name in rows else '0'
+        for name in names
+    }
+
+
+GZIP_SUFFIX = '-gzip'
+
+
+def make_etag(stamps, *parts):
+    digest = hashlib.sha1(repr((sorted(stamps.items()), parts)).encode()).hexdigest()[:20]
+    return quote_etag(digest)
+
+
+def gzip_etag(etag):
+    """The ETag of the gzipped form of the body tagged ``etag``."""
+    return etag[:-1] + GZIP_SUFFIX + '"'
+
+
+def conditional(*models):
+    """
+    Add ETag / If-None-Match handling to the GET branch of a view whose
+    response body is derived from ``models``. The view must read those
+    models from the primary (not through ``reads()``).
+    """
+    names = [_name(model) for model in models]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            etag = make_etag(current_versions(names), request.get_full_path())
+            # If-None-Match uses weak comparison (proxies may add W/ when re-encoding).
+            tags = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+            for tag in (etag, gzip_etag(etag)):
+                if tag in tags:
+                    response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': tag})
+                    if tag != etag:
+                        patch_vary_headers(response, ('Accept-Encoding',))
+                    return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = gzip_etag(etag) if response.get('Content-Encoding') == 'gzip' else etag
+            return response
+        return wrapper
+    return decorator
@@ -1,8 +1,45 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import Employee,Department,Designation,Location,Branch,EmployeeAttendanceDaily
+from .attendance import apply_punch, apply_punches, attendance_by_day, day_key, month_range
+from .authentication import MetricsTokenAuthentication, StatelessJWTAuthentication
+from .bulk import EmployeeImport, UnsupportedFormat, read_rows
+from .cache import cache_stats, invalid_reference, reference_cache
+from .counters import (
+    ATTENDANCE_STATUSES,
+    HEADCOUNT_FIELDS,
+    attendance_key,
+    employee_values,
+    read_counters,
+    record_employee_change,
+)
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, request_metrics
+from .mongo import pool_stats, reads
+from .pagination import list_response
+from .punch_log import PunchLogUnavailable, punch_buffer, write_behind_enabled
+from .search import DEFAULT_LIMIT as SEARCH_DEFAULT_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT, employee_search_index, row_of
+from .payroll import generate_company_payroll, generate_payroll
+from .payslips import payslip_cache
+from .serializers import (
+    branch_rows,
+    department_rows,
+    designation_rows,
+    employee_rows,
+    location_rows,
+    payroll_rows,
+    serialize_branches,
+    serialize_departments,
+    serialize_designations,
+    serialize_employees,
+    serialize_locations,
+    serialize_payrolls,
+)
+from .versions import bump_version, conditional
 from bson import ObjectId 
 from datetime import datetime
 from dateutil import parser
@@ -16,15 +53,71 @@ def health_check(request):
     return Response({'status': 'Backend is running'})
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reference_cache_stats(request):
+    """
+    GET: Hit/miss counters of the in-process reference-data cache and of
+    the payslip cache, and the size of the employee search index
+    """
+    return Response(
+        {**cache_stats(), 'payslips': payslip_cache().stats(), 'employee_search': employee_search_index().stats()},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def mongo_pool_stats(request):
+    """
+    GET: Connection pool utilisation per connection alias and server, from
+    the pymongo pool event listeners
+    """
+    return Response(pool_stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([MetricsTokenAuthentication, StatelessJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def metrics(request):
+    """
+    GET: Request latency, Mongo commands and time, and serialisation time
+    per URL name, as Prometheus histograms (api/metrics.py)
+    """
+    return HttpResponse(request_metrics.exposition(), content_type=METRICS_CONTENT_TYPE)
+
+
 #--------------------Employee Function START-----------------------#
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def employee_search(request):
+    """
+    GET: Typeahead search, ?q= matched as word prefixes of name, emp_id and
+    email (all words must match), ?limit= up to 50 results
+    """
+    q = request.query_params.get('q', '').strip()
+    if not q:
+        return Response({'detail': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'detail': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return Response(
+            {'detail': f'limit must be between 1 and {SEARCH_MAX_LIMIT}.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(employee_search_index().search(q, limit), status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@conditional(Employee)
 def employee_list_create(request):
     if request.method == 'GET':
-        employees = Employee.objects.all()
-        return Response([emp.to_dict() for emp in employees])
+        return list_response(request, employee_rows(), serialize_employees)
 
     elif request.method == 'POST':
         name = request.data.get('name')
@@ -35,6 +128,7 @@ def employee_list_create(request):
         location_id = request.data.get('location')
         branch_id = request.data.get('branch')
         emp_status = request.data.get('status')
+        basic_salary = request.data.get('basic_salary') or 0
         
         if not name or not email:
             return Response(
@@ -48,11 +142,18 @@ def employee_list_create(request):
                 {'detail': 'Employee with this email already exists.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if Employee.object(emp_id=emp_id).first():
+        if Employee.objects(emp_id=emp_id).first():
             return Response(
                 {'details':'Employee with this Emp ID already exists.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        try:
+            basic_salary = float(basic_salary)
+        except (TypeError, ValueError):
+            return Response(
+                {'detail': 'basic_salary must be a number.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         try:
             # Convert string IDs to ObjectId and validate they exist
@@ -70,25 +171,16 @@ def employee_list_create(request):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Check if referenced documents exist
-            if not Designation.objects(id=designation_id).first():
-                return Response(
-                    {'detail': 'Invalid designation ID.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if not Department.objects(id=department_id).first():
-                return Response(
-                    {'detail': 'Invalid department ID.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if not Location.objects(id=location_id).first():
+            # Check if referenced documents exist (served from the reference cache)
+            invalid = invalid_reference({
+                'designation': (Designation, designation_id),
+                'department': (Department, department_id),
+                'location': (Location, location_id),
+                'branch': (Branch, branch_id),
+            })
+            if invalid:
                 return Response(
-                    {'detail': 'Invalid location ID.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if not Branch.objects(id=branch_id).first():
-                return Response(
-                    {'detail': 'Invalid branch ID.'},
+                    {'detail': f'Invalid {invalid} ID.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
@@ -100,9 +192,13 @@ def employee_list_create(request):
                 department=department_id,
                 location=location_id,
                 branch=branch_id,
-                emp_status=emp_status
+                emp_status=emp_status,
+                basic_salary=basic_salary,
             )
             employee.save()
+            record_employee_change(after=employee_values(employee))
+            bump_version(Employee)
+            employee_search_index().upsert(row_of(employee))
             return Response(employee.to_dict(), status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -111,8 +207,29 @@ def employee_list_create(request):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
             
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_import_employees(request):
+    """
+    POST: Import employees from a streamed CSV (text/csv) or NDJSON
+    (application/x-ndjson) upload. Columns/keys match employee_list_create.
+    Returns counts and a per-row error report.
+    """
+    rows = read_rows(request.stream, request.content_type)
+    try:
+        report = EmployeeImport().run(rows)
+    except UnsupportedFormat:
+        return Response(
+            {'detail': 'Upload must be text/csv or application/x-ndjson.'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+    except UnicodeDecodeError:
+        return Response({'detail': 'Upload must be UTF-8 encoded.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(Employee)
 def get_employee_by_id(request, id):
     """
     GET: Get an employee by ID
@@ -132,6 +249,7 @@ def update_employee_by_id(request, id):
         employee = Employee.objects.get(id=id)
     except (Employee.DoesNotExist, Exception):
         return Response({'detail': 'Employee not found.'}, status=status.HTTP_404_NOT_FOUND)
+    before = employee_values(employee)
     
     name = request.data.get('name')
     emp_id = request.data.get('emp_id')
@@ -141,6 +259,7 @@ def update_employee_by_id(request, id):
     location_id = request.data.get('location')
     branch_id = request.data.get('branch')
     emp_status = request.data.get('status')
+    basic_salary = request.data.get('basic_salary')
 
     if not name or not email or not emp_id:
         return Response(
@@ -163,37 +282,26 @@ def update_employee_by_id(request, id):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        # Validate that all reference IDs exist
-        try:
-            Department.objects.get(id=department_id)
-        except (Department.DoesNotExist, Exception):
-            return Response(
-                {'detail': 'Invalid department ID.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
+    if basic_salary is not None:
         try:
-            Designation.objects.get(id=designation_id)
-        except (Designation.DoesNotExist, Exception):
+            basic_salary = float(basic_salary)
+        except (TypeError, ValueError):
             return Response(
-                {'detail': 'Invalid designation ID.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            Location.objects.get(id=location_id)
-        except (Location.DoesNotExist, Exception):
-            return Response(
-                {'detail': 'Invalid location ID.'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'detail': 'basic_salary must be a number.'},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            Branch.objects.get(id=branch_id)
-        except (Branch.DoesNotExist, Exception):
+    try:
+        # Validate that all reference IDs exist (served from the reference cache)
+        invalid = invalid_reference({
+            'department': (Department, department_id),
+            'designation': (Designation, designation_id),
+            'location': (Location, location_id),
+            'branch': (Branch, branch_id),
+        })
+        if invalid:
             return Response(
-                {'detail': 'Invalid branch ID.'},
+                {'detail': f'Invalid {invalid} ID.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
@@ -206,8 +314,13 @@ def update_employee_by_id(request, id):
         employee.location = location_id
         employee.branch = branch_id
         employee.emp_status = emp_status
+        if basic_salary is not None:
+            employee.basic_salary = basic_salary
         
         employee.save()
+        record_employee_change(before=before, after=employee_values(employee))
+        bump_version(Employee)
+        employee_search_index().upsert(row_of(employee))
         return Response(employee.to_dict(), status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -225,6 +338,9 @@ def delete_employee_by_id(request, id):
     if not employee:
         return Response({'detail': 'Employee not found.'}, status=status.HTTP_404_NOT_FOUND)
     employee.delete()
+    record_employee_change(before=employee_values(employee))
+    bump_version(Employee)
+    employee_search_index().remove(employee.id)
     return Response(status=status.HTTP_204_NO_CONTENT)    
 
 
@@ -235,14 +351,14 @@ def delete_employee_by_id(request, id):
 
 @api_view(['GET','POST'])
 @permission_classes([IsAuthenticated])
+@conditional(Department)
 def department_list_create(request):
     """
-    GET: List all departments
+    GET: List departments (supports ?limit=&after= and ?stream=)
     POST: Create a new department
     """
     if request.method == 'GET':
-        departments = Department.objects.all()
-        return Response([dept.to_dict() for dept in departments], status=status.HTTP_200_OK)
+        return list_response(request, department_rows(), serialize_departments)
     elif request.method == 'POST':
         name = request.data.get('name')
         description = request.data.get('description', '')
@@ -256,6 +372,8 @@ def department_list_create(request):
                 location=location,
             )
             department.save()
+            reference_cache(Department).invalidate()
+            bump_version(Department)
             return Response(department.to_dict(), status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response(
@@ -265,6 +383,7 @@ def department_list_create(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(Department)
 def get_department_by_id(request, id):
     """
     GET: Get a department by ID
@@ -292,6 +411,8 @@ def update_department_by_id(request, id):
     department.manager = manager
     department.location = location
     department.save()
+    reference_cache(Department).invalidate()
+    bump_version(Department)
     return Response(department.to_dict(), status=status.HTTP_200_OK)
 
 @api_view(['DELETE'])
@@ -304,6 +425,8 @@ def delete_department_by_id(request, id):
     if not department:
         return Response({'detail': 'Department not found.'}, status=status.HTTP_404_NOT_FOUND)
     department.delete()
+    reference_cache(Department).invalidate()
+    bump_version(Department)
     return Response(status=status.HTTP_204_NO_CONTENT)    
 
 
@@ -315,14 +438,14 @@ def delete_department_by_id(request, id):
 
 @api_view(['GET','POST'])
 @permission_classes([IsAuthenticated])
+@conditional(Designation, Department)
 def designation_list_create(request):
     """
-    GET: List all designations
+    GET: List designations (supports ?limit=&after= and ?stream=)
     POST: Create a new designation
     """
     if request.method == 'GET':
-        designations = Designation.objects.all()
-        return Response([designation.to_dict() for designation in designations], status=status.HTTP_200_OK)
+        return list_response(request, designation_rows(), serialize_designations)
     elif request.method == 'POST':
         designation_name = request.data.get('designation_name')
         department_id = request.data.get('department_name')
@@ -335,6 +458,8 @@ def designation_list_create(request):
                 department_name=department
             )
             designation.save()
+            reference_cache(Designation).invalidate()
+            bump_version(Designation)
             return Response(designation.to_dict(), status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response(
@@ -344,6 +469,7 @@ def designation_list_create(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(Designation, Department)
 def get_designation_by_id(request, id):
     """
     GET: Get a designation by ID
@@ -380,6 +506,8 @@ def update_designation_by_id(request, id):
         designation.designation_name = designation_name
         designation.department_name = department  # Assign the Department document directly
         designation.save()
+        reference_cache(Designation).invalidate()
+        bump_version(Designation)
         
         return Response(designation.to_dict(), status=status.HTTP_200_OK)
     
@@ -399,6 +527,8 @@ def delete_designation_by_id(request, id):
     if not designation:
         return Response({'detail': 'Designation not found.'}, status=status.HTTP_404_NOT_FOUND)
     designation.delete()
+    reference_cache(Designation).invalidate()
+    bump_version(Designation)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 #--------------------Designation Function END-----------------------#
@@ -407,14 +537,14 @@ def delete_designation_by_id(request, id):
 
 @api_view(['GET','POST'])
 @permission_classes([IsAuthenticated])
+@conditional(Location)
 def location_list_create(request):
     """
-    GET: List all locations
+    GET: List locations (supports ?limit=&after= and ?stream=)
     POST: Create a new location
     """
     if request.method == 'GET':
-        locations = Location.objects.all()
-        return Response([location.to_dict() for location in locations], status=status.HTTP_200_OK)
+        return list_response(request, location_rows(), serialize_locations)
     elif request.method == 'POST':
         location_name = request.data.get('location_name')
         try:
@@ -422,6 +552,8 @@ def location_list_create(request):
                 location_name=location_name
             )
             location.save()
+            reference_cache(Location).invalidate()
+            bump_version(Location)
             return Response(location.to_dict(), status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response(
@@ -431,6 +563,7 @@ def location_list_create(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(Location)
 def get_location_by_id(request, id):
     """
     GET: Get a location by ID
@@ -452,6 +585,8 @@ def update_location_by_id(request, id):
     location_name = request.data.get('location_name')
     location.location_name = location_name
     location.save()
+    reference_cache(Location).invalidate()
+    bump_version(Location)
     return Response(location.to_dict(), status=status.HTTP_200_OK)
 
 @api_view(['DELETE'])
@@ -464,6 +599,8 @@ def delete_location_by_id(request, id):
     if not location:
         return Response({'detail': 'Location not found.'}, status=status.HTTP_404_NOT_FOUND)
     location.delete()
+    reference_cache(Location).invalidate()
+    bump_version(Location)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 #--------------------Location Function END-----------------------#
@@ -473,10 +610,10 @@ def delete_location_by_id(request, id):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@conditional(Branch, Location)
 def branch_list_create(request):
     if request.method == 'GET':
-        branches = Branch.objects.all()
-        return Response([branch.to_dict() for branch in branches], status=status.HTTP_200_OK)
+        return list_response(request, branch_rows(), serialize_branches)
     
     elif request.method == 'POST':
         print(request.data)
@@ -495,6 +632,8 @@ def branch_list_create(request):
                 location_name=location_id
             )
             branch.save()
+            reference_cache(Branch).invalidate()
+            bump_version(Branch)
             return Response(branch.to_dict(), status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -503,6 +642,7 @@ def branch_list_create(request):
 
 @api_view(['GET','PUT'])
 @permission_classes([IsAuthenticated])
+@conditional(Branch, Location)
 def get_branch_by_id(request, id):
     """
     GET: Get a branch by ID
@@ -542,6 +682,8 @@ def update_branch_by_id(request, id):
         branch.branch_name = branch_name
         branch.location_name = location  # Assign the Location document directly
         branch.save()
+        reference_cache(Branch).invalidate()
+        bump_version(Branch)
         
         return Response(branch.to_dict(), status=status.HTTP_200_OK)
     
@@ -560,6 +702,8 @@ def delete_branch_by_id(request, id):
     if not branch:
         return Response({'detail': 'Branch not found.'}, status=status.HTTP_404_NOT_FOUND)
     branch.delete()
+    reference_cache(Branch).invalidate()
+    bump_version(Branch)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -628,88 +772,352 @@ def get_employee_attendance(request):
 
 
 
+def queued_punch(emp_id, day, check_in=None, check_out=None):
+    """
+    Write-behind mode (ATTENDANCE_WRITE_BEHIND): log the punch locally and
+    answer 202 once it is on disk; the daily document is updated shortly after.
+    Answers 503 if the punch could not be made durable, so the client retries.
+    """
+    try:
+        punch_buffer().append(emp_id, day, check_in=check_in, check_out=check_out)
+    except PunchLogUnavailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(
+        {
+            'emp_id': emp_id,
+            'date': day.date(),
+            'records': {'check_in': check_in, 'check_out': check_out},
+            'queued': True,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def check_in_attendance(request):
     """
-    GET: List all employee attendances
-    POST: Create a new employee attendance record with check-in/check-out
+    POST: Record a check-in (and optional check-out) for an employee's day.
+    Repeated check-ins update the same daily record instead of adding a new one.
     """
-    if request.method == 'GET':
-        attendances = EmployeeAttendanceDaily.objects.all()
-        return Response([attendance.to_dict() for attendance in attendances], status=status.HTTP_200_OK)
-    
-    elif request.method == 'POST':
-
-        try:
+    try:
+        data = request.data
+        emp_id = data.get('employee_id')
+        date_str = data.get('date')
+        check_in = data.get('check_in')
 
-            data = request.data
-            emp_id = data.get('employee_id')
-            date_str = data.get('date')
-            check_in = data.get('check_in')
-            
-            if not all([emp_id, date_str, check_in]):
-                return Response(
-                    {'error': 'Employee ID, date, and check_in are required'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-          
-            attendance = EmployeeAttendanceDaily(
-                emp_id=emp_id,
-                date=date_str,
-                status="Present",
-                records={
-                    'check_in': check_in,
-                    'check_out': data.get('check_out', '')
-                }
+        if not all([emp_id, date_str, check_in]):
+            return Response(
+                {'error': 'Employee ID, date, and check_in are required'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        
-            attendance.save()
-            
-            return Response(attendance.to_dict(), status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
+
+        try:
+            day = day_key(date_str)
+        except (ValueError, OverflowError):
             return Response(
-                {'detail': f'Error creating employee attendance: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Invalid date format. Please use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        if write_behind_enabled():
+            return queued_punch(emp_id, day, check_in=check_in, check_out=data.get('check_out') or None)
+        attendance = apply_punch(emp_id, day, check_in=check_in, check_out=data.get('check_out') or None)
+        return Response(attendance.to_dict(), status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response(
+            {'detail': f'Error creating employee attendance: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def check_out_attendance(request):
     """
-    Add check-out time to an existing attendance record
+    Add check-out time to an existing attendance record, identified either by
+    attendance_id or by employee_id + date
     """
-   
     try:
-        attendance = EmployeeAttendanceDaily.objects.get(id=attendance_id)
-        check_out = request.data.get('check_out')
-        
+        data = request.data
+        check_out = data.get('check_out')
+
         if not check_out:
             return Response(
                 {'error': 'check_out time is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Update the last record's check_out time
-        if not attendance.records:
-            return Response(
-                {'error': 'No check-in record found'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
-        attendance.records[-1].check_out = check_out
-        attendance.save()
-        
+
+        if data.get('attendance_id'):
+            existing = EmployeeAttendanceDaily.objects.get(id=data.get('attendance_id'))
+            emp_id, day = existing.emp_id, existing.date
+        else:
+            emp_id, date_str = data.get('employee_id'), data.get('date')
+            if not emp_id or not date_str:
+                return Response(
+                    {'error': 'attendance_id or employee_id and date are required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            day = date_str
+
+        if write_behind_enabled():
+            return queued_punch(emp_id, day_key(day), check_out=check_out)
+        attendance = apply_punch(emp_id, day, check_out=check_out)
         return Response(attendance.to_dict())
-        
+
     except EmployeeAttendanceDaily.DoesNotExist:
         return Response(
             {'error': 'Attendance record not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    except (ValueError, OverflowError):
+        return Response(
+            {'error': 'Invalid date format. Please use YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_punch_attendance(request):
+    """
+    POST: Apply a batch of device punches.
+    Body: [{"employee_id": ..., "timestamp": ISO 8601, "direction": "in"|"out"}, ...]
+    (or {"punches": [...]}). Punches are grouped per employee and day and
+    written with a single bulk upsert.
+    """
+    punches = request.data.get('punches') if isinstance(request.data, dict) else request.data
+    if not isinstance(punches, list):
+        return Response(
+            {'error': 'Expected a list of punches'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        accepted, errors, result = apply_punches(punches)
+    except Exception as e:
+        return Response(
+            {'error': f'Error applying punches: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return Response(
+        {
+            'accepted': accepted,
+            'rejected': len(errors),
+            'days_created': result.upserted_count if result else 0,
+            'days_updated': result.matched_count if result else 0,
+            'errors': errors,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def attendance_range(request):
+    """
+    GET: Attendance for one employee (?emp_id=) or a whole department
+    (?department=<id>) over a month (?month=&year=) or a date range
+    (?start=YYYY-MM-DD&end=YYYY-MM-DD, inclusive), keyed by emp_id then day.
+    """
+    params = request.query_params
+    emp_id = params.get('emp_id') or params.get('employee_id')
+    department_id = params.get('department')
+    if not emp_id and not department_id:
+        return Response(
+            {'error': 'emp_id or department is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        if params.get('month') or params.get('year'):
+            start, end = month_range(int(params.get('year')), int(params.get('month')))
+        else:
+            start = parser.parse(params.get('start')).date()
+            end = parser.parse(params.get('end')).date()
+    except (TypeError, ValueError, OverflowError):
+        return Response(
+            {'error': 'Provide month and year, or start and end as YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if end < start:
+        return Response(
+            {'error': 'end must not be before start'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if emp_id:
+        emp_ids = [emp_id]
+    else:
+        if not ObjectId.is_valid(department_id):
+            return Response({'error': 'Invalid department ID.'}, status=status.HTTP_400_BAD_REQUEST)
+        emp_ids = [
+            row['emp_id']
+            for row in reads(Employee.objects(department=ObjectId(department_id)).only('emp_id').as_pymongo())
+            if row.get('emp_id')
+        ]
+
+    try:
+        employees = attendance_by_day(emp_ids, start, end)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'employees': employees,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+#--------------------Payroll Function START-----------------------#
+
+def _payroll_period(data):
+    try:
+        year, month = int(data.get('year')), int(data.get('month'))
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= month <= 12:
+        return None
+    return year, month
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def payroll_list(request):
+    """
+    GET: Payroll records for ?month=&year=, optionally filtered by ?status=
+    and ?department=<id> (supports ?limit=&after= and ?stream=)
+    """
+    period = _payroll_period(request.query_params)
+    if period is None:
+        return Response({'detail': 'month and year are required.'}, status=status.HTTP_400_BAD_REQUEST)
+    filters = {'year': period[0], 'month': period[1]}
+    if request.query_params.get('status'):
+        filters['status'] = request.query_params.get('status')
+    department_id = request.query_params.get('department')
+    if department_id:
+        if not ObjectId.is_valid(department_id):
+            return Response({'detail': 'Invalid department ID.'}, status=status.HTTP_400_BAD_REQUEST)
+        filters['department'] = ObjectId(department_id)
+    return list_response(request, reads(payroll_rows(**filters)), serialize_payrolls)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def payroll_generate(request):
+    """
+    POST: Generate payroll for {month, year} for one department
+    ({department: <id>}) or the whole company. Company-wide runs may set
+    {processes: N} to split the work by department across N processes, at
+    most PAYROLL_MAX_PROCESSES (default 1; use manage.py generate_payroll
+    for multi-process runs).
+    """
+    period = _payroll_period(request.data)
+    if period is None:
+        return Response({'detail': 'month and year are required.'}, status=status.HTTP_400_BAD_REQUEST)
+    department_id = request.data.get('department')
+    processes = request.data.get('processes', 1)
+    try:
+        processes = int(processes) if processes not in (None, '') else 1
+    except (TypeError, ValueError):
+        processes = 0
+    if processes < 1:
+        return Response({'detail': 'processes must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    processes = min(processes, getattr(settings, 'PAYROLL_MAX_PROCESSES', 1))
+    try:
+        if department_id:
+            if not reference_cache(Department).exists(department_id):
+                return Response({'detail': 'Invalid department ID.'}, status=status.HTTP_400_BAD_REQUEST)
+            summary = generate_payroll(*period, department=ObjectId(department_id))
+        else:
+            summary = generate_company_payroll(*period, processes=processes)
+    except Exception as e:
+        return Response(
+            {'detail': f'Error generating payroll: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    return Response(summary, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def payroll_payslip(request, emp_id):
+    """
+    GET: HTML payslip for an employee's ?month=&year= payroll record. Rendered
+    payslips are cached on disk, keyed by a hash of the payroll data.
+    """
+    period = _payroll_period(request.query_params)
+    if period is None:
+        return Response({'detail': 'month and year are required.'}, status=status.HTTP_400_BAD_REQUEST)
+    payroll = serialize_payrolls(payroll_rows(year=period[0], month=period[1], emp_id=emp_id).limit(1))
+    if not payroll:
+        return Response({'detail': 'Payroll record not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    key, content = payslip_cache().get_or_render(payroll[0])
+    response = HttpResponse(content, content_type='text/html; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="payslip-{emp_id}-{period[1]}-{period[0]}.html"'
+    response['X-Payslip-Key'] = key
+    return response
+
+#--------------------Payroll Function END-----------------------#
+
+
+#--------------------Dashboard Function START-----------------------#
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_summary(request):
+    """
+    GET: Headcount and attendance totals for the dashboard, read from the
+    incrementally maintained counters. ?date=YYYY-MM-DD picks the attendance
+    day (default today). Absent counts active employees with no
+    Present/Halfday record that day.
+    """
+    try:
+        day = parser.parse(request.query_params['date']).date() if request.query_params.get('date') else timezone.localdate()
+    except (ValueError, OverflowError):
+        return Response({'detail': 'Invalid date format. Please use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+    attendance_keys = {status_name: attendance_key(day, status_name) for status_name in ATTENDANCE_STATUSES}
+    counters = read_counters(
+        keys=['employees:total', 'employees:active', 'employees:inactive', *attendance_keys.values()],
+        prefixes=[f'{field}:' for field in HEADCOUNT_FIELDS],
+    )
+
+    def headcount(field, model):
+        names = reference_cache(model)
+        prefix = f'{field}:'
+        return [
+            {'id': key[len(prefix):], 'name': names.name_of(key[len(prefix):]), 'count': value}
+            for key, value in sorted(counters.items())
+            if key.startswith(prefix) and value > 0
+        ]
+
+    active = counters.get('employees:active', 0)
+    present = counters.get(attendance_keys['Present'], 0)
+    halfday = counters.get(attendance_keys['Halfday'], 0)
+    return Response(
+        {
+            'employees': {
+                'total': counters.get('employees:total', 0),
+                'active': active,
+                'inactive': counters.get('employees:inactive', 0),
+            },
+            'by_department': headcount('department', Department),
+            'by_location': headcount('location', Location),
+            'by_branch': headcount('branch', Branch),
+            'attendance': {
+                'date': day.isoformat(),
+                'present': present,
+                'halfday': halfday,
+                'absent': max(active - present - halfday, 0),
+            },
+        },
+        status=status.HTTP_200_OK,
+    )
+
+#--------------------Dashboard Function END-----------------------#
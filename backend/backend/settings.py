@@ -15,6 +15,11 @@ from pathlib import Path
 
 import mongoengine
 from dotenv import load_dotenv
+from pymongo import ReadPreference
+
+from api.metrics import command_timer
+from api.mongo import pool_monitor
+from api.slow_queries import slow_command_log
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack (api/metrics.py)
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -141,13 +148,13 @@ CORS_ALLOWED_ORIGINS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -165,6 +172,8 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_USER_CLASS': 'api.authentication.ClaimsUser',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.RevocableTokenRefreshSerializer',
 }
 
 MONGO_SETTINGS = {
@@ -180,4 +189,95 @@ if os.getenv('MONGO_PASSWORD'):
 if os.getenv('MONGO_AUTH_SOURCE'):
     MONGO_SETTINGS['authentication_source'] = os.getenv('MONGO_AUTH_SOURCE')
 
-mongoengine.connect(**MONGO_SETTINGS)
+# Client options shared by every connection: pool size, wait-queue timeout,
+# socket timeouts and wire compression (MONGO_COMPRESSORS, e.g. "zstd,zlib").
+# 0 for a timeout means "no timeout".
+MONGO_CLIENT_OPTIONS = {
+    'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', '100')),
+    'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', '0')),
+    'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0')) or None,
+    'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '20000')),
+    'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '0')) or None,
+    'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000')),
+}
+if os.getenv('MONGO_COMPRESSORS'):
+    MONGO_CLIENT_OPTIONS['compressors'] = os.getenv('MONGO_COMPRESSORS')
+
+# List and report endpoints read through a separate alias with its own pool
+# and read preference (api/mongo.py), so they don't compete with writes.
+MONGO_READ_ALIAS = 'reports'
+MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'SECONDARY_PREFERRED')
+MONGO_READ_MAX_POOL_SIZE = int(os.getenv('MONGO_READ_MAX_POOL_SIZE', '20'))
+
+mongoengine.connect(
+    **MONGO_SETTINGS,
+    **MONGO_CLIENT_OPTIONS,
+    event_listeners=[pool_monitor('default'), command_timer, slow_command_log],
+)
+mongoengine.connect(
+    alias=MONGO_READ_ALIAS,
+    **MONGO_SETTINGS,
+    **{**MONGO_CLIENT_OPTIONS, 'maxPoolSize': MONGO_READ_MAX_POOL_SIZE},
+    read_preference=getattr(ReadPreference, MONGO_READ_PREFERENCE),
+    event_listeners=[pool_monitor(MONGO_READ_ALIAS), command_timer, slow_command_log],
+)
+
+# In-process cache of departments/designations/locations/branches (api/cache.py)
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', '300'))
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv('REFERENCE_CACHE_MAX_ENTRIES', '10000'))
+# Seconds between checks of each cached collection's version stamp, so other workers' writes are seen
+REFERENCE_CACHE_VERSION_CHECK = int(os.getenv('REFERENCE_CACHE_VERSION_CHECK', '5'))
+
+# Seconds a User row stays cached for tokens without user claims (api/authentication.py)
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+
+# Seconds between each worker's pulls of tokens revoked by logout (api/revocation.py)
+TOKEN_REVOCATION_REFRESH = int(os.getenv('TOKEN_REVOCATION_REFRESH', '5'))
+
+# Server-Timing headers and per-route histograms on /api/metrics (api/metrics.py);
+# set METRICS_TOKEN to let a scraper in with "Authorization: Bearer <token>"
+# instead of a user's JWT
+REQUEST_METRICS = os.getenv('REQUEST_METRICS', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Slow Mongo command log (api/slow_queries.py): commands over SLOW_QUERY_MS
+# (0: off) are written with their redacted shape, view and explain() summary
+# to rotating JSON-lines files; read them with manage.py slow_queries.
+# SLOW_QUERY_EXPLAIN is the explain verbosity (queryPlanner, executionStats, or empty for none)
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'queryPlanner')
+SLOW_QUERY_LOG_DIR = Path(os.getenv('SLOW_QUERY_LOG_DIR') or BASE_DIR / 'var' / 'slow-queries')
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Rows per insert_many batch for /api/employees/bulk/
+EMPLOYEE_IMPORT_CHUNK_SIZE = int(os.getenv('EMPLOYEE_IMPORT_CHUNK_SIZE', '1000'))
+
+# Seconds between checks of the employees version stamp by the employee search index (api/search.py)
+EMPLOYEE_SEARCH_REFRESH = int(os.getenv('EMPLOYEE_SEARCH_REFRESH', '60'))
+
+# Gzip ?stream= exports for clients sending Accept-Encoding: gzip (api/renderers.py)
+STREAM_GZIP = os.getenv('STREAM_GZIP', 'True') == 'True'
+STREAM_GZIP_LEVEL = int(os.getenv('STREAM_GZIP_LEVEL', '6'))
+
+# Write-behind attendance punches (api/punch_log.py): punches are logged to
+# ATTENDANCE_LOG_DIR, fsync'd in groups and flushed to Mongo in the background
+ATTENDANCE_WRITE_BEHIND = os.getenv('ATTENDANCE_WRITE_BEHIND', 'False') == 'True'
+ATTENDANCE_LOG_DIR = Path(os.getenv('ATTENDANCE_LOG_DIR') or BASE_DIR / 'var' / 'punch-log')
+ATTENDANCE_LOG_GROUP_COMMIT_MS = int(os.getenv('ATTENDANCE_LOG_GROUP_COMMIT_MS', '2'))
+ATTENDANCE_FLUSH_INTERVAL_MS = int(os.getenv('ATTENDANCE_FLUSH_INTERVAL_MS', '200'))
+ATTENDANCE_FLUSH_BATCH = int(os.getenv('ATTENDANCE_FLUSH_BATCH', '5000'))
+
+# Month-bucket attendance layout (api/buckets.py): dual-write punches into
+# attendance_months during cutover, then set ATTENDANCE_MONTH_READS=buckets
+ATTENDANCE_DUAL_WRITE = os.getenv('ATTENDANCE_DUAL_WRITE', 'False') == 'True'
+ATTENDANCE_MONTH_READS = os.getenv('ATTENDANCE_MONTH_READS', 'daily')
+
+# Payroll rates (api/payroll.py): allowances and statutory deduction as a share of basic
+PAYROLL_ALLOWANCE_RATE = float(os.getenv('PAYROLL_ALLOWANCE_RATE', '0.2'))
+PAYROLL_DEDUCTION_RATE = float(os.getenv('PAYROLL_DEDUCTION_RATE', '0.12'))
+# Worker processes a POST /api/payroll/generate/ may start (manage.py generate_payroll is not capped by this)
+PAYROLL_MAX_PROCESSES = int(os.getenv('PAYROLL_MAX_PROCESSES', '1'))
+
+# Rendered payslips (api/payslips.py), LRU-evicted beyond PAYSLIP_CACHE_MAX_BYTES
+PAYSLIP_CACHE_DIR = Path(os.getenv('PAYSLIP_CACHE_DIR') or BASE_DIR / 'var' / 'payslips')
+PAYSLIP_CACHE_MAX_BYTES = int(os.getenv('PAYSLIP_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))